@@ -23,24 +23,32 @@
 # POSSIBILITY OF SUCH DAMAGE.
 """activate module for the cli."""
 import click
-import libzfs
 
 import libiocage.lib.Datasets
+import libiocage.lib.helpers
 import libiocage.lib.Logger
 
 __rootcmd__ = True
 
+placement_policies = list(libiocage.lib.Datasets.Datasets.PLACEMENT_POLICIES)
+
 
 @click.command(name="activate", help="Set a zpool active for iocage usage.")
 @click.pass_context
 @click.argument("zpool")
-@click.option("--mountpoint", "-m", default="/iocage")
-def cli(ctx, zpool, mountpoint):
+@click.option("--mountpoint", "-m", default=None,
+              help="Mountpoint of the iocage dataset (default: /iocage).")
+@click.option("--add", "-a", is_flag=True, default=False,
+              help="Keep other pools active and place jails on all of them.")
+@click.option("--placement", "-P", default=None,
+              type=click.Choice(placement_policies),
+              help="How new jails are spread across active pools.")
+def cli(ctx, zpool, mountpoint, add, placement):
     """
     Calls ZFS set to change the property org.freebsd.ioc:active to yes.
     """
     logger = ctx.parent.logger
-    zfs = libzfs.ZFS(history=True, history_prefix="<iocage>")
+    zfs = libiocage.lib.helpers.get_zfs()
     iocage_pool = None
 
     for pool in zfs.pools:
@@ -57,7 +65,13 @@ def cli(ctx, zpool, mountpoint):
             zfs=zfs,
             logger=logger
         )
-        datasets.activate(mountpoint=mountpoint)
+        if (mountpoint is None) and (add is False):
+            # additional pools inherit their default mountpoint
+            mountpoint = "/iocage"
+        datasets.activate(mountpoint=mountpoint, exclusive=(add is False))
         logger.log(f"ZFS pool '{zpool}' activated")
+        if placement is not None:
+            datasets.placement_policy = placement
+            logger.log(f"Jail placement policy set to '{placement}'")
     except:
         exit(1)
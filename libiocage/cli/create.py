@@ -77,9 +77,12 @@ def validate_count(ctx, param, value):
               help="Do not automatically fetch releases")
 @click.option("--force", "-f", is_flag=True, default=False,
               help="Skip the interactive question.")
+@click.option("--pool", "-P", "pool_name", default=None,
+              help="Create the jail on this active pool instead of"
+                   " applying the placement policy.")
 @click.argument("props", nargs=-1)
 def cli(ctx, release, template, count, props, pkglist, basejail, basejail_type,
-        empty, name, no_fetch, force):
+        empty, name, no_fetch, force, pool_name):
     zfs = libiocage.lib.helpers.get_zfs()
     logger = ctx.parent.logger
     host = libiocage.lib.Host.Host(logger=logger, zfs=zfs)
@@ -153,7 +156,7 @@ def cli(ctx, release, template, count, props, pkglist, basejail, basejail_type,
 
         suffix = f" ({i}/{count})" if count > 1 else ""
         try:
-            jail.create(release.name)
+            jail.create(release.name, pool_name=pool_name)
             msg = f"{jail.humanreadable_name} successfully created!{suffix}"
             logger.log(msg)
         except:
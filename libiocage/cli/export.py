@@ -0,0 +1,77 @@
+# Copyright (c) 2014-2017, iocage
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted providing that the following conditions
+# are met:
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in the
+#    documentation and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE AUTHOR ``AS IS'' AND ANY EXPRESS OR
+# IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED.  IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR ANY
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS
+# OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION)
+# HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT,
+# STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING
+# IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+"""export module for the cli."""
+import sys
+
+import click
+
+import libiocage.lib.Jail
+import libiocage.lib.JailStream
+import libiocage.lib.errors
+
+__rootcmd__ = True
+
+compression_methods = list(libiocage.lib.JailStream.COMPRESSION_METHODS)
+
+
+@click.command(name="export", help="Export a jail as ZFS stream.")
+@click.pass_context
+@click.argument("jail", nargs=1)
+@click.argument("destination", nargs=1, default="-")
+@click.option("--snapshot", "-s", default=None,
+              help="Name of the snapshot to export (created if missing).")
+@click.option("--incremental", "-i", "incremental_from", default=None,
+              help="Only export changes since this common snapshot.")
+@click.option("--compression", "-c", default="gzip",
+              type=click.Choice(compression_methods),
+              help="Compress the stream in-process.")
+def cli(ctx, jail, destination, snapshot, incremental_from, compression):
+    """
+    Write a jail stream to a file or stdout (-)
+    """
+
+    logger = ctx.parent.logger
+
+    try:
+        ioc_jail = libiocage.lib.Jail.JailGenerator(jail, logger=logger)
+    except libiocage.lib.errors.IocageException:
+        exit(1)
+
+    export_args = dict(
+        snapshot_name=snapshot,
+        incremental_from=incremental_from,
+        compression=compression
+    )
+
+    try:
+        if destination == "-":
+            # stdout carries the stream, so nothing else may be printed
+            logger.print_level = False
+            for event in ioc_jail.export(sys.stdout.buffer, **export_args):
+                pass
+        else:
+            with open(destination, "wb") as f:
+                ctx.parent.print_events(ioc_jail.export(f, **export_args))
+    except libiocage.lib.errors.IocageException:
+        exit(1)
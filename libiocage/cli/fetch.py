@@ -24,9 +24,11 @@
 """fetch module for the cli."""
 import click
 
+import libiocage.lib.AssetCache
 import libiocage.lib.Host
 import libiocage.lib.Prompts
 import libiocage.lib.Release
+import libiocage.lib.Releases
 import libiocage.lib.errors
 
 
@@ -42,13 +44,25 @@ __rootcmd__ = True
               help="Remote URL with path to the release/snapshot directory")
 @click.option("--file", "-F", multiple=True,
               help="Specify the files to fetch from the mirror.")
-@click.option("--release", "-r",
+@click.option("--release", "-r", multiple=True,
               # type=release_choice(),
-              help="The FreeBSD release to fetch.")
+              help="The FreeBSD release to fetch. Multiple releases are"
+                   " fetched concurrently.")
 @click.option("--update/--no-update", "-U/-NU", default=True,
               help="Update the release to the latest patch level.")
 @click.option("--fetch-updates/--no-fetch-updates", default=True,
               help="Skip fetching release updates")
+@click.option("--asset-cache", envvar="IOCAGE_ASSET_CACHE",
+              default=libiocage.lib.AssetCache.AssetCache.DEFAULT_DIRECTORY,
+              help="Directory of the release asset cache (may be shared)")
+@click.option("--asset-cache-size", type=int, default=4096,
+              help="Maximum size of the release asset cache in MiB")
+@click.option("--no-asset-cache", is_flag=True, default=False,
+              help="Neither use nor populate the release asset cache")
+@click.option("--max-downloads", type=int, default=4,
+              help="Number of assets downloaded at the same time")
+@click.option("--max-rate", type=int, default=None,
+              help="Bandwidth limit of all downloads in KiB/s")
 # Compat
 @click.option("--http", "-h", default=False,
               help="Have --server define a HTTP server instead.", is_flag=True)
@@ -61,41 +75,64 @@ def cli(ctx, **kwargs):
     host = libiocage.lib.Host.Host(logger=logger)
     prompts = libiocage.lib.Prompts.Prompts(host=host, logger=logger)
 
-    release_input = kwargs["release"]
-    if release_input is None:
+    release_inputs = kwargs["release"]
+    if len(release_inputs) == 0:
         try:
-            release = prompts.release()
+            releases = [prompts.release()]
         except libiocage.lib.errors.DefaultReleaseNotFound:
             exit(1)
     else:
-        try:
-            release = libiocage.lib.Release.ReleaseGenerator(
-                name=release_input,
-                host=host,
-                logger=logger
-            )
-        except:
-            logger.error(f"Invalid Release '{release_input}'")
-            exit(1)
+        releases = []
+        for release_input in release_inputs:
+            try:
+                releases.append(libiocage.lib.Release.ReleaseGenerator(
+                    name=release_input,
+                    host=host,
+                    logger=logger
+                ))
+            except:
+                logger.error(f"Invalid Release '{release_input}'")
+                exit(1)
+
+    if kwargs["no_asset_cache"] is False:
+        asset_cache = libiocage.lib.AssetCache.AssetCache(
+            directory=kwargs["asset_cache"],
+            max_size=kwargs["asset_cache_size"] * 1024 * 1024,
+            logger=logger
+        )
+    else:
+        asset_cache = None
 
-    url_or_files_selected = False
+    for release in releases:
 
-    if is_option_enabled(kwargs, "url"):
-        release.mirror_url = kwargs["url"]
-        url_or_files_selected = True
+        url_or_files_selected = False
 
-    if is_option_enabled(kwargs, "files"):
-        release.assets = list(kwargs["files"])
-        url_or_files_selected = True
+        if is_option_enabled(kwargs, "url"):
+            release.mirror_url = kwargs["url"]
+            url_or_files_selected = True
+
+        if is_option_enabled(kwargs, "files"):
+            release.assets = list(kwargs["files"])
+            url_or_files_selected = True
+
+        if (url_or_files_selected is False) and (release.available is False):
+            logger.error(f"The release '{release.name}' is not available")
+            exit(1)
 
-    if (url_or_files_selected is False) and (release.available is False):
-        logger.error(f"The release '{release.name}' is not available")
-        exit(1)
+        release.asset_cache = asset_cache
 
     fetch_updates = bool(kwargs["fetch_updates"])
-    ctx.parent.print_events(release.fetch(
+    max_rate = kwargs["max_rate"]
+    ctx.parent.print_events(libiocage.lib.Releases.Releases(
+        host=host,
+        zfs=host.zfs,
+        logger=logger
+    ).fetch(
+        releases,
         update=kwargs["update"],
-        fetch_updates=fetch_updates
+        fetch_updates=fetch_updates,
+        max_downloads=kwargs["max_downloads"],
+        max_rate=None if (max_rate is None) else max_rate * 1024
     ))
 
     exit(0)
@@ -22,12 +22,20 @@
 # IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
 # POSSIBILITY OF SUCH DAMAGE.
 """get module for the cli."""
+import csv
+import json
+import sys
+import time
+
 import click
 
 import libiocage.lib.Host
 import libiocage.lib.Jail
+import libiocage.lib.Jails
 import libiocage.lib.Logger
 
+supported_output_formats = ["text", "csv", "jsonl"]
+
 
 @click.command(context_settings=dict(
     max_content_width=400, ), name="get", help="Gets the specified property.")
@@ -38,9 +46,22 @@ import libiocage.lib.Logger
                                           "specified jail.", is_flag=True)
 @click.option("--pool", "-p", "_pool", help="Get the currently activated "
                                             "zpool.", is_flag=True)
+@click.option("--filter", "-f", "filters", multiple=True,
+              help="Additional filter the jails need to match.")
+@click.option("--output-format", "-o", default="text",
+              type=click.Choice(supported_output_formats),
+              help="Print a row per jail as CSV or JSON lines.")
+@click.option("--header/--no-header", "-H/-NH", is_flag=True, default=True,
+              help="Show or hide the CSV column names.")
 @click.option("--log-level", "-d", default="info")
-def cli(ctx, prop, _all, _pool, jail, log_level):
-    """Get a list of jails and print the property."""
+def cli(ctx, prop, _all, _pool, jail, filters, output_format, header,
+        log_level):
+    """
+    Print properties of the jails matching the filter
+
+    PROP is a property name, a comma separated list of properties or
+    'all'. JAIL is a jail name or a filter term like 'tag=web*'.
+    """
 
     logger = ctx.parent.logger
     logger.print_level = log_level
@@ -53,53 +74,151 @@ def cli(ctx, prop, _all, _pool, jail, log_level):
             print("No active pool found")
         exit(1)
 
-    if jail == "":
+    # the property can be omitted with --all
+    if (_all is True) and (jail == ""):
+        jail = prop
         prop = ""
 
-    jail_identifier = jail
-    jail = libiocage.lib.Jail.Jail(
-        jail_identifier,
+    if (prop == "") and (jail == "") and not _all:
+        logger.error("Missing arguments property and jail")
+        exit(1)
+    elif jail == "":
+        logger.error("Missing argument property name or -a/--all argument")
+        exit(1)
+
+    properties = None
+    if (_all is False) and (prop not in ["", "all"]):
+        properties = prop.split(",")
+
+    if (output_format == "csv") and (properties is None):
+        logger.error("CSV output requires a list of properties")
+        exit(1)
+
+    jails = libiocage.lib.Jails.JailsGenerator(
+        (jail,) + filters,
         host=host,
         logger=logger
     )
 
-    if not jail.exists:
-        logger.error(f"Jail '{jail.name}' does not exist")
-        exit(1)
+    # runtime state of all jails is read at once
+    jail_states = None
+    if (properties is None) or _requires_jail_state(properties):
+        jail_states = jails.jail_states
 
-    if _all is True:
-        prop = None
+    if output_format == "csv":
+        writer = _CSVWriter(properties, header)
+    elif output_format == "jsonl":
+        writer = _JSONLinesWriter(properties)
+    else:
+        writer = _TextWriter(properties, logger)
+
+    count = 0
+    started_at = time.monotonic()
+    for matched_jail in jails:
+        if jail_states is not None:
+            matched_jail.set_jail_state(
+                jail_states.get(matched_jail.identifier)
+            )
+        writer.write(matched_jail)
+        count += 1
+
+    duration = time.monotonic() - started_at
+
+    if count == 0:
+        logger.error(f"No jail matches '{jail}'")
+        exit(1)
 
-    if prop == "all":
-        prop = None
+    jails_per_second = count / duration if duration > 0 else 0
+    logger.verbose(
+        f"{count} jails exported in {duration:.2f}s "
+        f"({jails_per_second:.1f} jails/s)"
+    )
 
-    if (prop is None) and (jail_identifier == "") and not _all:
-        logger.error("Missing arguments property and jail")
-        exit(1)
-    elif (prop is not None) and (jail_identifier == ""):
-        logger.error("Missing argument property name or -a/--all argument")
+    if writer.failed is True:
         exit(1)
 
-    if prop:
-        value = _lookup_jail_value(jail, prop)
 
-        if value:
-            print(value)
+class _TextWriter:
+
+    def __init__(self, properties, logger):
+        self.properties = properties
+        self.logger = logger
+        self.failed = False
+
+    def write(self, jail):
+
+        if self.properties is None:
+            for key in jail.config["all_properties"]:
+                value = jail.config["get_string"](key)
+                print_property(key, value)
             return
-        else:
-            logger.error(f"Unknown property '{prop}'")
-            exit(1)
 
-    for key in jail.config["all_properties"]:
-        if (prop is None) or (key == prop):
-            value = jail.config["get_string"](key)
-            print_property(key, value)
+        for key in self.properties:
+            value = _lookup_jail_value(jail, key)
+            if value:
+                print(value)
+            else:
+                self.logger.error(f"Unknown property '{key}'")
+                self.failed = True
+
+
+class _CSVWriter:
+
+    def __init__(self, properties, header=True):
+        self.properties = properties
+        self.failed = False
+        self.writer = csv.writer(sys.stdout, lineterminator="\n")
+        if header is True:
+            self.writer.writerow(["name"] + properties)
+
+    def write(self, jail):
+        row = [jail.name]
+        for key in self.properties:
+            value = _lookup_jail_string(jail, key)
+            row.append("-" if value is None else value)
+        self.writer.writerow(row)
+
+
+class _JSONLinesWriter:
+
+    def __init__(self, properties):
+        self.properties = properties
+        self.failed = False
+
+    def write(self, jail):
+
+        properties = self.properties
+        if properties is None:
+            properties = jail.config["all_properties"]
+
+        data = {"name": jail.name}
+        for key in properties:
+            data[key] = _lookup_jail_string(jail, key)
+
+        sys.stdout.write(json.dumps(data, sort_keys=True) + "\n")
 
 
 def print_property(key, value):
     print(f"{key}:{value}")
 
 
+def _requires_jail_state(properties):
+    for key in properties:
+        if key in libiocage.lib.Jails.Jails.JAIL_KEYS:
+            return True
+    return False
+
+
+def _lookup_jail_string(jail, key):
+    if key in libiocage.lib.Jails.Jails.JAIL_KEYS:
+        return jail.getstring(key)
+
+    try:
+        return jail.config.get_string(key)
+    except KeyError:
+        return None
+
+
 def _lookup_jail_value(jail, key):
     if key in libiocage.lib.Jails.Jails.JAIL_KEYS:
         return jail.getstring(key)
@@ -107,6 +226,9 @@ def _lookup_jail_value(jail, key):
         if key == "running":
             return jail.running
 
-        val = str(jail.config.__getitem__(key))
+        try:
+            val = str(jail.config.__getitem__(key))
+        except KeyError:
+            return False
 
         return val if val is not None else False
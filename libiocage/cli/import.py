@@ -0,0 +1,70 @@
+# Copyright (c) 2014-2017, iocage
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted providing that the following conditions
+# are met:
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in the
+#    documentation and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE AUTHOR ``AS IS'' AND ANY EXPRESS OR
+# IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED.  IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR ANY
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS
+# OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION)
+# HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT,
+# STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING
+# IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+"""import module for the cli."""
+import sys
+
+import click
+
+import libiocage.lib.Jail
+import libiocage.lib.errors
+
+__rootcmd__ = True
+
+
+@click.command(name="import", help="Import a jail from a ZFS stream.")
+@click.pass_context
+@click.argument("source", nargs=1, default="-")
+@click.option("--name", "-n", default=None,
+              help="Import the jail with a different name.")
+@click.option("--force", "-f", is_flag=True, default=False,
+              help="Overwrite an existing jail.")
+def cli(ctx, source, name, force):
+    """
+    Read a jail stream from a file or stdin (-)
+    """
+
+    logger = ctx.parent.logger
+
+    jail_data = {}
+    if name is not None:
+        jail_data["name"] = name
+
+    ioc_jail = libiocage.lib.Jail.JailGenerator(
+        jail_data,
+        logger=logger,
+        new=True
+    )
+
+    try:
+        if source == "-":
+            events = ioc_jail.import_stream(sys.stdin.buffer, force=force)
+            ctx.parent.print_events(events)
+        else:
+            with open(source, "rb") as f:
+                events = ioc_jail.import_stream(f, force=force)
+                ctx.parent.print_events(events)
+    except libiocage.lib.errors.IocageException:
+        exit(1)
+
+    logger.log(f"Jail '{ioc_jail.humanreadable_name}' imported")
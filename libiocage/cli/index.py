@@ -0,0 +1,91 @@
+# Copyright (c) 2014-2017, iocage
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted providing that the following conditions
+# are met:
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in the
+#    documentation and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE AUTHOR ``AS IS'' AND ANY EXPRESS OR
+# IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED.  IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR ANY
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS
+# OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION)
+# HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT,
+# STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING
+# IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+"""index module for the cli."""
+import time
+
+import click
+
+import libiocage.lib.Host
+import libiocage.lib.JailFilter
+import libiocage.lib.Jails
+import libiocage.lib.errors
+
+__rootcmd__ = True
+
+
+@click.group(name="index", help="Maintain the SQLite jail index.")
+@click.pass_context
+def cli(ctx):
+    ctx.logger = ctx.parent.logger
+
+
+@cli.command(name="rebuild", help="Create or refresh the jail index.")
+@click.pass_context
+def rebuild(ctx):
+    logger = ctx.parent.logger
+    host = libiocage.lib.Host.Host(logger=logger)
+    query_index = host.query_index
+
+    try:
+        # do not filter jails with an outdated index
+        query_index.drop()
+        jails = libiocage.lib.Jails.Jails(host=host, logger=logger)
+        count = query_index.rebuild(jails)
+    except libiocage.lib.errors.IocageException:
+        exit(1)
+
+    logger.log(f"{count} jails indexed")
+
+
+@cli.command(name="drop", help="Remove the jail index.")
+@click.pass_context
+def drop(ctx):
+    host = libiocage.lib.Host.Host(logger=ctx.parent.logger)
+    host.query_index.drop()
+
+
+@cli.command(name="query", help="List the indexed jails whose config does "
+                                "not rule out the filters.")
+@click.pass_context
+@click.argument("filters", nargs=-1)
+def query(ctx, filters):
+    logger = ctx.parent.logger
+    host = libiocage.lib.Host.Host(logger=logger)
+    query_index = host.query_index
+
+    if query_index.enabled is False:
+        logger.error("The jail index was not created (ioc index rebuild)")
+        exit(1)
+
+    # empty filters will match all jails
+    if len(filters) == 0:
+        filters += ("*",)
+
+    started_at = time.monotonic()
+    names = query_index.query(libiocage.lib.JailFilter.Terms(filters))
+    duration = (time.monotonic() - started_at) * 1000
+
+    for name in names:
+        print(name)
+    logger.verbose(f"{len(names)} jails may match ({duration:.1f}ms)")
@@ -31,9 +31,13 @@ import libiocage.lib.Host
 import libiocage.lib.Jails
 import libiocage.lib.JailFilter
 import libiocage.lib.Logger
+import libiocage.lib.ReleaseCatalog
 
 supported_output_formats = ['table', 'csv', 'list', 'json']
 
+# seconds `ioc list --remote` waits for a stale release catalog to refresh
+catalog_refresh_timeout = 30
+
 
 @click.command(name="list", help="List a specified dataset type, by default"
                                  " lists all jails.")
@@ -47,6 +51,8 @@ supported_output_formats = ['table', 'csv', 'list', 'json']
 @click.option("--remote", "-R", is_flag=True, help="Show remote's available "
                                                    "RELEASEs.")
 @click.option("--plugins", "-P", is_flag=True, help="Show available plugins.")
+@click.option("--refresh", is_flag=True, default=False,
+              help="Refresh the catalog of remote RELEASEs before listing.")
 @click.option("--sort", "-s", "_sort", default=None, nargs=1,
               help="Sorts the list by the given type")
 @click.option("--quick", "-q", is_flag=True, default=False,
@@ -57,7 +63,7 @@ supported_output_formats = ['table', 'csv', 'list', 'json']
 @click.option("--header/--no-header", "-H/-NH", is_flag=True, default=True,
               help="Show or hide column name heading.")
 @click.argument("filters", nargs=-1)
-def cli(ctx, dataset_type, header, _long, remote, plugins,
+def cli(ctx, dataset_type, header, _long, remote, plugins, refresh,
         _sort, quick, output, output_format, filters):
     logger = ctx.parent.logger
 
@@ -65,7 +71,24 @@ def cli(ctx, dataset_type, header, _long, remote, plugins,
 
     if remote and not plugins:
 
-        available_releases = host.distribution.releases
+        catalog = host.distribution.catalog
+        format_age = libiocage.lib.ReleaseCatalog.format_age
+        if refresh is True:
+            catalog.refresh()
+        elif catalog.refresh_if_stale() is None:
+            logger.verbose(
+                f"Release catalog updated {format_age(catalog.age)} ago"
+            )
+        elif catalog.wait_for_refresh(timeout=catalog_refresh_timeout):
+            # the refresh thread would not survive the command
+            logger.verbose("Release catalog refreshed")
+        elif catalog.data is not None:
+            logger.warn(
+                f"Release catalog updated {format_age(catalog.age)} ago"
+                " - refreshing it did not finish"
+            )
+
+        available_releases = catalog.releases
         for available_release in available_releases:
             logger.screen(available_release.name)
         return
@@ -0,0 +1,70 @@
+# Copyright (c) 2014-2017, iocage
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted providing that the following conditions
+# are met:
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in the
+#    documentation and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE AUTHOR ``AS IS'' AND ANY EXPRESS OR
+# IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED.  IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR ANY
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS
+# OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION)
+# HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT,
+# STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING
+# IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+"""migrate module for the cli."""
+import click
+
+import libiocage.lib.Jails
+
+__rootcmd__ = True
+
+
+@click.command(name="migrate", help="Convert legacy jail configs to JSON.")
+@click.pass_context
+@click.argument("filters", nargs=-1)
+@click.option("--jobs", "-j", "max_workers", type=int, default=None,
+              help="Number of jails migrated in parallel.")
+@click.option("--cleanup", is_flag=True, default=False,
+              help="Remove the legacy config after a verified migration.")
+def cli(ctx, filters, max_workers, cleanup):
+    """
+    Migrate the UCL and ZFS property configs of iocage-legacy jails
+    """
+
+    logger = ctx.parent.logger
+
+    # empty filters will match all jails
+    if len(filters) == 0:
+        filters += ("*",)
+
+    jails = libiocage.lib.Jails.JailsGenerator(filters, logger=logger)
+
+    migrated = 0
+    failed = 0
+    for event in jails.migrate(max_workers=max_workers, cleanup=cleanup):
+        if event.pending is True or event.skipped is True:
+            continue
+        if event.error is not None:
+            failed += 1
+            logger.error(
+                f"Migration of {event.identifier} failed: {event.error}"
+            )
+        else:
+            migrated += 1
+            logger.log(f"{event.identifier} migrated ({event.message})")
+
+    message = f"{migrated} jails migrated"
+    if failed > 0:
+        message += f", {failed} failed"
+    logger.screen(message)
+    exit(int(failed > 0))
@@ -0,0 +1,58 @@
+# Copyright (c) 2014-2017, iocage
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted providing that the following conditions
+# are met:
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in the
+#    documentation and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE AUTHOR ``AS IS'' AND ANY EXPRESS OR
+# IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED.  IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR ANY
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS
+# OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION)
+# HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT,
+# STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING
+# IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+"""rebase module for the cli."""
+import click
+
+import libiocage.lib.Jails
+import libiocage.lib.errors
+
+__rootcmd__ = True
+
+
+@click.command(name="rebase", help="Move jails to another release generation.")
+@click.pass_context
+@click.argument("filters", nargs=-1)
+@click.option("--generation", "-g", default=None,
+              help="Target generation (default: current release generation).")
+def cli(ctx, filters, generation):
+    """
+    Re-clone standalone jails from a release generation, keeping changes
+    """
+
+    logger = ctx.parent.logger
+
+    if len(filters) == 0:
+        logger.error("Please select the jails to rebase")
+        exit(1)
+
+    jails = libiocage.lib.Jails.JailsGenerator(filters, logger=logger)
+
+    failed = False
+    for jail in jails:
+        try:
+            ctx.parent.print_events(jail.rebase(generation=generation))
+        except libiocage.lib.errors.IocageException:
+            failed = True
+
+    exit(int(failed))
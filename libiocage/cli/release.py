@@ -0,0 +1,108 @@
+# Copyright (c) 2014-2017, iocage
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted providing that the following conditions
+# are met:
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in the
+#    documentation and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE AUTHOR ``AS IS'' AND ANY EXPRESS OR
+# IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED.  IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR ANY
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS
+# OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION)
+# HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT,
+# STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING
+# IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+"""release module for the cli."""
+import click
+
+import libiocage.lib.Host
+import libiocage.lib.Release
+import libiocage.lib.Releases
+import libiocage.lib.SnapshotRetention
+import libiocage.lib.errors
+
+__rootcmd__ = True
+
+
+@click.group(name="release", help="Maintain fetched releases.")
+@click.pass_context
+def cli(ctx):
+    ctx.logger = ctx.parent.logger
+    ctx.print_events = ctx.parent.print_events
+
+
+@cli.command(name="prune", help="Destroy old pre-update release snapshots.")
+@click.pass_context
+@click.argument("releases", nargs=-1)
+@click.option("--dry-run", "-n", is_flag=True, default=False,
+              help="Only report the snapshots and space that would be freed.")
+@click.option("--keep-last", default=3, type=int,
+              help="Number of most recent snapshots to keep.")
+@click.option("--keep-daily", default=7, type=int,
+              help="Number of days to keep the last snapshot of.")
+@click.option("--keep-weekly", default=4, type=int,
+              help="Number of weeks to keep the last snapshot of.")
+def prune(ctx, releases, dry_run, keep_last, keep_daily, keep_weekly):
+    """
+    Apply the snapshot retention policy to all or the given releases
+    """
+
+    logger = ctx.parent.logger
+    host = libiocage.lib.Host.Host(logger=logger)
+
+    if len(releases) == 0:
+        selected_releases = libiocage.lib.Releases.Releases(
+            host=host,
+            zfs=host.zfs,
+            logger=logger
+        ).local
+    else:
+        selected_releases = list(map(
+            lambda name: libiocage.lib.Release.Release(
+                name=name,
+                host=host,
+                zfs=host.zfs,
+                logger=logger
+            ),
+            releases
+        ))
+
+    policy = libiocage.lib.SnapshotRetention.RetentionPolicy(
+        keep_last=keep_last,
+        keep_daily=keep_daily,
+        keep_weekly=keep_weekly
+    )
+
+    failed = False
+    for release in selected_releases:
+        release.retention_policy = policy
+
+        if dry_run is True:
+            plan = release.get_snapshot_prune_plan()
+            for snapshot_name in plan.delete:
+                logger.screen(f"{plan.dataset_name}@{snapshot_name}")
+            for snapshot_name in plan.protected:
+                logger.verbose(
+                    f"{plan.dataset_name}@{snapshot_name} is a clone origin"
+                )
+
+        try:
+            ctx.parent.print_events(
+                libiocage.lib.Release.ReleaseGenerator.prune_snapshots(
+                    release,
+                    dry_run=dry_run
+                )
+            )
+        except libiocage.lib.errors.IocageException:
+            failed = True
+
+    exit(int(failed))
@@ -0,0 +1,60 @@
+# Copyright (c) 2014-2017, iocage
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted providing that the following conditions
+# are met:
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in the
+#    documentation and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE AUTHOR ``AS IS'' AND ANY EXPRESS OR
+# IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED.  IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR ANY
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS
+# OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION)
+# HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT,
+# STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING
+# IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+"""rollback module for the cli."""
+import click
+
+import libiocage.lib.Jails
+import libiocage.lib.errors
+
+__rootcmd__ = True
+
+
+@click.command(name="rollback", help="Roll back jails to a snapshot.")
+@click.pass_context
+@click.argument("snapshot_name", nargs=1)
+@click.argument("filters", nargs=-1)
+@click.option("--jobs", "-j", "max_workers", type=int, default=None,
+              help="Number of jails rolled back in parallel.")
+def cli(ctx, snapshot_name, filters, max_workers):
+    """
+    Roll back all jails matching the filters in parallel
+    """
+
+    logger = ctx.parent.logger
+
+    if len(filters) == 0:
+        logger.error("Please select the jails to roll back")
+        exit(1)
+
+    jails = libiocage.lib.Jails.JailsGenerator(filters, logger=logger)
+
+    failed = False
+    for event in jails.rollback(snapshot_name, max_workers=max_workers):
+        if event.error is not None:
+            failed = True
+            logger.error(f"Rollback of {event.identifier} failed")
+        elif event.done is True:
+            logger.log(f"{event.identifier} rolled back")
+
+    exit(int(failed))
@@ -22,6 +22,8 @@
 # IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
 # POSSIBILITY OF SUCH DAMAGE.
 """set module for the cli."""
+import json
+
 import click
 
 import libiocage.lib.Jails
@@ -36,40 +38,80 @@ __rootcmd__ = True
 @click.pass_context
 @click.argument("props", nargs=-1)
 @click.argument("jail", nargs=1, required=True)
-def cli(ctx, props, jail):
-    """Get a list of jails and print the property."""
+@click.option("--filter", "-f", "filters", multiple=True,
+              help="Additional filter the jails need to match.")
+@click.option("--jobs", "-j", "max_workers", type=int, default=None,
+              help="Number of jail configs saved in parallel.")
+@click.option("--report", type=click.File("w"), default=None,
+              help="Write a JSON report of each jail to a file (- for "
+                   "stdout).")
+def cli(ctx, props, jail, filters, max_workers, report):
+    """
+    Set properties of all jails matching the filter
+
+    The last argument is a jail filter, such as a jail name or a term like
+    'tag=web*'. Properties without a value are deleted.
+    """
 
     logger = ctx.parent.logger
 
-    filters = (f"name={jail}",)
+    properties = {}
+    for prop in props:
+        if _is_setter_property(prop):
+            key, value = prop.split("=", maxsplit=1)
+            properties[key] = value
+        else:
+            properties[prop] = None
+
     ioc_jails = libiocage.lib.Jails.JailsGenerator(
-        filters,
+        (jail,) + filters,
         logger=logger
     )
 
-    for jail in ioc_jails:
+    changed = 0
+    unchanged = 0
+    failed = 0
+    jail_reports = []
 
-        updated_properties = set()
+    for event in ioc_jails.set(properties, max_workers=max_workers):
 
-        for prop in props:
+        if event.pending is True:
+            continue
 
-            if _is_setter_property(prop):
-                key, value = prop.split("=", maxsplit=1)
-                changed = jail.config.set(key, value)
-                if changed:
-                    updated_properties.add(key)
-            else:
-                key = prop
-                del jail.config[key]
+        jail_report = {
+            "jail": event.identifier,
+            "properties": event.data.get("properties", [])
+        }
 
-        if len(updated_properties) == 0:
-            logger.screen(f"Jail '{jail.humanreadable_name}' unchanged")
-        else:
-            logger.screen(
-                f"Jail '{jail.humanreadable_name}' updated: " +
-                ", ".join(updated_properties)
+        if event.error is not None:
+            failed += 1
+            jail_report["state"] = "failed"
+            jail_report["error"] = str(event.error)
+            logger.error(
+                f"Jail '{event.identifier}' was not updated: {event.error}"
             )
-            jail.config.save()
+        elif event.skipped is True:
+            unchanged += 1
+            jail_report["state"] = "unchanged"
+        else:
+            changed += 1
+            jail_report["state"] = "changed"
+
+        jail_reports.append(jail_report)
+
+    if (changed + unchanged + failed) == 0:
+        logger.error(f"No jail matches '{jail}'")
+        exit(1)
+
+    logger.screen(
+        f"{changed} jails updated, {unchanged} unchanged" +
+        (f", {failed} failed" if failed > 0 else "")
+    )
+
+    if report is not None:
+        report.write(json.dumps(jail_reports, indent=4) + "\n")
+
+    exit(int(failed > 0))
 
 
 def _is_setter_property(property_string):
@@ -0,0 +1,82 @@
+# Copyright (c) 2014-2017, iocage
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted providing that the following conditions
+# are met:
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in the
+#    documentation and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE AUTHOR ``AS IS'' AND ANY EXPRESS OR
+# IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED.  IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR ANY
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS
+# OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION)
+# HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT,
+# STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING
+# IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+"""snapshot module for the cli."""
+import datetime
+
+import click
+import texttable
+
+import libiocage.lib.Jails
+import libiocage.lib.errors
+
+__rootcmd__ = True
+
+
+@click.command(name="snapshot", help="Atomically snapshot jails.")
+@click.pass_context
+@click.option("--name", "-n", "snapshot_name", default=None,
+              help="Name of the snapshot (default: ioc-<DATE>).")
+@click.option("--list", "-l", "_list", is_flag=True, default=False,
+              help="List the snapshots of the selected jails instead.")
+@click.argument("filters", nargs=-1)
+def cli(ctx, snapshot_name, _list, filters):
+    """
+    Snapshot all jails matching the filters in one transaction group
+    """
+
+    logger = ctx.parent.logger
+
+    # empty filters will match all jails
+    if len(filters) == 0:
+        filters += ("*",)
+
+    jails = libiocage.lib.Jails.JailsGenerator(filters, logger=logger)
+
+    try:
+        if _list is True:
+            _print_snapshots(jails.snapshots)
+            return
+
+        snapshot_name = jails.snapshot(snapshot_name)
+        logger.log(f"Snapshot '{snapshot_name}' created")
+    except libiocage.lib.errors.IocageException:
+        exit(1)
+
+
+def _print_snapshots(snapshots):
+
+    table = texttable.Texttable(max_width=0)
+    table.set_cols_dtype(["t"] * 4)
+    table.add_row(["JAIL", "SNAPSHOT", "CREATED", "USED"])
+
+    for snapshot in snapshots:
+        created = datetime.datetime.fromtimestamp(snapshot["creation"])
+        table.add_row([
+            snapshot["jail"],
+            snapshot.snapshot_name,
+            created.strftime("%Y-%m-%d %H:%M:%S"),
+            str(snapshot["used"])
+        ])
+
+    print(table.draw())
@@ -0,0 +1,173 @@
+# Copyright (c) 2014-2017, iocage
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted providing that the following conditions
+# are met:
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in the
+#    documentation and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE AUTHOR ``AS IS'' AND ANY EXPRESS OR
+# IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED.  IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR ANY
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS
+# OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION)
+# HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT,
+# STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING
+# IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+"""
+Content-addressed cache of downloaded release assets
+"""
+import os
+import shutil
+import uuid
+
+import libiocage.lib.helpers
+
+
+class AssetCache:
+    """
+    Size-bounded cache of release assets keyed by their SHA-256 digest
+
+    Assets are stored as `<directory>/<digest[:2]>/<digest>`. Entries are
+    added with an atomic rename, so that the directory can be shared by
+    multiple hosts (e.g. on NFS). The modification time of an entry is
+    updated whenever it is used, and the least recently used entries are
+    removed when the cache grows beyond max_size.
+
+    Args:
+
+        directory (string):
+            Location of the cache. Created on first use
+
+        max_size (int): (optional)
+            Maximum size of all cached assets in bytes. Unbounded if None
+    """
+
+    DEFAULT_DIRECTORY = "/var/cache/iocage/assets"
+
+    def __init__(self, directory=None, max_size=None, logger=None):
+        libiocage.lib.helpers.init_logger(self, logger)
+        if directory is None:
+            directory = AssetCache.DEFAULT_DIRECTORY
+        self.directory = directory
+        self.max_size = max_size
+
+    def get_path(self, digest):
+        return f"{self.directory}/{digest[:2]}/{digest}"
+
+    def get(self, digest):
+        """
+        Location of a cached asset or None when it is not cached
+
+        Looking up an entry marks it as recently used.
+        """
+        path = self.get_path(digest)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            self.logger.spam(f"Asset {digest} is not cached")
+            return None
+
+        self.logger.verbose(f"Asset {digest} found in cache {path}")
+        return path
+
+    def put(self, digest, source_path, move=False):
+        """
+        Add a file with known digest to the cache
+
+        The caller is responsible for having verified the digest.
+
+        Args:
+
+            digest (string):
+                SHA-256 hex digest of the file content
+
+            source_path (string):
+                The file to cache
+
+            move (bool): (default=False)
+                Move the file into the cache instead of copying it
+        """
+        path = self.get_path(digest)
+        if os.path.isfile(path):
+            os.utime(path)
+            return path
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temporary_path = f"{path}.{uuid.uuid4().hex}.part"
+        try:
+            if move is True:
+                shutil.move(source_path, temporary_path)
+            else:
+                shutil.copyfile(source_path, temporary_path)
+            os.rename(temporary_path, path)
+        except Exception:
+            if os.path.exists(temporary_path):
+                os.remove(temporary_path)
+            raise
+
+        self.logger.verbose(f"Asset {digest} was added to cache {path}")
+        self.evict()
+        return path
+
+    def remove(self, digest):
+        try:
+            os.remove(self.get_path(digest))
+            self.logger.verbose(f"Asset {digest} was removed from cache")
+        except FileNotFoundError:
+            pass
+
+    @property
+    def entries(self):
+        """
+        Cached assets as (mtime, size, path) from least recently used
+        """
+        entries = []
+        if not os.path.isdir(self.directory):
+            return entries
+
+        for prefix in os.scandir(self.directory):
+            if not prefix.is_dir(follow_symlinks=False):
+                continue
+            for entry in os.scandir(prefix.path):
+                if entry.name.endswith(".part"):
+                    continue
+                try:
+                    stat = entry.stat(follow_symlinks=False)
+                except FileNotFoundError:
+                    # removed by another host in the meantime
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+        entries.sort()
+        return entries
+
+    @property
+    def size(self):
+        return sum(map(lambda x: x[1], self.entries))
+
+    def evict(self):
+        """
+        Remove least recently used assets until max_size is satisfied
+        """
+        if self.max_size is None:
+            return
+
+        entries = self.entries
+        size = sum(map(lambda x: x[1], entries))
+        for mtime, entry_size, path in entries:
+            if size <= self.max_size:
+                break
+            try:
+                os.remove(path)
+                self.logger.verbose(f"Evicted {path} from the asset cache")
+            except FileNotFoundError:
+                pass
+            size -= entry_size
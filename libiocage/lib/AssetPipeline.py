@@ -0,0 +1,330 @@
+# Copyright (c) 2014-2017, iocage
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted providing that the following conditions
+# are met:
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in the
+#    documentation and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE AUTHOR ``AS IS'' AND ANY EXPRESS OR
+# IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED.  IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR ANY
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS
+# OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION)
+# HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT,
+# STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING
+# IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+"""
+Hash and extract tar assets in a single pass while they are downloaded
+"""
+import hashlib
+import os
+import queue
+import shutil
+import subprocess
+import tarfile
+import threading
+
+import libiocage.lib.errors
+import libiocage.lib.helpers
+
+XZ_COMMAND = "xz"
+
+
+class AssetPipeline:
+    """
+    Single-pass SHA-256 and streaming tar extraction of an asset
+
+    Bytes written to the pipeline are hashed and handed to a thread that
+    extracts the archive member by member into a staging directory. Each
+    member is validated before it is extracted. Because extraction starts
+    before the digest is known, members that would be written outside of
+    the staging directory or hard links to files outside of it are
+    refused. The staging directory is
+    merged into the target with commit() once the caller verified the
+    digest, or removed with discard().
+
+    xz compressed assets are decompressed by an external `xz -T<threads>`
+    process when xz is installed, which uses multiple cores for assets
+    with independent blocks. Otherwise tarfile decompresses in-process.
+
+    Args:
+
+        staging_dir (string):
+            Directory the archive is extracted to. It should be on the same
+            file system as the commit target, so that commit() only renames
+
+        validate_member (callable): (optional)
+            Called with each tarfile.TarInfo before it is extracted.
+            Raising an exception aborts the pipeline
+
+        queue_size (int): (default=64)
+            Number of written blocks buffered for the extraction thread
+
+        compression (string): (optional)
+            Compression of the asset. Detected by tarfile when omitted
+
+        threads (int): (default=0)
+            Decompression threads of the external xz process (0: one per
+            core)
+    """
+
+    def __init__(
+        self,
+        staging_dir,
+        validate_member=None,
+        queue_size=64,
+        compression=None,
+        threads=0,
+        logger=None
+    ):
+
+        libiocage.lib.helpers.init_logger(self, logger)
+        self.staging_dir = staging_dir
+        self.validate_member = validate_member
+        self.bytes_written = 0
+        self._sha256 = hashlib.sha256()
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._buffer = bytearray()
+        self._eof = False
+        self._closed = False
+        self._error = None
+
+        if os.path.isdir(staging_dir):
+            shutil.rmtree(staging_dir)
+        os.makedirs(staging_dir)
+
+        self._process = None
+        xz_path = shutil.which(XZ_COMMAND)
+        if (compression == "xz") and (xz_path is not None):
+            self._process = libiocage.lib.helpers.exec_raw(
+                [xz_path, "--decompress", "--stdout", f"--threads={threads}"],
+                logger=self.logger,
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE
+            )
+
+        self._thread = threading.Thread(target=self._extract, daemon=True)
+        self._thread.start()
+
+    @property
+    def digest(self):
+        return self._sha256.hexdigest()
+
+    def write(self, data):
+        if self._error is not None:
+            raise self._error
+        self._sha256.update(data)
+        self.bytes_written += len(data)
+
+        if self._process is None:
+            self._queue.put(bytes(data))
+            return
+
+        try:
+            self._process.stdin.write(data)
+        except BrokenPipeError:
+            self._thread.join()
+            raise self._error or libiocage.lib.errors.CommandFailure(
+                returncode=self._process.wait(),
+                logger=self.logger
+            )
+
+    def feed_file(self, path, block_size=1024 * 1024):
+        """
+        Pass an already downloaded asset through the pipeline
+        """
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(block_size), b""):
+                self.write(block)
+
+    def close(self):
+        """
+        End the stream and wait for the extraction to finish
+
+        Raises the exception that aborted the extraction, if any.
+        """
+        self._end_stream()
+        self._thread.join()
+        if self._error is not None:
+            raise self._error
+
+        if self._process is not None:
+            returncode = self._process.wait()
+            if returncode != 0:
+                raise libiocage.lib.errors.CommandFailure(
+                    returncode=returncode,
+                    logger=self.logger
+                )
+
+    def abort(self):
+        if self._process is not None:
+            self._process.kill()
+        self._end_stream()
+        self._thread.join()
+        if self._process is not None:
+            self._process.wait()
+        self.discard()
+
+    def _end_stream(self):
+        if self._closed is True:
+            return
+        self._closed = True
+        if self._process is None:
+            self._queue.put(None)
+            return
+        try:
+            self._process.stdin.close()
+        except BrokenPipeError:
+            pass
+
+    def discard(self):
+        if os.path.isdir(self.staging_dir):
+            shutil.rmtree(self.staging_dir)
+
+    def commit(self, target_dir):
+        """
+        Move the extracted files into the target directory
+
+        Existing directories are merged and existing files replaced.
+        """
+        _merge_directory(self.staging_dir, target_dir)
+        os.rmdir(self.staging_dir)
+
+    def read(self, size=-1):
+        """
+        Read from the written stream (used by the extraction thread)
+        """
+        while (size < 0) or (len(self._buffer) < size):
+            if self._eof is True:
+                break
+            block = self._queue.get()
+            if block is None:
+                self._eof = True
+            else:
+                self._buffer += block
+
+        if size < 0:
+            size = len(self._buffer)
+        data = bytes(self._buffer[:size])
+        del self._buffer[:size]
+        return data
+
+    def _check_member_path(self, member):
+
+        staging_dir = os.path.realpath(self.staging_dir)
+        path = os.path.join(staging_dir, member.name)
+
+        if member.issym() or member.islnk():
+            # the link itself replaces an existing file at its path
+            resolved_path = os.path.realpath(os.path.dirname(path))
+        else:
+            resolved_path = os.path.realpath(path)
+        if not _is_within(resolved_path, staging_dir):
+            self._raise_illegal_member(member, "it is outside of the archive")
+
+        if member.islnk():
+            # hard link names are relative to the archive root
+            target = os.path.realpath(
+                os.path.join(staging_dir, member.linkname)
+            )
+            is_absolute = os.path.isabs(member.linkname)
+            if is_absolute or not _is_within(target, staging_dir):
+                self._raise_illegal_member(
+                    member,
+                    f"hard link target {member.linkname} is not in the archive"
+                )
+        elif member.issym() and not os.path.isabs(member.linkname):
+            # absolute symlinks are only resolved inside of the jail, but a
+            # relative target may not climb above the archive root
+            target = os.path.normpath(os.path.join(
+                os.path.dirname(os.path.normpath(member.name)),
+                member.linkname
+            ))
+            if (target == "..") or target.startswith("../"):
+                self._raise_illegal_member(
+                    member,
+                    f"symlink target {member.linkname} leaves the archive"
+                )
+
+    def _raise_illegal_member(self, member, reason):
+        raise libiocage.lib.errors.IllegalArchiveMember(
+            name=member.name,
+            reason=reason,
+            logger=self.logger
+        )
+
+    def _extract(self):
+
+        if self._process is None:
+            source, mode = self, "r|*"
+        else:
+            source, mode = self._process.stdout, "r|"
+
+        try:
+            directories = []
+            with tarfile.open(fileobj=source, mode=mode) as tar:
+                for member in tar:
+                    if self.validate_member is not None:
+                        self.validate_member(member)
+                    self._check_member_path(member)
+                    if member.isdir():
+                        directories.append(member)
+                    tar.extract(
+                        member,
+                        self.staging_dir,
+                        set_attrs=not member.isdir()
+                    )
+
+                # directory attributes are set after their content
+                directories.sort(key=lambda x: x.name, reverse=True)
+                for member in directories:
+                    path = os.path.join(self.staging_dir, member.name)
+                    tar.chown(member, path, False)
+                    tar.utime(member, path)
+                    tar.chmod(member, path)
+
+        except Exception as e:
+            self._error = e
+
+        # unblock the writer until the end of the stream
+        if self._process is not None:
+            while len(source.read(65536)) > 0:
+                pass
+            source.close()
+            return
+
+        while self._eof is False:
+            self._eof = self._queue.get() is None
+
+
+def _is_within(path, directory):
+    return (path == directory) or path.startswith(directory + os.sep)
+
+
+def _merge_directory(source_dir, target_dir):
+    for item in os.listdir(source_dir):
+        source = os.path.join(source_dir, item)
+        target = os.path.join(target_dir, item)
+
+        source_is_dir = os.path.isdir(source) and not os.path.islink(source)
+        target_is_dir = os.path.isdir(target) and not os.path.islink(target)
+
+        if source_is_dir and target_is_dir:
+            _merge_directory(source, target)
+            shutil.copystat(source, target)
+            os.rmdir(source)
+            continue
+
+        if target_is_dir:
+            shutil.rmtree(target)
+        elif os.path.lexists(target):
+            os.unlink(target)
+        os.rename(source, target)
@@ -0,0 +1,151 @@
+# Copyright (c) 2014-2017, iocage
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted providing that the following conditions
+# are met:
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in the
+#    documentation and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE AUTHOR ``AS IS'' AND ANY EXPRESS OR
+# IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED.  IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR ANY
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS
+# OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION)
+# HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT,
+# STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING
+# IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+import os
+import stat
+import tempfile
+import threading
+
+import libiocage.lib.helpers
+
+
+class ConfigBatch:
+    """
+    Collects atomic config file writes and syncs their directories once
+
+    Each file is written to a temporary file in the same directory, which
+    is fsynced and renamed over the target right away. Syncing the
+    directories, which makes the renames durable, is deferred until the
+    batch is committed, so that flushing the configs of many jails syncs
+    every directory only once.
+
+    Usage:
+
+        >>> with ConfigBatch(logger=logger) as batch:
+        ...     for jail in jails:
+        ...         jail.config.save(batch=batch)
+
+    Args:
+
+        logger (libiocage.lib.Logger): (optional)
+            Instance of the logger that receives messages
+    """
+
+    def __init__(self, logger=None):
+        libiocage.lib.helpers.init_logger(self, logger)
+        self.directories = set()
+        self.written_files = []
+        self._lock = threading.Lock()
+
+    def write(self, path, data):
+        write_atomic(path, data, sync_directory=False)
+        with self._lock:
+            self.directories.add(os.path.dirname(os.path.abspath(path)))
+            self.written_files.append(path)
+
+    def commit(self):
+
+        for directory in sorted(self.directories):
+            fsync_directory(directory)
+
+        if len(self.written_files) > 0:
+            self.logger.verbose(
+                f"{len(self.written_files)} config files written to "
+                f"{len(self.directories)} directories"
+            )
+
+        self.directories.clear()
+        self.written_files = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        # files already renamed into place are synced on errors as well
+        self.commit()
+
+
+def write(path, data, batch=None):
+    """
+    Atomically write a config file, optionally as part of a ConfigBatch
+    """
+    if batch is None:
+        write_atomic(path, data)
+    else:
+        batch.write(path, data)
+
+
+def write_atomic(path, data, sync_directory=True):
+    """
+    Replace a file with data without exposing partial content
+
+    Args:
+
+        path (string):
+            The file to replace
+
+        data (string|bytes):
+            The new file content
+
+        sync_directory (bool): (default=True)
+            Sync the directory after the rename to make it durable
+    """
+    if isinstance(data, str):
+        data = data.encode()
+
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, temporary_path = tempfile.mkstemp(
+        dir=directory,
+        prefix=f".{os.path.basename(path)}."
+    )
+
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.chmod(temporary_path, _get_file_mode(path))
+        os.rename(temporary_path, path)
+    except BaseException:
+        if os.path.exists(temporary_path):
+            os.remove(temporary_path)
+        raise
+
+    if sync_directory is True:
+        fsync_directory(directory)
+
+
+def fsync_directory(directory):
+    fd = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def _get_file_mode(path):
+    try:
+        return stat.S_IMODE(os.stat(path).st_mode)
+    except FileNotFoundError:
+        # reading the umask would change it for all threads
+        return 0o644
@@ -21,26 +21,49 @@
 # STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING
 # IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
 # POSSIBILITY OF SUCH DAMAGE.
-import libzfs
 
 import libiocage.lib.errors
 import libiocage.lib.helpers
 
 
 class Datasets:
+    """
+    iocage root datasets of all active ZFS pools
+
+    Multiple pools can be active at the same time. Each of them has an
+    own `<POOL>/iocage` root with jails, releases and base datasets. The
+    first active pool (or the explicitly given root) is the primary root
+    that holds host-wide data like logs and defaults. New jails are
+    spread across all roots according to a placement policy:
+
+        least_used: The root on the pool with the lowest capacity usage
+
+        round_robin: Roots are selected in turns
+
+        pinned: Always the primary root unless a pool is specified
+    """
+
     ZFS_POOL_ACTIVE_PROPERTY = "org.freebsd.ioc:active"
+    ZFS_PLACEMENT_PROPERTY = "org.freebsd.ioc:placement"
+    ZFS_PLACEMENT_INDEX_PROPERTY = "org.freebsd.ioc:placement_index"
+
+    PLACEMENT_POLICIES = ("least_used", "round_robin", "pinned")
+    DEFAULT_PLACEMENT_POLICY = "least_used"
 
     def __init__(self, root=None, pool=None, zfs=None, logger=None):
         libiocage.lib.helpers.init_logger(self, logger)
         libiocage.lib.helpers.init_zfs(self, zfs)
 
         self._datasets = {}
+        self._roots = None
 
-        if isinstance(root, libzfs.ZFSDataset):
+        if libiocage.lib.helpers.is_zfs_dataset(root):
             self.root = root
+            # an explicit root is not combined with other pools
+            self._roots = [root]
             return
 
-        if isinstance(pool, libzfs.ZFSPool):
+        if libiocage.lib.helpers.is_zfs_pool(pool):
             self.root = self._get_or_create_dataset(
                 "iocage",
                 root_name=pool.name,
@@ -62,6 +85,30 @@ class Datasets:
                 return pool
         return None
 
+    @property
+    def active_pools(self):
+        return list(filter(self._is_pool_active, self.zfs.pools))
+
+    @property
+    def roots(self):
+        """
+        The iocage root datasets of all active pools (primary root first)
+        """
+        if self._roots is None:
+            roots = [self.root]
+            for pool in self.active_pools:
+                if pool.name == self.root.pool.name:
+                    continue
+                try:
+                    roots.append(self.zfs.get_dataset(f"{pool.name}/iocage"))
+                except libiocage.lib.helpers.ZFSException:
+                    self.logger.warn(
+                        f"ZFS pool '{pool.name}' is active,"
+                        " but has no iocage dataset"
+                    )
+            self._roots = roots
+        return self._roots
+
     @property
     def releases(self):
         return self._get_or_create_dataset("releases")
@@ -78,39 +125,175 @@ class Datasets:
     def logs(self):
         return self._get_or_create_dataset("log")
 
-    def activate(self, mountpoint=None):
-        self.activate_pool(self.root.pool, mountpoint)
+    @property
+    def jails_datasets(self):
+        """
+        The jails datasets of all active pools
+        """
+        return list(map(
+            lambda root: self.get_dataset("jails", root),
+            self.roots
+        ))
+
+    def get_dataset(self, name, root=None):
+        """
+        Get or create a dataset below an iocage root (default: primary)
+        """
+        if root is None:
+            return self._get_or_create_dataset(name)
+
+        return self._get_or_create_dataset(
+            name,
+            root_name=root.name,
+            pool=root.pool
+        )
+
+    def get_root(self, pool_name):
+        """
+        Get the iocage root dataset of an active pool by its name
+        """
+        for root in self.roots:
+            if root.pool.name == pool_name:
+                return root
+
+        raise libiocage.lib.errors.ZFSPoolNotActivated(
+            pool_name=pool_name,
+            logger=self.logger
+        )
+
+    @property
+    def placement_policy(self):
+        policy = self._get_dataset_property(
+            self.root,
+            self.ZFS_PLACEMENT_PROPERTY
+        )
+        if policy in self.PLACEMENT_POLICIES:
+            return policy
+        return self.DEFAULT_PLACEMENT_POLICY
+
+    @placement_policy.setter
+    def placement_policy(self, value):
+        if value not in self.PLACEMENT_POLICIES:
+            raise libiocage.lib.errors.InvalidPlacementPolicy(
+                policy=value,
+                logger=self.logger
+            )
+        self._set_zfs_property(self.root, self.ZFS_PLACEMENT_PROPERTY, value)
+
+    def select_root(self, policy=None, pool_name=None):
+        """
+        Select the iocage root dataset a new jail is placed on
+
+        Args:
+
+            policy (string): (optional)
+                One of least_used, round_robin or pinned
+                (default: the placement policy stored on the primary root)
+
+            pool_name (string): (optional)
+                Pin the jail to the root of this pool
+        """
+        if pool_name is not None:
+            return self.get_root(pool_name)
+
+        if policy is None:
+            policy = self.placement_policy
+
+        roots = self.roots
 
-    def activate_pool(self, pool, mountpoint=None):
+        if (len(roots) == 1) or (policy == "pinned"):
+            return roots[0]
+
+        if policy == "round_robin":
+            return self._select_root_round_robin(roots)
+
+        if policy == "least_used":
+            return min(roots, key=self._get_capacity_usage)
+
+        raise libiocage.lib.errors.InvalidPlacementPolicy(
+            policy=policy,
+            logger=self.logger
+        )
+
+    def _select_root_round_robin(self, roots):
+        try:
+            index = int(self._get_dataset_property(
+                self.root,
+                self.ZFS_PLACEMENT_INDEX_PROPERTY
+            ))
+        except (TypeError, ValueError):
+            index = 0
+
+        self._set_zfs_property(
+            self.root,
+            self.ZFS_PLACEMENT_INDEX_PROPERTY,
+            str((index + 1) % len(roots))
+        )
+        return roots[index % len(roots)]
+
+    def _get_capacity_usage(self, root):
+        properties = root.properties
+        used = int(properties["used"].rawvalue)
+        available = int(properties["available"].rawvalue)
+        return used / max(used + available, 1)
+
+    def activate(self, mountpoint=None, exclusive=True):
+        self.activate_pool(self.root.pool, mountpoint, exclusive=exclusive)
+
+    def activate_pool(self, pool, mountpoint=None, exclusive=True):
+        """
+        Activate a ZFS pool for iocage
+
+        Args:
+
+            pool (libzfs.ZFSPool):
+                The pool to activate
+
+            mountpoint (string): (optional)
+                Mountpoint of the pools iocage root dataset
+
+            exclusive (bool): (default=True)
+                Deactivate all other pools. Otherwise the pool is added
+                to the set of active pools.
+        """
 
         if self._is_pool_active(pool):
             msg = f"ZFS pool '{pool.name}' is already active"
             self.logger.warn(msg)
 
-        if not isinstance(pool, libzfs.ZFSPool):
+        if not libiocage.lib.helpers.is_zfs_pool(pool):
             raise libiocage.lib.errors.ZFSPoolInvalid("cannot activate")
 
         if pool.status == "UNAVAIL":
             raise libiocage.lib.errors.ZFSPoolUnavailable(pool.name)
 
-        other_pools = filter(lambda x: x.name != pool.name, self.zfs.pools)
-        for other_pool in other_pools:
-            self._deactivate_pool(other_pool)
+        if exclusive is True:
+            other_pools = filter(
+                lambda x: x.name != pool.name,
+                self.zfs.pools
+            )
+            for other_pool in other_pools:
+                self._deactivate_pool(other_pool)
 
         self._activate_pool(pool)
 
         root_dataset_args = {
+            "root_name": pool.name,
             "pool": pool
         }
 
         if mountpoint is not None:
             root_dataset_args["mountpoint"] = mountpoint
 
-        self.root = self._get_or_create_dataset(
+        root = self._get_or_create_dataset(
             "iocage",
             **root_dataset_args
         )
 
+        if exclusive is True:
+            self.root = root
+        self._roots = None
+
     def _is_pool_active(self, pool):
         return libiocage.lib.helpers.parse_user_input(self._get_pool_property(
             pool,
@@ -150,7 +333,8 @@ class Datasets:
                 f"Set ZFS property {name}='{value}'"
                 f" on dataset '{dataset.name}'"
             )
-            dataset.properties[name] = libzfs.ZFSUserProperty(value)
+            zfs_property = libiocage.lib.helpers.zfs_user_property(value)
+            dataset.properties[name] = zfs_property
 
     def _get_or_create_dataset(self,
                                name,
@@ -161,11 +345,6 @@ class Datasets:
         if not libiocage.lib.helpers.validate_name(name):
             raise NameError(f"Invalid 'name' for Dataset: {name}")
 
-        try:
-            return self.datasets[name]
-        except (AttributeError, KeyError):
-            pass
-
         if root_name is None:
             root_name = self.root.name
 
@@ -173,6 +352,11 @@ class Datasets:
             pool = self.root.pool
 
         name = f"{root_name}/{name}"
+
+        try:
+            return self._datasets[name]
+        except KeyError:
+            pass
         try:
             dataset = self.zfs.get_dataset(name)
         except:
@@ -180,7 +364,9 @@ class Datasets:
             dataset = self.zfs.get_dataset(name)
 
             if mountpoint is not None:
-                mountpoint_property = libzfs.ZFSUserProperty(mountpoint)
+                mountpoint_property = libiocage.lib.helpers.zfs_user_property(
+                    mountpoint
+                )
                 dataset.properties["mountpoint"] = mountpoint_property
 
             dataset.mount()
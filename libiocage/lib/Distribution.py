@@ -24,12 +24,11 @@
 import os
 import platform
 import re
-import urllib.request
 from typing import List
 
-import requests
-
+import libiocage.lib.HTTPClient
 import libiocage.lib.Release
+import libiocage.lib.ReleaseCatalog
 import libiocage.lib.errors
 import libiocage.lib.helpers
 
@@ -54,6 +53,8 @@ class DistributionGenerator:
         self.available_releases = None
         self.zfs = zfs
         self.logger = logger
+        self._http_client = None
+        self._catalog = None
 
     @property
     def name(self):
@@ -62,6 +63,29 @@ class DistributionGenerator:
         else:
             return platform.system()
 
+    @property
+    def http_client(self):
+        """
+        Lazy-loaded HTTPClient shared by the distribution and its releases
+        """
+        if self._http_client is None:
+            self._http_client = libiocage.lib.HTTPClient.HTTPClient(
+                logger=self.logger
+            )
+        return self._http_client
+
+    @property
+    def catalog(self):
+        """
+        Lazy-loaded ReleaseCatalog of the distribution mirror
+        """
+        if self._catalog is None:
+            self._catalog = libiocage.lib.ReleaseCatalog.ReleaseCatalog(
+                distribution=self,
+                logger=self.logger
+            )
+        return self._catalog
+
     @property
     def mirror_url(self):
 
@@ -87,9 +111,10 @@ class DistributionGenerator:
 
         self.logger.spam(f"Fetching release list from '{self.mirror_url}'")
 
-        resource = urllib.request.urlopen(self.mirror_url)
-        charset = resource.headers.get_content_charset()
-        response = resource.read().decode(charset if charset else "UTF-8")
+        response = self.http_client.get(
+            self.mirror_url,
+            ttl=libiocage.lib.HTTPClient.MIRROR_INDEX_TTL
+        ).text
 
         found_releases = self._parse_links(response)
         eol_list = self._get_eol_list()
@@ -131,13 +156,13 @@ class DistributionGenerator:
     def _get_eol_list(self) -> List[str]:
         """Scrapes the FreeBSD website and returns a list of EOL RELEASES"""
         _eol = "https://www.freebsd.org/security/unsupported.html"
-        req = requests.get(_eol)
-        status = req.status_code == requests.codes.ok
+        req = self.http_client.get(
+            _eol,
+            ttl=libiocage.lib.HTTPClient.EOL_LIST_TTL
+        )
         eol_releases = []
-        if not status:
-            req.raise_for_status()
 
-        for eol in req.content.decode("iso-8859-1").split():
+        for eol in req.body.decode("iso-8859-1").split():
             eol = eol.strip("href=").strip("/").split(">")
             # We want a dynamic EOL
             try:
@@ -0,0 +1,290 @@
+# Copyright (c) 2014-2017, iocage
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted providing that the following conditions
+# are met:
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in the
+#    documentation and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE AUTHOR ``AS IS'' AND ANY EXPRESS OR
+# IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED.  IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR ANY
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS
+# OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION)
+# HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT,
+# STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING
+# IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+"""
+Pooled HTTP client with an on-disk cache for remote metadata
+
+Mirror indexes, the EOL list and release availability change rarely. The
+client keeps the responses with their ETag and Last-Modified validators
+and only revalidates them with a conditional request once their TTL has
+expired.
+"""
+import hashlib
+import http.client
+import json
+import os
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+
+import libiocage.lib.HTTPDownloader
+import libiocage.lib.errors
+import libiocage.lib.helpers
+
+# seconds until cached responses are revalidated
+MIRROR_INDEX_TTL = 60 * 60
+EOL_LIST_TTL = 24 * 60 * 60
+AVAILABILITY_TTL = 60 * 60
+
+
+class HTTPCacheEntry:
+
+    def __init__(
+        self,
+        url,
+        status,
+        body=b"",
+        charset=None,
+        etag=None,
+        last_modified=None,
+        size=None,
+        fetched_at=None
+    ):
+        self.url = url
+        self.status = status
+        self.body = body
+        self.charset = charset
+        self.size = size
+        self.etag = etag
+        self.last_modified = last_modified
+        self.fetched_at = time.time() if fetched_at is None else fetched_at
+
+    @property
+    def age(self):
+        return time.time() - self.fetched_at
+
+    @property
+    def text(self):
+        return self.body.decode(self.charset if self.charset else "UTF-8")
+
+    @property
+    def validators(self):
+        headers = {}
+        if self.etag is not None:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified is not None:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+    def to_dict(self):
+        return dict(
+            url=self.url,
+            status=self.status,
+            charset=self.charset,
+            etag=self.etag,
+            last_modified=self.last_modified,
+            size=self.size,
+            fetched_at=self.fetched_at
+        )
+
+
+class HTTPClient:
+    """
+    HTTP client for small metadata resources
+
+    Connections are kept alive in a shared pool. Successful GET and HEAD
+    responses are cached in memory and in cache_dir, so that a resource is
+    requested at most once per TTL, even across processes. Expired entries
+    are revalidated with a conditional request and served stale when the
+    server cannot be reached or fails with a 5xx status. Schemes other than
+    http(s) are requested with urllib and are not cached.
+
+    Args:
+
+        cache_dir (string): (optional)
+            Directory of the response cache. Responses are only cached in
+            memory when it is not writable
+
+        pool (libiocage.lib.HTTPDownloader.HTTPConnectionPool): (optional)
+            Connection pool shared with other clients
+    """
+
+    DEFAULT_CACHE_DIR = "/var/cache/iocage/http"
+
+    def __init__(self, cache_dir=None, pool=None, logger=None):
+        libiocage.lib.helpers.init_logger(self, logger)
+        if cache_dir is None:
+            cache_dir = HTTPClient.DEFAULT_CACHE_DIR
+        self.cache_dir = cache_dir
+        if pool is None:
+            pool = libiocage.lib.HTTPDownloader.HTTPConnectionPool()
+        self.pool = pool
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, url, ttl=0):
+        """
+        Response body of a resource as HTTPCacheEntry
+
+        Raises libiocage.lib.errors.DownloadFailed unless the resource
+        was returned with status 200.
+        """
+        return self._require_ok(self._request("GET", url, ttl))
+
+    def head(self, url, ttl=0):
+        """
+        Headers of a resource as HTTPCacheEntry without body
+
+        Raises libiocage.lib.errors.DownloadFailed unless the resource
+        exists.
+        """
+        return self._require_ok(self._request("HEAD", url, ttl))
+
+    def exists(self, url, ttl=0):
+        """
+        Whether a HEAD request on the resource succeeds
+        """
+        try:
+            return self._request("HEAD", url, ttl).status == 200
+        except (OSError, http.client.HTTPException):
+            return False
+
+    def close(self):
+        self.pool.close()
+
+    def _require_ok(self, entry):
+        if entry.status != 200:
+            raise libiocage.lib.errors.DownloadFailed(
+                entry.url,
+                reason=f"HTTP {entry.status}",
+                logger=self.logger
+            )
+        return entry
+
+    def _request(self, method, url, ttl):
+
+        scheme = urllib.parse.urlsplit(url).scheme
+        if scheme not in ("http", "https"):
+            return self._request_urllib(method, url)
+
+        cached = self._read_entry(method, url)
+
+        if (cached is not None) and (cached.age < ttl):
+            self.logger.spam(f"Using cached response of {method} {url}")
+            return cached
+
+        headers = {} if cached is None else cached.validators
+        self.logger.spam(f"Requesting {method} {url}")
+        try:
+            with self.pool.request(method, url, headers=headers) as response:
+                body = response.read()
+                if (response.status == 304) and (cached is not None):
+                    self.logger.spam(f"{url} was not modified")
+                    cached.fetched_at = time.time()
+                    entry = cached
+                else:
+                    charset = response.msg.get_content_charset()
+                    length = response.getheader("Content-Length")
+                    entry = HTTPCacheEntry(
+                        url=url,
+                        status=response.status,
+                        body=body,
+                        charset=charset,
+                        etag=response.getheader("ETag"),
+                        last_modified=response.getheader("Last-Modified"),
+                        size=None if (length is None) else int(length)
+                    )
+        except (OSError, http.client.HTTPException) as e:
+            if cached is None:
+                raise
+            self.logger.warn(f"Using stale response of {url}: {e}")
+            return cached
+
+        if (entry.status >= 500) and (cached is not None):
+            self.logger.warn(
+                f"Using stale response of {url}: HTTP {entry.status}"
+            )
+            return cached
+
+        if entry.status == 200:
+            self._write_entry(method, entry)
+        return entry
+
+    def _request_urllib(self, method, url):
+        request = urllib.request.Request(url, method=method)
+        try:
+            resource = urllib.request.urlopen(request)
+        except urllib.error.HTTPError as e:
+            return HTTPCacheEntry(url=url, status=e.code)
+        body = b"" if (method == "HEAD") else resource.read()
+        length = resource.headers.get("Content-Length")
+        return HTTPCacheEntry(
+            url=url,
+            status=resource.getcode() or 200,
+            body=body,
+            charset=resource.headers.get_content_charset(),
+            size=None if (length is None) else int(length)
+        )
+
+    def _get_entry_path(self, method, url):
+        key = hashlib.sha256(f"{method} {url}".encode()).hexdigest()
+        return f"{self.cache_dir}/{key}"
+
+    def _read_entry(self, method, url):
+        with self._lock:
+            entry = self._entries.get((method, url))
+        if entry is not None:
+            return entry
+
+        path = self._get_entry_path(method, url)
+        try:
+            with open(path, "rb") as f:
+                data = json.loads(f.readline().decode())
+                body = f.read()
+        except (OSError, ValueError):
+            return None
+
+        if data.get("url") != url:
+            return None
+
+        entry = HTTPCacheEntry(body=body, **data)
+        with self._lock:
+            self._entries[(method, url)] = entry
+        return entry
+
+    def _write_entry(self, method, entry):
+        with self._lock:
+            self._entries[(method, entry.url)] = entry
+
+        path = self._get_entry_path(method, entry.url)
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            # metadata is stored in the first line in front of the body
+            metadata = json.dumps(entry.to_dict()).encode()
+            _write_atomic(path, metadata + b"\n" + entry.body)
+        except OSError as e:
+            self.logger.spam(f"Response of {entry.url} was not cached: {e}")
+
+
+def _write_atomic(path, data):
+    temporary_path = f"{path}.{os.getpid()}.{threading.get_ident()}"
+    try:
+        with open(temporary_path, "wb") as f:
+            f.write(data)
+        os.rename(temporary_path, path)
+    except OSError:
+        if os.path.exists(temporary_path):
+            os.remove(temporary_path)
+        raise
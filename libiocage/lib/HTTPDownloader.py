@@ -0,0 +1,575 @@
+# Copyright (c) 2014-2017, iocage
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted providing that the following conditions
+# are met:
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in the
+#    documentation and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE AUTHOR ``AS IS'' AND ANY EXPRESS OR
+# IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED.  IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR ANY
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS
+# OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION)
+# HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT,
+# STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING
+# IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+"""
+Concurrent and resumable HTTP downloads
+
+Example:
+
+    downloader = HTTPDownloader(logger=logger)
+    downloads = [Download(url, path) for url, path in assets]
+    for download in downloader.download(downloads):
+        print(download.name, download.transferred, download.size)
+"""
+import concurrent.futures
+import contextlib
+import http.client
+import json
+import os
+import queue
+import shutil
+import threading
+import time
+import urllib.parse
+import urllib.request
+from timeit import default_timer as timer
+
+import libiocage.lib.errors
+import libiocage.lib.helpers
+
+REDIRECT_STATUS_CODES = (301, 302, 303, 307, 308)
+MAX_REDIRECTS = 5
+
+
+class Download:
+    """
+    A file that is downloaded to a local path
+
+    Data is written to <path>.part until the download is complete. Ranged
+    chunk downloads store their progress in <path>.part.json, so that an
+    interrupted download continues where it stopped.
+
+    Args:
+
+        url (string):
+            Remote location of the file
+
+        path (string):
+            Local destination of the file
+
+        name (string): (optional)
+            Name reported with progress (default: the file name)
+
+        sink (object): (optional)
+            Receives all bytes of the file in order with sink.write(),
+            including a resumed prefix. Chunks of split downloads are passed
+            to the sink in order once all chunks before them are complete
+    """
+
+    def __init__(self, url, path, name=None, sink=None):
+        self.url = url
+        self.path = path
+        self.name = os.path.basename(path) if name is None else name
+        self.sink = sink
+        self.size = None
+        self.transferred = 0
+        self.resumed_at = 0
+        self.started_at = None
+        self.done = False
+        self.error = None
+
+    @property
+    def part_path(self):
+        return f"{self.path}.part"
+
+    @property
+    def state_path(self):
+        return f"{self.path}.part.json"
+
+    @property
+    def duration(self):
+        if self.started_at is None:
+            return None
+        return timer() - self.started_at
+
+
+class HTTPConnectionPool:
+    """
+    Keep-alive HTTP(S) connections shared between threads
+
+    Args:
+
+        max_connections (int): (default=8)
+            Maximum number of concurrently used connections
+
+        timeout (int): (default=30)
+            Socket timeout in seconds
+    """
+
+    def __init__(self, max_connections=8, timeout=30):
+        self.timeout = timeout
+        self._idle = {}
+        self._lock = threading.Lock()
+        self._semaphore = threading.BoundedSemaphore(max_connections)
+
+    @contextlib.contextmanager
+    def request(self, method, url, headers=None):
+        """
+        Send a request and yield the response
+
+        Redirects are followed. The connection is returned to the pool
+        when the response body was read completely and closed otherwise.
+        """
+
+        headers = {} if headers is None else headers
+
+        with self._semaphore:
+            for i in range(MAX_REDIRECTS + 1):
+                key, connection, response = self._send(method, url, headers)
+                if response.status not in REDIRECT_STATUS_CODES:
+                    break
+                response.read()
+                self._release(key, connection, response)
+                url = urllib.parse.urljoin(url, response.getheader("Location"))
+
+            try:
+                yield response
+            except BaseException:
+                connection.close()
+                raise
+
+            self._release(key, connection, response)
+
+    def close(self):
+        with self._lock:
+            for connections in self._idle.values():
+                for connection in connections:
+                    connection.close()
+            self._idle = {}
+
+    def _send(self, method, url, headers):
+        parsed = urllib.parse.urlsplit(url)
+        key = (parsed.scheme, parsed.hostname, parsed.port)
+        path = parsed.path or "/"
+        if parsed.query:
+            path += f"?{parsed.query}"
+
+        connection = self._acquire(key)
+        try:
+            connection.request(method, path, headers=headers)
+            return key, connection, connection.getresponse()
+        except (http.client.HTTPException, ConnectionError):
+            # idle keep-alive connections may have been closed remotely
+            connection.close()
+
+        connection = self._create(key)
+        connection.request(method, path, headers=headers)
+        return key, connection, connection.getresponse()
+
+    def _acquire(self, key):
+        with self._lock:
+            try:
+                return self._idle[key].pop()
+            except (KeyError, IndexError):
+                pass
+        return self._create(key)
+
+    def _create(self, key):
+        scheme, host, port = key
+        if scheme == "https":
+            connection_class = http.client.HTTPSConnection
+        else:
+            connection_class = http.client.HTTPConnection
+        return connection_class(host, port, timeout=self.timeout)
+
+    def _release(self, key, connection, response):
+        if response.isclosed() is False:
+            connection.close()
+            return
+        with self._lock:
+            self._idle.setdefault(key, []).append(connection)
+
+
+class HTTPDownloader:
+    """
+    Download files concurrently with resume and ranged chunks
+
+    Args:
+
+        max_workers (int): (default=4)
+            Number of files downloaded in parallel. The limit is shared by
+            all concurrent download() calls
+
+        max_connections (int): (default=8)
+            Number of concurrent HTTP connections
+
+        split_size (int): (default=32MiB)
+            Files of at least this size are downloaded in parallel ranged
+            chunks when the server supports ranges
+
+        chunk_size (int): (default=8MiB)
+            Size of the ranged chunks
+
+        progress_interval (float): (default=0.5)
+            Minimum seconds between progress reports of a download
+
+        max_rate (int): (optional)
+            Bandwidth limit of all downloads in bytes per second
+    """
+
+    BUFFER_SIZE = 128 * 1024
+
+    def __init__(
+        self,
+        max_workers=4,
+        max_connections=8,
+        split_size=32 * 1024 * 1024,
+        chunk_size=8 * 1024 * 1024,
+        progress_interval=0.5,
+        max_rate=None,
+        logger=None
+    ):
+
+        libiocage.lib.helpers.init_logger(self, logger)
+        self.max_workers = max_workers
+        self.max_connections = max_connections
+        self.split_size = split_size
+        self.chunk_size = chunk_size
+        self.progress_interval = progress_interval
+        self.pool = HTTPConnectionPool(max_connections=max_connections)
+        self._slots = threading.BoundedSemaphore(max_workers)
+        self._rate_limiter = None
+        if max_rate is not None:
+            self._rate_limiter = _RateLimiter(max_rate)
+
+    def download(self, downloads):
+        """
+        Download files concurrently
+
+        Yields each Download whenever its progress is reported and once
+        more when it is done or failed (download.error is set). Failed
+        downloads do not abort the others.
+        """
+
+        messages = queue.Queue()
+        downloads = list(downloads)
+
+        if len(downloads) == 0:
+            return
+
+        with concurrent.futures.ThreadPoolExecutor(
+            max_workers=self.max_workers
+        ) as executor:
+
+            for download in downloads:
+                executor.submit(self._run, download, messages)
+
+            pending = len(downloads)
+            while pending > 0:
+                download, final = messages.get()
+                if final is True:
+                    pending -= 1
+                elif download.done or (download.error is not None):
+                    # outdated progress of a finished download
+                    continue
+                yield download
+
+    def close(self):
+        self.pool.close()
+
+    def _run(self, download, messages):
+        reporter = _ProgressReporter(
+            download,
+            messages,
+            self.progress_interval,
+            self._rate_limiter
+        )
+        try:
+            with self._slots:
+                download.started_at = timer()
+                self._download(download, reporter)
+            download.done = True
+        except Exception as e:
+            self.logger.warn(f"Download of {download.url} failed: {e}")
+            download.error = e
+        messages.put((download, True))
+
+    def _download(self, download, reporter):
+
+        scheme = urllib.parse.urlsplit(download.url).scheme
+        if scheme not in ("http", "https"):
+            self._download_url(download, reporter)
+            return
+
+        size, accepts_ranges = self._head(download.url)
+        download.size = size
+
+        chunked = (size is not None) and (accepts_ranges is True) and \
+            (size >= self.split_size)
+
+        if chunked:
+            self._download_chunked(download, reporter)
+        else:
+            self._download_stream(download, accepts_ranges, reporter)
+
+        os.rename(download.part_path, download.path)
+        if os.path.isfile(download.state_path):
+            os.remove(download.state_path)
+
+        self.logger.verbose(f"{download.url} was saved to {download.path}")
+
+    def _head(self, url):
+        with self.pool.request("HEAD", url) as response:
+            response.read()
+            self._require_status(url, response, (200,))
+            length = response.getheader("Content-Length")
+            accept_ranges = response.getheader("Accept-Ranges", "none")
+        size = None if length is None else int(length)
+        return size, (accept_ranges == "bytes")
+
+    def _download_stream(self, download, accepts_ranges, reporter):
+
+        offset = 0
+        if (accepts_ranges is True) and os.path.isfile(download.part_path):
+            if not os.path.isfile(download.state_path):
+                offset = os.path.getsize(download.part_path)
+
+        if (download.size is not None) and (offset > download.size):
+            offset = 0
+
+        if (offset > 0) and (offset == download.size):
+            if download.sink is not None:
+                self._write_part_to_sink(download, offset)
+            download.transferred = download.resumed_at = offset
+            return
+
+        headers = {}
+        if offset > 0:
+            headers["Range"] = f"bytes={offset}-"
+            self.logger.verbose(
+                f"Resuming download of {download.url} at {offset} bytes"
+            )
+
+        with self.pool.request("GET", download.url, headers) as response:
+            self._require_status(download.url, response, (200, 206))
+            if response.status == 200:
+                offset = 0
+            elif download.sink is not None:
+                self._write_part_to_sink(download, offset)
+
+            download.transferred = download.resumed_at = offset
+            mode = "ab" if offset > 0 else "wb"
+            with open(download.part_path, mode) as f:
+                for data in iter(
+                    lambda: response.read(self.BUFFER_SIZE),
+                    b""
+                ):
+                    f.write(data)
+                    if download.sink is not None:
+                        download.sink.write(data)
+                    reporter.add(len(data))
+
+    def _write_part_to_sink(self, download, size, offset=0):
+        with open(download.part_path, "rb") as f:
+            f.seek(offset)
+            while size > 0:
+                data = f.read(min(self.BUFFER_SIZE, size))
+                if len(data) == 0:
+                    break
+                download.sink.write(data)
+                size -= len(data)
+
+    def _download_chunked(self, download, reporter):
+
+        size = download.size
+        state = self._read_state(download)
+        chunks = [
+            (start, min(start + self.chunk_size, size) - 1)
+            for start in range(0, size, self.chunk_size)
+        ]
+        missing = [
+            (i, chunk) for i, chunk in enumerate(chunks)
+            if i not in state["completed"]
+        ]
+
+        completed_bytes = sum(
+            chunks[i][1] - chunks[i][0] + 1 for i in state["completed"]
+        )
+        download.transferred = download.resumed_at = completed_bytes
+
+        if len(missing) < len(chunks):
+            self.logger.verbose(
+                f"Resuming download of {download.url}"
+                f" ({len(chunks) - len(missing)}/{len(chunks)} chunks done)"
+            )
+
+        with open(download.part_path, "ab") as f:
+            f.truncate(size)
+
+        # chunks finish in any order, the sink receives them in sequence
+        completed = set(state["completed"])
+        sink_position = 0
+
+        def write_completed_chunks_to_sink():
+            nonlocal sink_position
+            if download.sink is None:
+                return
+            while (sink_position < len(chunks)) and \
+                    (sink_position in completed):
+                start, end = chunks[sink_position]
+                self._write_part_to_sink(download, end - start + 1, start)
+                sink_position += 1
+
+        write_completed_chunks_to_sink()
+
+        fd = os.open(download.part_path, os.O_WRONLY)
+        try:
+            with concurrent.futures.ThreadPoolExecutor(
+                max_workers=self.max_connections
+            ) as executor:
+                futures = {
+                    executor.submit(
+                        self._download_chunk,
+                        download,
+                        fd,
+                        chunk,
+                        reporter
+                    ): i for i, chunk in missing
+                }
+                for future in concurrent.futures.as_completed(futures):
+                    future.result()
+                    state["completed"].append(futures[future])
+                    self._write_state(download, state)
+                    completed.add(futures[future])
+                    write_completed_chunks_to_sink()
+        finally:
+            os.close(fd)
+
+    def _download_chunk(self, download, fd, chunk, reporter):
+        start, end = chunk
+        headers = {"Range": f"bytes={start}-{end}"}
+        with self.pool.request("GET", download.url, headers) as response:
+            self._require_status(download.url, response, (206,))
+            offset = start
+            for data in iter(lambda: response.read(self.BUFFER_SIZE), b""):
+                os.pwrite(fd, data, offset)
+                offset += len(data)
+                reporter.add(len(data))
+
+        if offset != (end + 1):
+            raise libiocage.lib.errors.DownloadFailed(
+                url=download.url,
+                reason=f"chunk {start}-{end} is incomplete",
+                logger=self.logger
+            )
+
+    def _read_state(self, download):
+        expected = dict(url=download.url, size=download.size)
+        if os.path.isfile(download.part_path):
+            try:
+                with open(download.state_path, "r") as f:
+                    state = json.load(f)
+                if all(state.get(key) == expected[key] for key in expected):
+                    return state
+            except (OSError, ValueError):
+                pass
+            os.remove(download.part_path)
+        return dict(completed=[], **expected)
+
+    def _write_state(self, download, state):
+        temporary_path = f"{download.state_path}.tmp"
+        with open(temporary_path, "w") as f:
+            json.dump(state, f)
+        os.rename(temporary_path, download.state_path)
+
+    def _download_url(self, download, reporter):
+        # ftp and other schemes are downloaded without resume
+        with urllib.request.urlopen(download.url) as response, \
+                open(download.part_path, "wb") as f:
+            length = response.getheader("Content-Length")
+            download.size = None if length is None else int(length)
+            shutil.copyfileobj(
+                _ReportingReader(response, reporter, download.sink),
+                f
+            )
+        os.rename(download.part_path, download.path)
+
+    def _require_status(self, url, response, status_codes):
+        if response.status not in status_codes:
+            raise libiocage.lib.errors.DownloadFailed(
+                url=url,
+                reason=f"HTTP {response.status} {response.reason}",
+                logger=self.logger
+            )
+
+
+class _RateLimiter:
+    """
+    Token bucket shared by all transfers of a downloader
+    """
+
+    def __init__(self, rate):
+        self.rate = rate
+        self._allowance = rate
+        self._last_update = timer()
+        self._lock = threading.Lock()
+
+    def consume(self, size):
+        with self._lock:
+            now = timer()
+            self._allowance = min(
+                self._allowance + (now - self._last_update) * self.rate,
+                self.rate
+            )
+            self._last_update = now
+            self._allowance -= size
+            delay = -self._allowance / self.rate
+        if delay > 0:
+            time.sleep(delay)
+
+
+class _ProgressReporter:
+
+    def __init__(self, download, messages, interval, rate_limiter=None):
+        self.download = download
+        self.messages = messages
+        self.interval = interval
+        self.rate_limiter = rate_limiter
+        self._lock = threading.Lock()
+        self._last_report = 0
+
+    def add(self, size):
+        if self.rate_limiter is not None:
+            self.rate_limiter.consume(size)
+        with self._lock:
+            self.download.transferred += size
+            now = timer()
+            if (now - self._last_report) < self.interval:
+                return
+            self._last_report = now
+        self.messages.put((self.download, False))
+
+
+class _ReportingReader:
+
+    def __init__(self, source, reporter, sink=None):
+        self.source = source
+        self.reporter = reporter
+        self.sink = sink
+
+    def read(self, size=-1):
+        data = self.source.read(size)
+        if self.sink is not None:
+            self.sink.write(data)
+        self.reporter.add(len(data))
+        return data
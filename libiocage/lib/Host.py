@@ -27,6 +27,9 @@ import platform
 import libiocage.lib.Datasets
 import libiocage.lib.DevfsRules
 import libiocage.lib.Distribution
+import libiocage.lib.JailConfigDefaults
+import libiocage.lib.JailIndex
+import libiocage.lib.JailQueryIndex
 import libiocage.lib.helpers
 
 
@@ -34,6 +37,9 @@ class HostGenerator:
 
     _class_distribution = libiocage.lib.Distribution.DistributionGenerator
 
+    # seconds until the mtime of defaults.json is checked again
+    DEFAULTS_REVALIDATE_INTERVAL = 1
+
     def __init__(self, root_dataset=None, zfs=None, logger=None):
 
         libiocage.lib.helpers.init_logger(self, logger)
@@ -45,10 +51,14 @@ class HostGenerator:
         )
         self.distribution = self._class_distribution(
             host=self,
+            zfs=self.zfs,
             logger=self.logger
         )
 
         self._devfs = None
+        self._defaults = None
+        self._jail_index = None
+        self._query_index = None
         self.releases_dataset = None
 
     @property
@@ -62,6 +72,50 @@ class HostGenerator:
             )
         return self._devfs
 
+    @property
+    def defaults(self):
+        """
+        Jail config defaults of the host, shared by all jails
+
+        The defaults.json file is parsed once and reloaded when its mtime
+        changes.
+        """
+        if self._defaults is None:
+            root_mountpoint = self.datasets.root.mountpoint
+            self._defaults = \
+                libiocage.lib.JailConfigDefaults.JailConfigDefaults(
+                    file=f"{root_mountpoint}/defaults.json",
+                    logger=self.logger,
+                    revalidate_interval=self.DEFAULTS_REVALIDATE_INTERVAL
+                )
+        else:
+            self._defaults.revalidate()
+        return self._defaults
+
+    @property
+    def jail_index(self):
+        """
+        Lazy-loaded JailIndex of the host
+        """
+        if self._jail_index is None:
+            self._jail_index = libiocage.lib.JailIndex.JailIndex(
+                host=self,
+                logger=self.logger
+            )
+        return self._jail_index
+
+    @property
+    def query_index(self):
+        """
+        Lazy-loaded JailQueryIndex of the host
+        """
+        if self._query_index is None:
+            self._query_index = libiocage.lib.JailQueryIndex.JailQueryIndex(
+                host=self,
+                logger=self.logger
+            )
+        return self._query_index
+
     @property
     def userland_version(self):
         return float(self.release_version.partition("-")[0])
@@ -21,17 +21,19 @@
 # STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING
 # IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
 # POSSIBILITY OF SUCH DAMAGE.
+import json
 import os
 import subprocess
 import uuid
+from timeit import default_timer as timer
 
 import libiocage.lib.DevfsRules
 import libiocage.lib.JailConfig
+import libiocage.lib.JailStream
 import libiocage.lib.Network
 import libiocage.lib.NullFSBasejailStorage
 import libiocage.lib.RCConf
 import libiocage.lib.Release
-import libiocage.lib.Releases
 import libiocage.lib.StandaloneJailStorage
 import libiocage.lib.Storage
 import libiocage.lib.ZFSBasejailStorage
@@ -87,7 +89,8 @@ class JailGenerator:
     _class_host = libiocage.lib.Host.HostGenerator
     _class_storage = libiocage.lib.Storage.Storage
 
-    def __init__(self, data={}, zfs=None, host=None, logger=None, new=False):
+    def __init__(self, data={}, zfs=None, host=None, logger=None, new=False,
+                 jails_dataset_name=None):
         """
         Initializes a Jail
 
@@ -105,12 +108,18 @@ class JailGenerator:
             logger (libiocage.lib.Logger): (optional)
                 Inherit an existing Logger instance from ancestor classes
 
+            jails_dataset_name (string): (optional)
+                Name of the jails dataset on the pool the jail is stored on.
+                Jails looked up by name are searched on all active pools.
+
         """
 
         libiocage.lib.helpers.init_logger(self, logger)
         libiocage.lib.helpers.init_zfs(self, zfs)
         libiocage.lib.helpers.init_host(self, host)
 
+        self._jails_dataset_name = jails_dataset_name
+
         if isinstance(data, str):
             data = {
                 "id": self._resolve_name(data)
@@ -133,18 +142,32 @@ class JailGenerator:
         )
 
         self.jail_state = None
+        self._jail_state_resolved = False
         self._dataset_name = None
         self._rc_conf = None
+        self.config_format = None
 
         if new is False:
-            self.config.read()
+            self.read_config()
+
+    def read_config(self):
+        """
+        Read the jail config in the format cached in the host's jail index
+        """
+        jail_index = self.host.jail_index
+        name = self.config["id"]
+
+        self.config_format = self.config.read(
+            config_format=jail_index.get_config_format(name)
+        )
+        jail_index.set_config_format(name, self.config_format)
 
     @property
     def zfs_pool_name(self):
         """
         Name of the ZFS pool the jail is stored on
         """
-        return self.host.datasets.root.name.split("/", maxsplit=1)[0]
+        return self.jails_dataset_name.split("/", maxsplit=1)[0]
 
     @property
     def _rc_conf_path(self):
@@ -288,6 +311,8 @@ class JailGenerator:
             self.require_jail_stopped()
 
         self.storage.delete_dataset_recursive(self.dataset)
+        self.host.jail_index.remove(self.config["id"])
+        self.host.query_index.remove_jail(self.config["id"])
 
     def rename(self, new_name: str):
         """
@@ -306,6 +331,79 @@ class JailGenerator:
             self.config["name"] = current_id
             raise
 
+        jail_index = self.host.jail_index
+        jail_index.remove(current_id)
+        jail_index.set_config_format(self.config["id"], self.config_format)
+        self.host.query_index.rename_jail(current_id, self)
+
+    def rebase(self, generation=None):
+        """
+        Move a standalone jail to another generation of its release
+
+        The jail root is cloned from the generation and the changes made
+        inside the jail are carried over, so that updating the release once
+        is enough to patch all jails cloned from it.
+
+        Args:
+
+            generation (string): (optional)
+                Identifier of the target generation. Defaults to the
+                current generation of the release
+        """
+
+        self.require_jail_existing()
+        self.require_jail_stopped()
+
+        jailRebaseEvent = libiocage.lib.events.JailRebase(jail=self)
+        yield jailRebaseEvent.begin()
+
+        try:
+            if self.config["type"] == "basejail":
+                raise libiocage.lib.errors.JailRebaseFailure(
+                    jail=self,
+                    reason="basejails follow their release automatically",
+                    logger=self.logger
+                )
+
+            source_identifier = self.config["release_generation"]
+            if source_identifier is None:
+                raise libiocage.lib.errors.JailRebaseFailure(
+                    jail=self,
+                    reason="the jail does not know its release generation",
+                    logger=self.logger
+                )
+
+            release = self.release
+            source_generation = release.get_generation(source_identifier)
+            if generation is None:
+                target_generation = release.current_generation
+            else:
+                target_generation = release.get_generation(generation)
+        except Exception as e:
+            yield jailRebaseEvent.fail(e)
+            raise
+
+        if target_generation.identifier == source_identifier:
+            yield jailRebaseEvent.skip(message="already up to date")
+            return
+
+        try:
+            libiocage.lib.StandaloneJailStorage.StandaloneJailStorage.rebase(
+                self.storage,
+                source_generation,
+                target_generation
+            )
+        except Exception as e:
+            yield jailRebaseEvent.fail(e)
+            raise
+
+        self.config.data["release_generation"] = target_generation.identifier
+        self.config.save()
+
+        yield jailRebaseEvent.end(message=(
+            f"{source_identifier} -> {target_generation.identifier}"
+        ))
+
     def _force_stop(self):
 
         successful = True
@@ -340,7 +438,7 @@ class JailGenerator:
 
         return successful
 
-    def create(self, release_name):
+    def create(self, release_name, pool_name=None, placement_policy=None):
         """
         Create a Jail from a Release
 
@@ -348,29 +446,18 @@ class JailGenerator:
 
             release_name (string):
                 The jail is created from the release matching the name provided
-        """
 
-        self.require_jail_not_existing()
-
-        # check if release exists
-        releases = libiocage.lib.Releases.Releases(
-            host=self.host,
-            zfs=self.zfs,
-            logger=self.logger
-        )
+            pool_name (string): (optional)
+                Pin the jail to an active pool
 
-        filteres_released = list(filter(
-            lambda x: x.name == release_name,
-            releases.local
-        ))
+            placement_policy (string): (optional)
+                Override the hosts policy to select an active pool
+        """
 
-        if len(filteres_released) == 0:
-            raise libiocage.lib.errors.ReleaseNotFetched(
-                name=release_name,
-                logger=self.logger
-            )
+        self._place_jail(pool_name, placement_policy)
+        self.require_jail_not_existing()
 
-        release = filteres_released[0]
+        release = self._get_pool_local_release(release_name)
         self.config["release"] = release.name
 
         if not self.config["id"]:
@@ -404,6 +491,199 @@ class JailGenerator:
         self.config.data["release"] = release.name
         self.config.save()
 
+    def _place_jail(self, pool_name=None, placement_policy=None):
+        """
+        Select the pool of a new jail unless it is already known
+
+        A jail with the same name on any active pool takes precedence,
+        so that require_jail_not_existing() can detect it.
+        """
+
+        if self._jails_dataset_name is not None:
+            return
+
+        if self.config["id"]:
+            match = self._lookup_jail_dataset(self.config["id"])
+            if match is not None:
+                self._jails_dataset_name = match[0].name
+                return
+
+        iocage_dataset = self.host.datasets.select_root(
+            policy=placement_policy,
+            pool_name=pool_name
+        )
+        jails_dataset = self.host.datasets.get_dataset("jails", iocage_dataset)
+        self._jails_dataset_name = jails_dataset.name
+
+    def _get_pool_local_release(self, release_name):
+        """
+        Get the release on the jails pool and replicate it if required
+        """
+
+        release = libiocage.lib.Release.Release(
+            name=release_name,
+            logger=self.logger,
+            host=self.host,
+            zfs=self.zfs,
+            iocage_dataset=self.iocage_dataset
+        )
+
+        if release.fetched:
+            return release
+
+        for iocage_dataset in self.host.datasets.roots:
+            source = libiocage.lib.Release.Release(
+                name=release_name,
+                logger=self.logger,
+                host=self.host,
+                zfs=self.zfs,
+                iocage_dataset=iocage_dataset
+            )
+            if (source.dataset_name != release.dataset_name) and \
+                    source.fetched:
+                release.replicate(source)
+                return release
+
+        raise libiocage.lib.errors.ReleaseNotFetched(
+            name=release_name,
+            logger=self.logger
+        )
+
+    def export(self,
+               destination,
+               snapshot_name=None,
+               incremental_from=None,
+               compression="gzip"):
+        """
+        Write the jail and its configuration as stream to a file object
+
+        The stream is piped from `zfs send` without temporary copies.
+
+        Args:
+
+            destination (file):
+                Binary file object the stream is written to (e.g. stdout)
+
+            snapshot_name (string): (optional)
+                Name of the snapshot to send. It gets created recursively
+                when it does not exist yet (default: ioc-export-<DATE>)
+
+            incremental_from (string): (optional)
+                Only send the delta from a snapshot that the receiving
+                host already has
+
+            compression (string): (default="gzip")
+                One of none, gzip, bzip2 or xz
+        """
+
+        self.require_jail_existing()
+
+        stream = libiocage.lib.JailStream.JailStream(
+            compression=compression,
+            logger=self.logger
+        )
+
+        if snapshot_name is None:
+            snapshot_name = stream.default_snapshot_name()
+
+        jailExportEvent = libiocage.lib.events.JailExport(jail=self)
+        yield jailExportEvent.begin()
+
+        started_at = timer()
+        format_transfer = libiocage.lib.JailStream.format_transfer
+
+        try:
+            stream.snapshot(self.dataset_name, snapshot_name)
+            header = stream.create_header(
+                name=self.name,
+                snapshot=snapshot_name,
+                incremental_from=incremental_from,
+                config=json.loads(str(self.config))
+            )
+            transferred = 0
+            for transferred in stream.send(
+                destination,
+                self.dataset_name,
+                header
+            ):
+                yield jailExportEvent.step(message=format_transfer(
+                    transferred,
+                    timer() - started_at
+                ))
+        except Exception as e:
+            yield jailExportEvent.fail(e)
+            raise
+
+        yield jailExportEvent.end(message=format_transfer(
+            transferred,
+            timer() - started_at
+        ))
+
+    def import_stream(self, source, force=False):
+        """
+        Create or update the jail from a stream written by export()
+
+        The name stored in the stream is used unless the jail was
+        initialized with a different name.
+
+        Args:
+
+            source (file):
+                Binary file object the stream is read from (e.g. stdin)
+
+            force (bool): (default=False)
+                Overwrite an existing jail with a full stream
+        """
+
+        stream = libiocage.lib.JailStream.JailStream(logger=self.logger)
+        header = stream.read_header(source)
+
+        if not self.config["id"]:
+            self.config["name"] = header["name"]
+
+        self._place_jail()
+
+        if header["incremental_from"] is not None:
+            self.require_jail_existing()
+            self.require_jail_stopped()
+        elif force is False:
+            self.require_jail_not_existing()
+
+        # ensure the parent dataset exists
+        self.host.datasets.get_dataset("jails", self.iocage_dataset)
+
+        jailImportEvent = libiocage.lib.events.JailImport(jail=self)
+        yield jailImportEvent.begin()
+
+        started_at = timer()
+        format_transfer = libiocage.lib.JailStream.format_transfer
+
+        try:
+            transferred = 0
+            for transferred in stream.receive(
+                source,
+                self.dataset_name,
+                header,
+                force=force
+            ):
+                yield jailImportEvent.step(message=format_transfer(
+                    transferred,
+                    timer() - started_at
+                ))
+        except Exception as e:
+            yield jailImportEvent.fail(e)
+            raise
+
+        self.read_config()
+        if self.config["id"] != header["name"]:
+            # the config file still contains the exported name
+            self.config.save()
+
+        yield jailImportEvent.end(message=format_transfer(
+            transferred,
+            timer() - started_at
+        ))
+
     def exec(self, command, **kwargs):
         """
         Execute a command in a started jail
@@ -709,10 +989,23 @@ class JailGenerator:
                 logger=self.logger
             )
 
+    def set_jail_state(self, jail_state):
+        """
+        Set the jail state read from a jls call that listed all jails
+
+        Args:
+
+            jail_state (dict):
+                The jls output of the jail or None when it is not running
+        """
+        self.jail_state = jail_state
+        self._jail_state_resolved = True
+
     def update_jail_state(self):
         """
         Invoke update of the jail state from jls output
         """
+        self._jail_state_resolved = False
         try:
             import json
             stdout = subprocess.check_output([
@@ -759,19 +1052,33 @@ class JailGenerator:
         if (text is None) or (len(text) == 0):
             raise libiocage.lib.errors.JailNotSupplied(logger=self.logger)
 
-        jails_dataset = self.host.datasets.jails
+        match = self._lookup_jail_dataset(text)
+        if match is None:
+            raise libiocage.lib.errors.JailNotFound(text, logger=self.logger)
 
-        for dataset in list(jails_dataset.children):
+        jails_dataset, dataset_name = match
+        self._jails_dataset_name = jails_dataset.name
+        return dataset_name
 
-            dataset_name = dataset.name[(len(jails_dataset.name) + 1):]
-            humanreadable_name = libiocage.lib.helpers.to_humanreadable_name(
-                dataset_name
-            )
+    def _lookup_jail_dataset(self, text):
+        """
+        Find a jail by name or humanreadable name on all active pools
+
+        Returns a tuple of the jails dataset and the jails name or None
+        """
 
-            if text in [dataset_name, humanreadable_name]:
-                return dataset_name
+        for jails_dataset in self.host.datasets.jails_datasets:
 
-        raise libiocage.lib.errors.JailNotFound(text, logger=self.logger)
+            for dataset in list(jails_dataset.children):
+
+                dataset_name = dataset.name[(len(jails_dataset.name) + 1):]
+                humanreadable_name = \
+                    libiocage.lib.helpers.to_humanreadable_name(dataset_name)
+
+                if text in [dataset_name, humanreadable_name]:
+                    return (jails_dataset, dataset_name)
+
+        return None
 
     @property
     def name(self):
@@ -819,6 +1126,10 @@ class JailGenerator:
         except (TypeError, AttributeError, KeyError):
             pass
 
+        if (self.jail_state is None) and (self._jail_state_resolved is True):
+            # the jail was missing in the jls output of all jails
+            return None
+
         try:
             self.update_jail_state()
             return self.jail_state["jid"]
@@ -852,9 +1163,27 @@ class JailGenerator:
             name=self.config["release"],
             logger=self.logger,
             host=self.host,
-            zfs=self.zfs
+            zfs=self.zfs,
+            iocage_dataset=self.iocage_dataset
         )
 
+    @property
+    def jails_dataset_name(self):
+        """
+        Name of the jails dataset on the pool the jail is stored on
+        """
+        if self._jails_dataset_name is not None:
+            return self._jails_dataset_name
+        return self.host.datasets.jails.name
+
+    @property
+    def iocage_dataset(self):
+        """
+        The iocage root dataset of the pool the jail is stored on
+        """
+        name = self.jails_dataset_name.rsplit("/", maxsplit=1)[0]
+        return self.zfs.get_dataset(name)
+
     @property
     def dataset_name(self):
         """
@@ -863,7 +1192,7 @@ class JailGenerator:
         if self._dataset_name is not None:
             return self._dataset_name
         else:
-            return f"{self.host.datasets.root.name}/jails/{self.config['id']}"
+            return f"{self.jails_dataset_name}/{self.config['id']}"
 
     @dataset_name.setter
     def dataset_name(self, value=None):
@@ -921,7 +1250,7 @@ class JailGenerator:
         """
 
         try:
-            return libiocage.helpers.to_string(self.config[key])
+            return libiocage.lib.helpers.to_string(self.config[key])
         except:
             pass
 
@@ -951,3 +1280,12 @@ class Jail(JailGenerator):
 
     def stop(self, *args, **kwargs):
         return list(JailGenerator.stop(self, *args, **kwargs))
+
+    def export(self, *args, **kwargs):
+        return list(JailGenerator.export(self, *args, **kwargs))
+
+    def import_stream(self, *args, **kwargs):
+        return list(JailGenerator.import_stream(self, *args, **kwargs))
+
+    def rebase(self, *args, **kwargs):
+        return list(JailGenerator.rebase(self, *args, **kwargs))
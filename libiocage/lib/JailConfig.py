@@ -21,6 +21,7 @@
 # STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING
 # IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
 # POSSIBILITY OF SUCH DAMAGE.
+import collections
 import re
 import uuid
 
@@ -68,6 +69,13 @@ class JailConfig(dict, object):
 
         Special properties are
 
+    Property Dispatch:
+
+        Accessors are declared with methods named `_get_<property>`,
+        `_set_<property>` and `_default_<property>`. They are compiled
+        once per class into a schema (see get_schema), so that a lookup
+        is a dict access and a direct call instead of attribute probing.
+
     """
 
     def __init__(self,
@@ -79,10 +87,19 @@ class JailConfig(dict, object):
 
         dict.__init__(self)
 
+        self._schema = get_schema(type(self))
         libiocage.lib.helpers.init_logger(self, logger)
 
         self.data = {}
+
+        # last known content of the config files by path (dirty tracking)
+        self._file_contents = {}
         self.special_properties = {}
+
+        # special properties that are parsed on first access
+        # mapped to their skip_on_error flag
+        self._unparsed_special_properties = {}
+
         self["legacy"] = False
 
         # jail is required for various operations (write, fstab, etc)
@@ -117,6 +134,11 @@ class JailConfig(dict, object):
 
     @property
     def defaults(self):
+
+        # jails share the read-only defaults of their host
+        if (self.defaults_file is None) and (self.jail is not None):
+            return self.jail.host.defaults
+
         if self._defaults is None:
             self._load_defaults()
         return self._defaults
@@ -126,12 +148,8 @@ class JailConfig(dict, object):
         if defaults_file is not None:
             self.defaults_file = defaults_file
 
-        if defaults_file is None and self.jail is not None:
-            root_mountpoint = self.jail.host.datasets.root.mountpoint
-            defaults_file = f"{root_mountpoint}/defaults.json"
-
         self._defaults = libiocage.lib.JailConfigDefaults.JailConfigDefaults(
-            file=defaults_file,
+            file=self.defaults_file,
             logger=self.logger
         )
 
@@ -158,35 +176,53 @@ class JailConfig(dict, object):
 
             self.__setitem__(key, value, skip_on_error=skip_on_error)
 
-    def read(self):
+    def read(self, config_format=None):
+        """
+        Read the jail config from the first format that exists
+
+        Args:
 
-        if libiocage.lib.JailConfigJSON.JailConfigJSON.exists(self):
+            config_format (string): (optional)
+                Format the config is expected in ("json", "ucl" or "zfs").
+                It is read without probing the other formats first. When
+                reading it fails, all formats are probed.
 
-            libiocage.lib.JailConfigJSON.JailConfigJSON.read(self)
-            self["legacy"] = False
-            self.logger.log("Configuration loaded from JSON", level="verbose")
-            return "json"
+        Returns:
+
+            string: The format the config was read from or None
+        """
+        if config_format in CONFIG_FORMATS.keys():
+            try:
+                self._read_format(config_format)
+                return config_format
+            except Exception:
+                self.logger.debug(
+                    f"Configuration not found in {config_format} format"
+                )
 
-        elif libiocage.lib.JailConfigLegacy.JailConfigLegacy.exists(self):
+        for name, config_class in CONFIG_FORMATS.items():
+            if config_class.exists(self):
+                self._read_format(name)
+                return name
 
-            libiocage.lib.JailConfigLegacy.JailConfigLegacy.read(self)
+        self.logger.debug("No configuration was found")
+        return None
+
+    def _read_format(self, config_format):
+
+        CONFIG_FORMATS[config_format].read(self)
+
+        if config_format == "json":
+            self["legacy"] = False
+            self.logger.log("Configuration loaded from JSON", level="verbose")
+        elif config_format == "ucl":
             self["legacy"] = True
             self.logger.verbose(
                 "Configuration loaded from UCL config file (iocage-legacy)")
-            return "ucl"
-
-        elif libiocage.lib.JailConfigZFS.JailConfigZFS.exists(self):
-
-            libiocage.lib.JailConfigZFS.JailConfigZFS.read(self)
+        else:
             self["legacy"] = True
             self.logger.verbose(
                 "Configuration loaded from ZFS properties (iocage-legacy)")
-            return "zfs"
-
-        else:
-
-            self.logger.debug("No configuration was found")
-            return None
 
     def update_special_property(self, name):
 
@@ -199,16 +235,39 @@ class JailConfig(dict, object):
     def attach_special_property(self, name, special_property):
         self.special_properties[name] = special_property
 
-    def save(self):
+    def save(self, batch=None):
+        """
+        Write the config and rc.conf files that have changed
+
+        Args:
+
+            batch (libiocage.lib.ConfigBatch.ConfigBatch): (optional)
+                Defer syncing the directories to the commit of a batch
+
+        Returns:
+
+            bool: True when any file was written
+        """
         if not self["legacy"]:
-            self.save_json()
+            changed = self.save_json(batch=batch)
         else:
-            libiocage.lib.JailConfigLegacy.JailConfigLegacy.save(self)
+            changed = libiocage.lib.JailConfigLegacy.JailConfigLegacy.save(
+                self,
+                batch=batch
+            )
+
+        rc_conf_changed = self.jail.rc_conf.save(batch=batch)
 
-        self.jail.rc_conf.save()
+        if changed is True:
+            self.jail.host.query_index.update_jail(self.jail)
 
-    def save_json(self):
-        libiocage.lib.JailConfigJSON.JailConfigJSON.save(self)
+        return changed or rc_conf_changed
+
+    def save_json(self, batch=None):
+        return libiocage.lib.JailConfigJSON.JailConfigJSON.save(
+            self,
+            batch=batch
+        )
 
     def _set_name(self, name, **kwargs):
 
@@ -294,51 +353,87 @@ class JailConfig(dict, object):
             value, true="on", false="off")
 
     def _get_ip4_addr(self):
-        try:
-            return self.special_properties["ip4_addr"]
-        except:
-            return None
+        return self.__get_or_parse_special_property(
+            "ip4_addr",
+            self.__parse_addresses
+        )
 
     def _set_ip4_addr(self, value, **kwargs):
-        ip4_addr = libiocage.lib.JailConfigAddresses.JailConfigAddresses(
-            value,
-            jail_config=self,
-            property_name="ip4_addr",
-            logger=self.logger
-        )
-        self.special_properties["ip4_addr"] = ip4_addr
-        self.update_special_property("ip4_addr")
+        self.__set_unparsed_special_property("ip4_addr", value, **kwargs)
 
     def _get_ip6_addr(self):
+        return self.__get_or_parse_special_property(
+            "ip6_addr",
+            self.__parse_addresses
+        )
+
+    def _set_ip6_addr(self, value, **kwargs):
+        self.__set_unparsed_special_property("ip6_addr", value, **kwargs)
+
+        if self.jail is not None:
+            rc_conf = self.jail.rc_conf
+            rc_conf["rtsold_enable"] = "accept_rtadv" in str(value)
+
+    def _get_interfaces(self):
+        return self.__get_or_parse_special_property(
+            "interfaces",
+            self.__parse_interfaces
+        )
+
+    def _set_interfaces(self, value, **kwargs):
+        self.__set_unparsed_special_property("interfaces", value, **kwargs)
+
+    def __set_unparsed_special_property(self, name, value, **kwargs):
+        """
+        Store the serialized value of a special property
+
+        The value is parsed when the property is accessed the next time.
+        """
+        self.special_properties.pop(name, None)
+
+        if value is None:
+            self._unparsed_special_properties.pop(name, None)
+            self.data[name] = None
+            return
+
+        self._unparsed_special_properties[name] = self._skip_on_error(
+            **kwargs
+        )
+        self.data[name] = str(value)
+
+    def __get_or_parse_special_property(self, name, parse):
+
         try:
-            return self.special_properties["ip6_addr"]
-        except:
+            return self.special_properties[name]
+        except KeyError:
+            pass
+
+        value = self.data.get(name, None)
+        if value is None:
             return None
 
-    def _set_ip6_addr(self, value, **kwargs):
-        ip6_addr = libiocage.lib.JailConfigAddresses.JailConfigAddresses(
+        skip_on_error = self._unparsed_special_properties.get(name, False)
+        special_property = parse(name, value, skip_on_error)
+        self.special_properties[name] = special_property
+        self._unparsed_special_properties.pop(name, None)
+
+        return special_property
+
+    def __parse_addresses(self, name, value, skip_on_error):
+        return libiocage.lib.JailConfigAddresses.JailConfigAddresses(
             value,
             jail_config=self,
-            property_name="ip6_addr",
+            property_name=name,
             logger=self.logger,
-            skip_on_error=self._skip_on_error(**kwargs)
+            skip_on_error=skip_on_error
         )
-        self.special_properties["ip6_addr"] = ip6_addr
-        self.update_special_property("ip6_addr")
-
-        rc_conf = self.jail.rc_conf
-        rc_conf["rtsold_enable"] = "accept_rtadv" in str(value)
 
-    def _get_interfaces(self):
-        return self.special_properties["interfaces"]
-
-    def _set_interfaces(self, value, **kwargs):
-        interfaces = libiocage.lib.JailConfigInterfaces.JailConfigInterfaces(
+    def __parse_interfaces(self, name, value, skip_on_error):
+        return libiocage.lib.JailConfigInterfaces.JailConfigInterfaces(
             value,
-            jail_config=self
+            jail_config=self,
+            property_name=name
         )
-        self.special_properties["interfaces"] = interfaces
-        self.update_special_property("interfaces")
 
     def _get_defaultrouter(self):
         value = self.data['defaultrouter']
@@ -429,6 +524,12 @@ class JailConfig(dict, object):
         except:
             return self["release"]
 
+    def _get_release_generation(self):
+        try:
+            return self.data["release_generation"]
+        except KeyError:
+            return None
+
     def _get_basejail_type(self):
 
         # first see if basejail_type was explicitly set
@@ -520,29 +621,42 @@ class JailConfig(dict, object):
         """
         try:
             return kwargs["skip_on_error"] is True
-        except AttributeError:
+        except KeyError:
             return False
 
     def __getitem_user(self, key, string=False):
 
         # passthrough existing properties
-        try:
-            return self.stringify(self.__getattribute__(key), string)
-        except:
-            pass
+        instance_attributes = self.__dict__
+        if key in instance_attributes:
+            return self.stringify(instance_attributes[key], string)
 
-        # data with mappings
-        try:
-            get_method = self.__getattribute__(f"_get_{key}")
-            return self.stringify(get_method(), string)
-        except:
-            pass
+        # serialized special properties are returned without parsing them
+        if string and (key in self._unparsed_special_properties):
+            return self.stringify(self.data[key], string)
+
+        schema_property = self._schema.get(key)
+        if schema_property is not None:
+
+            if schema_property.attribute is True:
+                try:
+                    return self.stringify(getattr(self, key), string)
+                except Exception:
+                    pass
+
+            # data with mappings
+            if schema_property.getter is not None:
+                try:
+                    return self.stringify(
+                        schema_property.getter(self),
+                        string
+                    )
+                except Exception:
+                    pass
 
         # plain data attribute
-        try:
+        if key in self.data:
             return self.stringify(self.data[key], string)
-        except:
-            pass
 
         raise KeyError(f"User defined property not found: {key}")
 
@@ -550,36 +664,44 @@ class JailConfig(dict, object):
 
         try:
             return self.__getitem_user(key, string)
-        except:
+        except KeyError:
             pass
 
-        # fall back to default
-        return self.defaults[key]
+        # fall back to defaults.json and the built-in defaults
+        try:
+            return self.stringify(self.defaults[key], string)
+        except KeyError:
+            pass
+
+        # computed defaults of properties missing in the defaults
+        schema_property = self._schema.get(key)
+        if (schema_property is None) or (schema_property.default is None):
+            raise KeyError(f"Jail config property not found: {key}")
+
+        return self.stringify(schema_property.default(self), string)
 
     def __delitem__(self, key):
         del self.data[key]
+        self.special_properties.pop(key, None)
+        self._unparsed_special_properties.pop(key, None)
+        self._invalidate_fstab(key)
 
     def __setitem__(self, key, value, **kwargs):
 
-        # passthrough existing properties
-        # try:
-        #     self.__getitem__(key)
-        #     object.__setitem__(self, key, value)
-        #     return
-        # except:
-        #     pass
-
         parsed_value = libiocage.lib.helpers.parse_user_input(value)
+        self._invalidate_fstab(key)
 
-        setter_method = None
-        try:
-            setter_method = self.__getattribute__(f"_set_{key}")
-        except:
-            self.data[key] = parsed_value
-            pass
+        schema_property = self._schema.get(key)
+        if (schema_property is not None) and \
+                (schema_property.setter is not None):
+            return schema_property.setter(self, parsed_value, **kwargs)
 
-        if setter_method is not None:
-            return setter_method(parsed_value, **kwargs)
+        self.data[key] = parsed_value
+
+    def _invalidate_fstab(self, key):
+        fstab = self.__dict__.get("fstab")
+        if (fstab is not None) and (key in fstab.BASEJAIL_PROPERTIES):
+            fstab.invalidate_basejail_lines()
 
     def set(self, key: str, value, **kwargs) -> bool:
         """
@@ -622,16 +744,11 @@ class JailConfig(dict, object):
 
     def __dir__(self):
 
-        properties = set()
-
-        for prop in dict.__dir__(self):
-            if prop.startswith("_default_"):
-                properties.add(prop[9:])
-            elif not prop.startswith("_"):
-                properties.add(prop)
+        properties = set(self.all_properties)
 
-        for key in self.data.keys():
-            properties.add(key)
+        for name, schema_property in self._schema.items():
+            if schema_property.attribute is True:
+                properties.add(name)
 
         return list(properties)
 
@@ -640,9 +757,9 @@ class JailConfig(dict, object):
 
         properties = set()
 
-        for prop in dict.__dir__(self):
-            if prop.startswith("_default_"):
-                properties.add(prop[9:])
+        for name, schema_property in self._schema.items():
+            if schema_property.default is not None:
+                properties.add(name)
 
         for key in self.data.keys():
             properties.add(key)
@@ -650,7 +767,104 @@ class JailConfig(dict, object):
         return list(properties)
 
     def stringify(self, value, enabled=True):
-        return libiocage.helpers.to_string if (enabled is True) else value
+        if enabled is True:
+            return libiocage.lib.helpers.to_string(value)
+        return value
+
+
+CONFIG_FORMATS = collections.OrderedDict([
+    ("json", libiocage.lib.JailConfigJSON.JailConfigJSON),
+    ("ucl", libiocage.lib.JailConfigLegacy.JailConfigLegacy),
+    ("zfs", libiocage.lib.JailConfigZFS.JailConfigZFS)
+])
+
+
+class JailConfigProperty:
+    """
+    Compiled accessors of a jail config property
+
+    Args:
+
+        name (string):
+            The property name
+
+        getter (function): (optional)
+            Unbound `_get_<name>` method
+
+        setter (function): (optional)
+            Unbound `_set_<name>` method
+
+        default (function): (optional)
+            Unbound `_default_<name>` method
+
+        attribute (bool): (default=False)
+            The name is a public attribute of the config class, which is
+            passed through
+    """
+
+    __slots__ = ("name", "getter", "setter", "default", "attribute")
+
+    def __init__(
+        self,
+        name,
+        getter=None,
+        setter=None,
+        default=None,
+        attribute=False
+    ):
+
+        self.name = name
+        self.getter = getter
+        self.setter = setter
+        self.default = default
+        self.attribute = attribute
+
+
+_schemas = {}
+
+
+def get_schema(config_class):
+    """
+    Property schema of a JailConfig class
+
+    The accessor methods of the class are compiled into a dict of
+    JailConfigProperty by name once and cached for later instances.
+    """
+    try:
+        return _schemas[config_class]
+    except KeyError:
+        pass
+
+    schema = {}
+    accessor_prefixes = {
+        "_get_": "getter",
+        "_set_": "setter",
+        "_default_": "default"
+    }
+
+    for attribute_name in dir(config_class):
+
+        for prefix, field in accessor_prefixes.items():
+            if attribute_name.startswith(prefix):
+                name = attribute_name[len(prefix):]
+                if name not in schema:
+                    schema[name] = JailConfigProperty(name)
+                setattr(
+                    schema[name],
+                    field,
+                    getattr(config_class, attribute_name)
+                )
+                break
+        else:
+            if not attribute_name.startswith("_"):
+                if attribute_name not in schema:
+                    schema[attribute_name] = JailConfigProperty(
+                        attribute_name
+                    )
+                schema[attribute_name].attribute = True
+
+    _schemas[config_class] = schema
+    return schema
 
 
 class JailConfigList(list):
@@ -25,8 +25,10 @@ import libiocage.lib.errors
 
 
 class AddressSet(set):
-    def __init__(self, jail_config=None, property_name="ip4_address"):
+    def __init__(self, jail_config=None, property_name="ip4_address",
+                 parent=None):
         self.jail_config = jail_config
+        self.parent = parent
         set.__init__(self)
         object.__setattr__(self, 'property_name', property_name)
 
@@ -40,11 +42,26 @@ class AddressSet(set):
         if notify:
             self.__notify()
 
+    def update(self, values, notify=True):
+        set.update(self, values)
+        if notify:
+            self.__notify()
+
     def __notify(self):
-        self.jail_config.update_special_property(self.property_name)
+        if self.parent is not None:
+            self.parent.notify()
+        else:
+            self.jail_config.update_special_property(self.property_name)
 
 
 class JailConfigAddresses(dict):
+    """
+    Addresses of a jail by their nic
+
+    The serialized string is memoized until the addresses are changed. Each
+    change notifies the JailConfig once, so that it can update its data.
+    """
+
     def __init__(self, value, jail_config=None, property_name="ip4_address",
                  logger=None, skip_on_error=False):
         dict.__init__(self, {})
@@ -52,11 +69,12 @@ class JailConfigAddresses(dict):
         dict.__setattr__(self, 'jail_config', jail_config)
         dict.__setattr__(self, 'property_name', property_name)
         dict.__setattr__(self, 'skip_on_error', skip_on_error)
+        dict.__setattr__(self, '_string', None)
 
         if value != "none":
             self.read(value)
 
-    def read(self, config_line):
+    def read(self, config_line, notify=False):
 
         config_line = config_line.strip()
 
@@ -68,7 +86,7 @@ class JailConfigAddresses(dict):
 
             try:
                 nic, address = ip_address_string.split("|", maxsplit=1)
-                self.add(nic, address)
+                self.add(nic, address, notify=False)
             except ValueError:
 
                 level = "warn" if (self.skip_on_error is True) else "error"
@@ -84,6 +102,9 @@ class JailConfigAddresses(dict):
                 if self.skip_on_error is False:
                     exit(1)
 
+        if notify:
+            self.notify()
+
     def add(self, nic, addresses=None, notify=True):
 
         if addresses is None or addresses == [] or addresses == "":
@@ -97,11 +118,30 @@ class JailConfigAddresses(dict):
         except KeyError:
             prop = self.__empty_prop(nic)
 
-        for address in addresses:
-            prop.add(address, notify=False)
+        prop.update(addresses, notify=False)
 
         if notify:
-            self.__notify()
+            self.notify()
+
+    def update(self, addresses, notify=True):
+        """
+        Add the addresses of many nics and notify the JailConfig once
+
+        Args:
+
+            addresses (dict):
+                Lists of addresses by their nic
+        """
+        for nic, nic_addresses in dict(addresses).items():
+            self.add(nic, nic_addresses, notify=False)
+
+        if notify:
+            self.notify()
+
+    def clear(self, notify=True):
+        dict.clear(self)
+        if notify:
+            self.notify()
 
     @property
     def networks(self):
@@ -124,20 +164,28 @@ class JailConfigAddresses(dict):
 
     def __delitem__(self, key):
         dict.__delitem__(self, key)
-        self.__notify()
+        self.notify()
 
-    def __notify(self):
-        self.jail_config.update_special_property(self.property_name)
+    def notify(self):
+        dict.__setattr__(self, '_string', None)
+        if self.jail_config is not None:
+            self.jail_config.update_special_property(self.property_name)
 
     def __empty_prop(self, key):
 
-        prop = AddressSet(self.jail_config, property_name=self.property_name)
+        prop = AddressSet(
+            self.jail_config,
+            property_name=self.property_name,
+            parent=self
+        )
         dict.__setitem__(self, key, prop)
         return prop
 
     def __str__(self):
-        out = []
-        for nic in self:
-            for address in self[nic]:
-                out.append(f"{nic}|{address}")
-        return str(" ".join(out))
+        if self._string is None:
+            out = []
+            for nic in self:
+                for address in self[nic]:
+                    out.append(f"{nic}|{address}")
+            dict.__setattr__(self, '_string', " ".join(out))
+        return self._string
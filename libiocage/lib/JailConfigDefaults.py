@@ -21,13 +21,35 @@
 # STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING
 # IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
 # POSSIBILITY OF SUCH DAMAGE.
+import collections.abc
 import json
 import os.path
+import threading
+import time
 
 import libiocage.lib.helpers
 
 
-class JailConfigDefaults(dict):
+class JailConfigDefaults(collections.abc.Mapping):
+    """
+    Jail config defaults from the built-in values and a defaults.json file
+
+    The defaults are shared by the jails of a host. A reload swaps in a
+    new mapping, so that readers iterating the previous one are not
+    affected.
+
+    Args:
+
+        file (string):
+            Path of the defaults.json file
+
+        logger (libiocage.lib.Logger):
+            Instance of the logger that receives messages
+
+        revalidate_interval (int): (default=0)
+            Minimum number of seconds between two checks of the file mtime
+            when revalidate() is called
+    """
 
     DEFAULTS = {
         "id": None,
@@ -76,10 +98,14 @@ class JailConfigDefaults(dict):
         "tags": []
     }
 
-    def __init__(self, file, logger):
+    def __init__(self, file, logger, revalidate_interval=0):
         self.logger = logger
-        dict.__init__(self, JailConfigDefaults.DEFAULTS)
+        self._data = dict(JailConfigDefaults.DEFAULTS)
         self.file = file
+        self.revalidate_interval = revalidate_interval
+        self._file_stat = None
+        self._validated_at = time.monotonic()
+        self._lock = threading.Lock()
         try:
             self.read()
         except:
@@ -101,13 +127,80 @@ class JailConfigDefaults(dict):
         if self.logger:
             self.logger.debug(f"Reading default config from {self.file}")
 
+        file_stat = self._get_file_stat()
         f = open(self.file, "r")
         data = json.load(f)
         f.close()
 
-        for key, value in data.items():
-            self[key] = value
+        self._replace(data)
+        self._file_stat = file_stat
+
+    def revalidate(self):
+        """
+        Reload the defaults when the mtime or size of the file changed
+
+        Instances are shared between jails, so a new mapping replaces the
+        previous one instead of changing it.
+
+        Returns:
+
+            bool: True when the defaults were reloaded
+        """
+        now = time.monotonic()
+        if (now - self._validated_at) < self.revalidate_interval:
+            return False
+
+        with self._lock:
+            self._validated_at = now
+            file_stat = self._get_file_stat()
+            if file_stat == self._file_stat:
+                return False
+
+            if file_stat is None:
+                # the file was removed
+                self._replace({})
+                self._file_stat = None
+            else:
+                try:
+                    self.read()
+                except Exception:
+                    # keep the previous defaults while the file is invalid
+                    return False
+
+            return True
+
+    def _get_file_stat(self):
+        try:
+            stat = os.stat(self.file)
+        except (OSError, TypeError):
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def _replace(self, data):
+        new_data = dict(JailConfigDefaults.DEFAULTS)
+        new_data.update(data)
+        self._data = new_data
 
     def clear(self):
-        dict.clear(self)
-        dict.__init__(self, JailConfigDefaults.DEFAULTS)
+        self._data = dict(JailConfigDefaults.DEFAULTS)
+
+    def __getitem__(self, key):
+        return self._data[key]
+
+    def __iter__(self):
+        return iter(self._data)
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def keys(self):
+        return self._data.keys()
+
+    def items(self):
+        return self._data.items()
+
+    def values(self):
+        return self._data.values()
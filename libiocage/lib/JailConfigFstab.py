@@ -21,8 +21,11 @@
 # STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING
 # IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
 # POSSIBILITY OF SUCH DAMAGE.
+import collections
+import itertools
 import os
 
+import libiocage.lib.ConfigBatch
 import libiocage.lib.helpers
 
 
@@ -40,21 +43,46 @@ class FstabLine(dict):
         return hash(self["destination"])
 
 
-class JailConfigFstab(set):
+class JailConfigFstab:
+    """
+    Ordered fstab lines of a jail, indexed by their mount destination
+
+    The basejail lines derived from the jail config are cached and rebuilt
+    only after one of the BASEJAIL_PROPERTIES has changed. JailConfig calls
+    invalidate_basejail_lines() when such a property is set.
+    """
+
     AUTO_COMMENT_IDENTIFIER = "iocage-auto"
 
+    # cloned_release falls back to release and the jail path depends on id
+    BASEJAIL_PROPERTIES = (
+        "basejail",
+        "basejail_type",
+        "cloned_release",
+        "release",
+        "id"
+    )
+
     def __init__(self, jail, logger=None):
-        set.__init__(self)
         libiocage.lib.helpers.init_logger(self, logger)
         self.jail = jail
 
+        # user defined lines by their normalized destination
+        self._lines = collections.OrderedDict()
+
+        # derived basejail lines by their normalized destination
+        self._basejail_lines = None
+
+        # last known content of the fstab file
+        self._file_content = None
+
     @property
     def fstab_file_path(self):
         return f"{self.jail.path}/fstab"
 
     def parse_lines(self, input, ignore_auto_created=True):
 
-        set.clear(self)
+        self._lines.clear()
 
         for line in input.split("\n"):
 
@@ -80,7 +108,7 @@ class JailConfigFstab(set):
                 )
                 continue
 
-            destination = os.path.abspath(fragments[1])
+            destination = _get_destination_key(fragments[1])
 
             new_line = FstabLine({
                 "source"     : fragments[0],
@@ -92,7 +120,7 @@ class JailConfigFstab(set):
                 "comment"    : comment
             })
 
-            if new_line in self:
+            if destination in self._lines:
                 self.logger.error(
                     "Duplicate mountpoint in fstab: "
                     f"{destination} already mounted"
@@ -103,21 +131,26 @@ class JailConfigFstab(set):
     def read_file(self):
         if os.path.isfile(self.fstab_file_path):
             with open(self.fstab_file_path, "r") as f:
-                self.parse_lines(f.read())
-                f.close()
+                self._file_content = f.read()
+                self.parse_lines(self._file_content)
                 self.logger.debug(f"fstab loaded from {self.fstab_file_path}")
 
-    def save(self):
+    def save(self, batch=None):
+
+        output = self.__str__()
+        if output == self._file_content:
+            self.logger.debug("fstab was not modified - skipping write")
+            return False
+
         self.logger.verbose(f"Writing fstab to {self.fstab_file_path}")
-        with open(self.fstab_file_path, "w") as f:
-            f.write(self.__str__())
-            f.truncate()
-            f.close()
+        libiocage.lib.ConfigBatch.write(self.fstab_file_path, output, batch)
+        self._file_content = output
 
         self.logger.verbose(f"{self.jail.path}/fstab written")
+        return True
 
-    def save_with_basedirs(self):
-        return self.save()
+    def save_with_basedirs(self, batch=None):
+        return self.save(batch=batch)
 
     def add(self,
             source,
@@ -141,58 +174,140 @@ class JailConfigFstab(set):
         return self.add_line(line)
 
     def add_line(self, line):
+        """
+        Add a line or replace the line with the same destination
+
+        A replaced line keeps its position in the fstab file.
+
+        Args:
+
+            line (FstabLine|dict):
+                The fstab line to add
+        """
+        if not isinstance(line, FstabLine):
+            line = FstabLine(dict(line))
 
         self.logger.debug(f"Adding line to fstab: {line}")
-        set.add(self, line)
+        self._lines[_get_destination_key(line["destination"])] = line
+
+    def remove(self, destination):
+        """
+        Remove the line mounted to a destination
+
+        Args:
+
+            destination (string|dict):
+                The mountpoint or a fstab line with this destination
+
+        Raises:
+
+            KeyError: No user defined line mounts to the destination
+        """
+        del self[destination]
+
+    def discard(self, destination):
+        try:
+            self.remove(destination)
+        except KeyError:
+            pass
+
+    def clear(self):
+        self._lines.clear()
+
+    def get(self, destination, default=None):
+        try:
+            return self[destination]
+        except KeyError:
+            return default
+
+    def update(self):
+        """
+        Rebuild the basejail lines on their next use
+
+        Required after the jail dataset or the release was changed without
+        setting one of the BASEJAIL_PROPERTIES.
+        """
+        self.invalidate_basejail_lines()
+
+    def invalidate_basejail_lines(self):
+        self._basejail_lines = None
 
     @property
     def basejail_lines(self):
+        return list(self._get_basejail_lines().values())
+
+    def _get_basejail_lines(self):
+        if self._basejail_lines is None:
+            self._basejail_lines = self._build_basejail_lines()
+        return self._basejail_lines
+
+    def _build_basejail_lines(self):
+
+        fstab_basejail_lines = collections.OrderedDict()
+
         basejail = self.jail.config["basejail"]
         basejail_type = self.jail.config["basejail_type"]
 
         if not (basejail and basejail_type == "nullfs"):
-            return []
+            return fstab_basejail_lines
 
         basedirs = libiocage.lib.helpers.get_basedir_list(
             distribution_name=self.jail.host.distribution.name
         )
 
-        fstab_basejail_lines = []
-        for basedir in basedirs:
-            release_directory = self.jail.host.datasets.releases.mountpoint
+        release_directory = self.jail.release.releases_folder
+        cloned_release = self.jail.config["cloned_release"]
 
-            cloned_release = self.jail.config["cloned_release"]
+        for basedir in basedirs:
             source = f"{release_directory}/{cloned_release}/root/{basedir}"
             destination = f"{self.jail.path}/root/{basedir}"
-            fstab_basejail_lines.append({
+            line = FstabLine({
                 "source"     : source,
                 "destination": destination,
                 "type"       : "nullfs",
                 "options"    : "ro",
                 "dump"       : "0",
                 "passnum"    : "0",
-                "comment"    : "iocage-auto"
+                "comment"    : JailConfigFstab.AUTO_COMMENT_IDENTIFIER
             })
+            fstab_basejail_lines[_get_destination_key(destination)] = line
 
         return fstab_basejail_lines
 
     def __str__(self):
         return "\n".join(map(
             _line_to_string,
-            list(self)
+            self
         )) + "\n"
 
     def __iter__(self):
-        fstab_lines = list(set.__iter__(self))
-        fstab_lines += self.basejail_lines
-        return iter(fstab_lines)
+        return itertools.chain(
+            self._lines.values(),
+            self._get_basejail_lines().values()
+        )
+
+    def __len__(self):
+        return len(self._lines) + len(self._get_basejail_lines())
 
     def __contains__(self, value):
-        for entry in self:
-            if value["destination"] == entry["destination"]:
-                return True
-            else:
-                return False
+        key = _get_destination_key(value)
+        return (key in self._lines) or (key in self._get_basejail_lines())
+
+    def __getitem__(self, destination):
+        key = _get_destination_key(destination)
+        try:
+            return self._lines[key]
+        except KeyError:
+            return self._get_basejail_lines()[key]
+
+    def __delitem__(self, destination):
+        del self._lines[_get_destination_key(destination)]
+
+
+def _get_destination_key(value):
+    if isinstance(value, dict):
+        value = value["destination"]
+    return os.path.abspath(value)
 
 
 def _line_to_string(line):
@@ -24,40 +24,60 @@
 
 
 class BridgeSet(set):
-    def __init__(self, jail_config=None):
+    def __init__(self, jail_config=None, parent=None):
         self.jail_config = jail_config
+        self.parent = parent
         set.__init__(self)
 
     def add(self, value, notify=True):
         set.add(self, value)
         if notify:
-            try:
-                self.jail_config.update_special_property("interfaces")
-            except:
-                pass
+            self.__notify()
 
     def remove(self, value, notify=True):
         set.remove(self, value)
         if notify:
-            try:
-                self.jail_config.update_special_property("interfaces")
-            except:
-                pass
+            self.__notify()
+
+    def update(self, values, notify=True):
+        set.update(self, values)
+        if notify:
+            self.__notify()
+
+    def __notify(self):
+        if self.parent is not None:
+            self.parent.notify()
+            return
+
+        try:
+            self.jail_config.update_special_property("interfaces")
+        except:
+            pass
 
 
 class JailConfigInterfaces(dict):
+    """
+    Bridges of a jail by the jails nic
+
+    The serialized string is memoized until the interfaces are changed.
+    """
+
     def __init__(self, value, jail_config=None, property_name="interfaces"):
         dict.__init__(self, {})
         dict.__setattr__(self, 'jail_config', jail_config)
         dict.__setattr__(self, 'property_name', property_name)
+        dict.__setattr__(self, '_string', None)
         self.read(value)
 
-    def read(self, value):
+    def read(self, value, notify=False):
         nic_pairs = value.replace(",", " ").split(" ")
         for nic_pair in nic_pairs:
             jail_if, bridge_if = nic_pair.split(":", maxsplit=1)
             self.add(jail_if, bridge_if, notify=False)
 
+        if notify:
+            self.notify()
+
     def add(self, jail_if, bridges=None, notify=True):
 
         if bridges is None or bridges == [] or bridges == "":
@@ -71,11 +91,30 @@ class JailConfigInterfaces(dict):
         except:
             prop = self.__empty_prop(jail_if)
 
-        for bridge_if in bridges:
-            prop.add(bridge_if, notify=False)
+        prop.update(bridges, notify=False)
 
         if notify:
-            self.__notify()
+            self.notify()
+
+    def update(self, interfaces, notify=True):
+        """
+        Add the bridges of many nics and notify the JailConfig once
+
+        Args:
+
+            interfaces (dict):
+                Lists of bridges by the jails nic
+        """
+        for jail_if, bridges in dict(interfaces).items():
+            self.add(jail_if, bridges, notify=False)
+
+        if notify:
+            self.notify()
+
+    def clear(self, notify=True):
+        dict.clear(self)
+        if notify:
+            self.notify()
 
     def __setitem__(self, key, values):
 
@@ -88,9 +127,10 @@ class JailConfigInterfaces(dict):
 
     def __delitem__(self, key):
         dict.__delitem__(self, key)
-        self.__notify()
+        self.notify()
 
-    def __notify(self):
+    def notify(self):
+        dict.__setattr__(self, '_string', None)
         try:
             self.jail_config.update_special_property(self.property_name)
         except:
@@ -98,13 +138,15 @@ class JailConfigInterfaces(dict):
 
     def __empty_prop(self, key):
 
-        prop = BridgeSet(self.jail_config)
+        prop = BridgeSet(self.jail_config, parent=self)
         dict.__setitem__(self, key, prop)
         return prop
 
     def __str__(self):
-        out = []
-        for jail_if in self:
-            for bridge_if in self[jail_if]:
-                out.append(f"{jail_if}:{bridge_if}")
-        return " ".join(out)
+        if self._string is None:
+            out = []
+            for jail_if in self:
+                for bridge_if in self[jail_if]:
+                    out.append(f"{jail_if}:{bridge_if}")
+            dict.__setattr__(self, '_string', " ".join(out))
+        return self._string
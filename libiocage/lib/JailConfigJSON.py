@@ -24,6 +24,7 @@
 import json
 import os.path
 
+import libiocage.lib.ConfigBatch
 import libiocage.lib.helpers
 
 
@@ -40,23 +41,40 @@ class JailConfigJSON:
             )
         return json.dumps(output_data, sort_keys=True, indent=4)
 
-    def save(self):
+    def save(self, batch=None):
         config_file_path = JailConfigJSON.__get_config_json_path(self)
-        with open(config_file_path, "w") as f:
-            self.logger.verbose(f"Writing JSON config to {config_file_path}")
-            f.write(JailConfigJSON.toJSON(self))
-            self.logger.debug(f"File {config_file_path} written")
+        output = JailConfigJSON.toJSON(self)
+
+        if self._file_contents.get(config_file_path) == output:
+            self.logger.debug(
+                f"{config_file_path} was not modified - skipping write"
+            )
+            return False
+
+        self.logger.verbose(f"Writing JSON config to {config_file_path}")
+        libiocage.lib.ConfigBatch.write(config_file_path, output, batch)
+        self._file_contents[config_file_path] = output
+        self.logger.debug(f"File {config_file_path} written")
+        return True
 
     def read(self):
         return self.clone(JailConfigJSON.read_data(self), skip_on_error=True)
 
     def read_data(self):
-        with open(JailConfigJSON.__get_config_json_path(self), "r") as conf:
-            return json.load(conf)
+        config_file_path = JailConfigJSON.__get_config_json_path(self)
+        with open(config_file_path, "r") as conf:
+            content = conf.read()
+        self._file_contents[config_file_path] = content
+        return json.loads(content)
 
     def exists(self):
         return os.path.isfile(JailConfigJSON.__get_config_json_path(self))
 
+    def remove(self):
+        config_file_path = JailConfigJSON.__get_config_json_path(self)
+        os.remove(config_file_path)
+        self._file_contents.pop(config_file_path, None)
+
     def __get_config_json_path(self):
         try:
             return f"{self.jail.dataset.mountpoint}/config.json"
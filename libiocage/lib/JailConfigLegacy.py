@@ -25,20 +25,34 @@ import os.path
 
 import ucl
 
+import libiocage.lib.ConfigBatch
+
 
 class JailConfigLegacy:
     def read(self):
         self.clone(JailConfigLegacy.read_data(self), skip_on_error=True)
 
-    def save(self):
+    def save(self, batch=None):
         config_file_path = JailConfigLegacy.__get_config_path(self)
-        with open(config_file_path, "w") as f:
-            f.write(JailConfigLegacy.toLegacyConfig(self))
-            self.logger.verbose(f"Legacy config written to {config_file_path}")
+        output = JailConfigLegacy.toLegacyConfig(self)
+
+        if self._file_contents.get(config_file_path) == output:
+            self.logger.debug(
+                f"{config_file_path} was not modified - skipping write"
+            )
+            return False
+
+        libiocage.lib.ConfigBatch.write(config_file_path, output, batch)
+        self._file_contents[config_file_path] = output
+        self.logger.verbose(f"Legacy config written to {config_file_path}")
+        return True
 
     def read_data(self):
-        with open(JailConfigLegacy.__get_config_path(self), "r") as conf:
-            data = ucl.load(conf.read())
+        config_file_path = JailConfigLegacy.__get_config_path(self)
+        with open(config_file_path, "r") as conf:
+            content = conf.read()
+            self._file_contents[config_file_path] = content
+            data = ucl.load(content)
 
             try:
                 if data["type"] == "basejail":
@@ -54,6 +68,12 @@ class JailConfigLegacy:
     def exists(self):
         return os.path.isfile(JailConfigLegacy.__get_config_path(self))
 
+    def remove(self):
+        config_file_path = JailConfigLegacy.__get_config_path(self)
+        os.remove(config_file_path)
+        self._file_contents.pop(config_file_path, None)
+        self.logger.verbose(f"Legacy config {config_file_path} removed")
+
     def __get_config_path(self):
         try:
             return f"{self.jail.dataset.mountpoint}/config"
@@ -21,9 +21,9 @@
 # STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING
 # IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
 # POSSIBILITY OF SUCH DAMAGE.
-import libzfs
 
 import libiocage.lib.errors
+import libiocage.lib.helpers
 
 
 class JailConfigZFS:
@@ -38,11 +38,11 @@ class JailConfigZFS:
                 name = JailConfigZFS._get_iocage_property_name(self, prop)
                 data[name] = self.jail.dataset.properties[prop].value
 
-        self.clone(data, skip_on_error=True)
-
-        if not self.exists:
+        if len(data) == 0:
             raise libiocage.lib.errors.JailConfigNotFound("ZFS")
 
+        self.clone(data, skip_on_error=True)
+
         if self.data["basejail"] == "on":
             self.data["basejail"] = "on"
             self.data["basejail_type"] = "zfs"
@@ -76,11 +76,20 @@ class JailConfigZFS:
         #     pass
 
         for zfs_property_name in self.data:
-            zfs_property = libzfs.ZFSUserProperty(
+            zfs_property = libiocage.lib.helpers.zfs_user_property(
                 str(self.data[zfs_property_name])
             )
             self.jail.dataset.property[zfs_property_name] = zfs_property
 
+    def remove(self):
+        """
+        Remove the iocage-legacy config properties from the jail dataset
+        """
+        properties = self.jail.dataset.properties
+        for prop in list(properties):
+            if JailConfigZFS._is_iocage_property(self, prop):
+                properties[prop].inherit()
+
     def _is_iocage_property(self, name):
         return name.startswith(JailConfigZFS.property_prefix)
 
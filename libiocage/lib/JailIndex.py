@@ -0,0 +1,101 @@
+# Copyright (c) 2014-2017, iocage
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted providing that the following conditions
+# are met:
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in the
+#    documentation and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE AUTHOR ``AS IS'' AND ANY EXPRESS OR
+# IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED.  IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR ANY
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS
+# OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION)
+# HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT,
+# STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING
+# IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+import json
+import threading
+
+import libiocage.lib.ConfigBatch
+import libiocage.lib.helpers
+
+
+class JailIndex:
+    """
+    Host-wide index of metadata about each jail
+
+    The index is stored as JSON in the primary iocage root and keeps the
+    format each jail config was last read from. Loading a jail can read
+    this format directly instead of probing JSON, UCL and ZFS properties
+    one after another.
+
+    Args:
+
+        host (libiocage.lib.Host):
+            The host whose primary root holds the index
+
+        logger (libiocage.lib.Logger): (optional)
+            Instance of the logger that receives messages
+    """
+
+    def __init__(self, host, logger=None):
+        libiocage.lib.helpers.init_logger(self, logger)
+        self.host = host
+        self._data = None
+        self._lock = threading.Lock()
+
+    @property
+    def path(self):
+        return f"{self.host.datasets.root.mountpoint}/jails.index.json"
+
+    @property
+    def data(self):
+        if self._data is None:
+            self._data = self._read()
+        return self._data
+
+    def get_config_format(self, name):
+        try:
+            return self.data[name]["config_format"]
+        except KeyError:
+            return None
+
+    def set_config_format(self, name, config_format):
+        with self._lock:
+            if self.get_config_format(name) == config_format:
+                return
+            if config_format is None:
+                self.data.pop(name, None)
+            else:
+                self.data.setdefault(name, {})
+                self.data[name]["config_format"] = config_format
+            self._write()
+
+    def remove(self, name):
+        self.set_config_format(name, None)
+
+    def _read(self):
+        try:
+            with open(self.path, "r") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _write(self):
+        try:
+            libiocage.lib.ConfigBatch.write_atomic(
+                self.path,
+                json.dumps(self.data, sort_keys=True, indent=4),
+                sync_directory=False
+            )
+        except OSError as e:
+            # the index only speeds up loading jails
+            self.logger.debug(f"Jail index was not written: {e}")
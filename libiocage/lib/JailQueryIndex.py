@@ -0,0 +1,356 @@
+# Copyright (c) 2014-2017, iocage
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted providing that the following conditions
+# are met:
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in the
+#    documentation and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE AUTHOR ``AS IS'' AND ANY EXPRESS OR
+# IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED.  IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR ANY
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS
+# OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION)
+# HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT,
+# STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING
+# IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+import os
+import threading
+import time
+
+try:
+    import sqlite3
+except ImportError:
+    sqlite3 = None
+
+import libiocage.lib.errors
+import libiocage.lib.helpers
+
+
+class JailQueryIndex:
+    """
+    Optional SQLite index of the properties set in jail configs
+
+    The index holds the string value of every property that is set in
+    the config of a jail. Values inherited from the defaults and the
+    runtime state are not indexed, because they change without the
+    config being saved. Jail filters are compiled into SQL that finds
+    the jails whose own config contradicts a filter term, so that those
+    jails do not need to be loaded. The index never decides that a jail
+    matches.
+
+    The index is opt-in: it is only used after it was created with
+    rebuild() and when the sqlite3 module is available. It is kept in
+    sync when jails are created, changed, renamed or destroyed. Each
+    jail entry records when it was written. An entry only rules out a
+    jail while the config file was not modified after that time.
+
+    Args:
+
+        host (libiocage.lib.Host):
+            The host whose primary root holds the index
+
+        logger (libiocage.lib.Logger): (optional)
+            Instance of the logger that receives messages
+    """
+
+    # filter terms on these keys are not answered by the index
+    STATE_KEYS = ["name", "running", "jid", "ip4.addr", "ip6.addr"]
+
+    SCHEMA = [
+        """CREATE TABLE IF NOT EXISTS jails (
+            name TEXT PRIMARY KEY,
+            updated_at REAL NOT NULL
+        )""",
+        """CREATE TABLE IF NOT EXISTS properties (
+            jail TEXT NOT NULL REFERENCES jails(name) ON DELETE CASCADE,
+            key TEXT NOT NULL,
+            value TEXT NOT NULL,
+            short_value TEXT NOT NULL,
+            PRIMARY KEY (jail, key)
+        ) WITHOUT ROWID""",
+        """CREATE INDEX IF NOT EXISTS properties_key_value
+            ON properties (key, value)""",
+        """CREATE INDEX IF NOT EXISTS properties_key_short_value
+            ON properties (key, short_value)"""
+    ]
+
+    def __init__(self, host, logger=None):
+        libiocage.lib.helpers.init_logger(self, logger)
+        self.host = host
+        self._connection = None
+        self._lock = threading.Lock()
+
+    @property
+    def path(self):
+        return f"{self.host.datasets.root.mountpoint}/jails.sqlite"
+
+    @property
+    def available(self):
+        return sqlite3 is not None
+
+    @property
+    def enabled(self):
+        return self.available and os.path.isfile(self.path)
+
+    def rebuild(self, jails):
+        """
+        Create the index from scratch
+
+        Args:
+
+            jails (iterable):
+                All jails of the host (e.g. libiocage.lib.Jails.Jails)
+
+        Returns:
+
+            int: Number of indexed jails
+        """
+        if self.available is False:
+            raise libiocage.lib.errors.JailQueryIndexUnavailable(
+                logger=self.logger
+            )
+
+        rows = [self._get_jail_rows(jail) for jail in jails]
+
+        with self._lock:
+            connection = self._connect()
+            with connection:
+                for statement in self.SCHEMA:
+                    connection.execute(statement)
+                connection.execute("DELETE FROM jails")
+                for name, properties in rows:
+                    self._insert_jail(connection, name, properties)
+
+        self.logger.verbose(f"{len(rows)} jails written to {self.path}")
+        return len(rows)
+
+    def drop(self):
+        with self._lock:
+            self._close()
+            for suffix in ["", "-wal", "-shm"]:
+                if os.path.exists(f"{self.path}{suffix}"):
+                    os.remove(f"{self.path}{suffix}")
+
+    def update_jail(self, jail):
+        """
+        Replace the indexed properties of a jail
+        """
+        if self.enabled is False:
+            return
+
+        name, properties = self._get_jail_rows(jail)
+        with self._lock:
+            connection = self._connect()
+            with connection:
+                connection.execute("DELETE FROM jails WHERE name = ?", [name])
+                self._insert_jail(connection, name, properties)
+
+    def remove_jail(self, name):
+        if self.enabled is False:
+            return
+
+        with self._lock:
+            connection = self._connect()
+            with connection:
+                connection.execute("DELETE FROM jails WHERE name = ?", [name])
+
+    def rename_jail(self, name, jail):
+        """
+        Move the index entry of a renamed jail
+
+        Args:
+
+            name (string):
+                The previous name of the jail
+
+            jail (libiocage.lib.Jail.JailGenerator):
+                The jail with the new name
+        """
+        self.remove_jail(name)
+        self.update_jail(jail)
+
+    def get_names(self):
+        with self._lock:
+            rows = self._connect().execute("SELECT name FROM jails")
+            return set(row[0] for row in rows)
+
+    def get_properties(self, name):
+        with self._lock:
+            rows = self._connect().execute(
+                "SELECT key, value FROM properties WHERE jail = ?",
+                [name]
+            )
+            return dict(rows)
+
+    def get_mismatches(self, filters):
+        """
+        Indexed jails whose own config contradicts the filters
+
+        Terms on STATE_KEYS and on properties that are not set in the
+        config of a jail never rule the jail out.
+
+        Args:
+
+            filters (libiocage.lib.JailFilter.Terms):
+                Jail filter terms like "release=11.1*" or "tags=*web*"
+
+        Returns:
+
+            dict: The time each mismatching jail was indexed by its name
+        """
+        statement, parameters = compile_filters(filters)
+        started_at = time.monotonic()
+
+        with self._lock:
+            rows = self._connect().execute(statement, parameters).fetchall()
+
+        duration = (time.monotonic() - started_at) * 1000
+        self.logger.spam(f"Jail index query took {duration:.2f}ms")
+        return dict(rows)
+
+    def query(self, filters):
+        """
+        Names of the indexed jails the index cannot rule out
+
+        Args:
+
+            filters (libiocage.lib.JailFilter.Terms):
+                Jail filter terms like "release=11.1*" or "tags=*web*"
+
+        Returns:
+
+            list: Sorted names of the jails that may match
+        """
+        mismatches = self.get_mismatches(filters)
+        return sorted(self.get_names() - set(mismatches.keys()))
+
+    def _get_jail_rows(self, jail):
+        name = jail.config["id"]
+
+        properties = []
+        for key in list(jail.config.data.keys()):
+            if key in self.STATE_KEYS:
+                continue
+            try:
+                value = jail.config.get_string(key)
+            except Exception:
+                continue
+            properties.append(_get_property_row(key, value))
+
+        return name, properties
+
+    def _insert_jail(self, connection, name, properties):
+        connection.execute(
+            "INSERT INTO jails (name, updated_at) VALUES (?, ?)",
+            [name, time.time()]
+        )
+        connection.executemany(
+            "INSERT OR REPLACE INTO properties "
+            "(jail, key, value, short_value) VALUES (?, ?, ?, ?)",
+            [
+                (name, key, value, short_value)
+                for key, value, short_value in properties
+            ]
+        )
+
+    def _connect(self):
+        if self._connection is None:
+            self._connection = sqlite3.connect(
+                self.path,
+                check_same_thread=False
+            )
+            self._connection.execute("PRAGMA foreign_keys = ON")
+            self._connection.execute("PRAGMA journal_mode = WAL")
+        return self._connection
+
+    def _close(self):
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+
+def compile_filters(filters):
+    """
+    Compile jail filter terms into an SQL query for mismatching jails
+
+    Globs of the filter syntax are translated to SQLite GLOB patterns
+    and comma separated alternatives of a term are combined with OR. A
+    jail is selected when a property of one term is indexed for it and
+    matches none of the alternatives. Terms on STATE_KEYS are skipped.
+
+    Args:
+
+        filters (libiocage.lib.JailFilter.Terms):
+            The terms to compile
+
+    Returns:
+
+        tuple: The SQL statement and a list of its parameters
+    """
+    conditions = []
+    parameters = []
+
+    for term in filters:
+
+        if term.key in JailQueryIndex.STATE_KEYS:
+            continue
+
+        alternatives = []
+        parameters.append(term.key)
+        for filter_value in term:
+
+            alternatives.append("value GLOB ?")
+            parameters.append(to_glob_pattern(filter_value))
+
+            # filters match against humanreadable names as well
+            has_humanreadble_length = (len(filter_value) == 8)
+            if has_humanreadble_length and \
+                    not term._filter_string_has_globs(filter_value):
+                alternatives.append("short_value = ?")
+                parameters.append(filter_value)
+
+        conditions.append(
+            "name IN (SELECT jail FROM properties WHERE key = ? AND "
+            f"NOT ({' OR '.join(alternatives)}))"
+        )
+
+    if len(conditions) == 0:
+        conditions.append("0")
+
+    statement = "SELECT name, updated_at FROM jails WHERE "
+    statement += " OR ".join(conditions)
+
+    return statement, parameters
+
+
+def to_glob_pattern(filter_string):
+    """
+    Translate a jail filter value into an SQLite GLOB pattern
+
+    '*' matches any and '+' at least one character. All other characters
+    are matched literally.
+    """
+    pattern = ""
+    for character in filter_string:
+        if character == "*":
+            pattern += "*"
+        elif character == "+":
+            pattern += "?*"
+        elif character in ["?", "["]:
+            pattern += f"[{character}]"
+        else:
+            pattern += character
+    return pattern
+
+
+def _get_property_row(key, value):
+    value = str(value)
+    return (key, value, libiocage.lib.helpers.to_humanreadable_name(value))
@@ -0,0 +1,319 @@
+# Copyright (c) 2014-2017, iocage
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted providing that the following conditions
+# are met:
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in the
+#    documentation and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE AUTHOR ``AS IS'' AND ANY EXPRESS OR
+# IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED.  IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR ANY
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS
+# OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION)
+# HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT,
+# STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING
+# IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+"""Serialize jails to portable ZFS send/receive streams."""
+import bz2
+import datetime
+import json
+import lzma
+import struct
+import subprocess
+import tempfile
+import zlib
+from timeit import default_timer as timer
+
+import libiocage.lib.ZFSSnapshots
+import libiocage.lib.errors
+import libiocage.lib.helpers
+
+# compressor and decompressor factories by compression name
+COMPRESSION_METHODS = {
+    "none": (None, None),
+    "gzip": (
+        lambda: zlib.compressobj(6, zlib.DEFLATED, 31),
+        lambda: zlib.decompressobj(31)
+    ),
+    "bzip2": (bz2.BZ2Compressor, bz2.BZ2Decompressor),
+    "xz": (lzma.LZMACompressor, lzma.LZMADecompressor)
+}
+
+
+class JailStream:
+    """
+    Reads and writes jail streams
+
+    A jail stream wraps the replication stream of `zfs send -R` so that a
+    jail can be piped to another host without a temporary copy on disk.
+
+    Stream Format:
+
+        MAGIC (8 bytes): b"IOCJAIL1"
+
+        Header length (4 bytes): unsigned big-endian integer
+
+        Header (JSON): version, jail name, snapshot, incremental source,
+            compression method and the jail configuration
+
+        Body: the (optionally compressed) output of `zfs send` until EOF
+    """
+
+    MAGIC = b"IOCJAIL1"
+    VERSION = 1
+
+    def __init__(self,
+                 zfs_command="/sbin/zfs",
+                 compression="gzip",
+                 chunk_size=1024 * 1024,
+                 progress_interval=1.0,
+                 logger=None):
+
+        libiocage.lib.helpers.init_logger(self, logger)
+
+        if compression not in COMPRESSION_METHODS.keys():
+            raise libiocage.lib.errors.InvalidJailStreamCompression(
+                compression=compression,
+                logger=self.logger
+            )
+
+        self.zfs_command = zfs_command
+        self.compression = compression
+        self.chunk_size = chunk_size
+        self.progress_interval = progress_interval
+
+    def default_snapshot_name(self):
+        snapshots = libiocage.lib.ZFSSnapshots.ZFSSnapshots(
+            zfs_command=self.zfs_command,
+            logger=self.logger
+        )
+        return snapshots.default_snapshot_name(prefix="ioc-export")
+
+    def create_header(self, name, snapshot, incremental_from=None,
+                      config=None):
+
+        return {
+            "version": JailStream.VERSION,
+            "name": name,
+            "snapshot": snapshot,
+            "incremental_from": incremental_from,
+            "compression": self.compression,
+            "created": datetime.datetime.utcnow().isoformat(),
+            "config": config if config is not None else {}
+        }
+
+    def write_header(self, destination, header):
+        data = json.dumps(header, sort_keys=True).encode("UTF-8")
+        destination.write(JailStream.MAGIC)
+        destination.write(struct.pack(">I", len(data)))
+        destination.write(data)
+
+    def read_header(self, source):
+
+        magic = source.read(len(JailStream.MAGIC))
+        if magic != JailStream.MAGIC:
+            raise libiocage.lib.errors.InvalidJailStream(
+                reason="unknown file format",
+                logger=self.logger
+            )
+
+        try:
+            length, = struct.unpack(">I", source.read(4))
+            header = json.loads(source.read(length).decode("UTF-8"))
+        except (struct.error, ValueError):
+            raise libiocage.lib.errors.InvalidJailStream(
+                reason="corrupt header",
+                logger=self.logger
+            )
+
+        if header.get("version") != JailStream.VERSION:
+            raise libiocage.lib.errors.InvalidJailStream(
+                reason=f"unsupported version {header.get('version')}",
+                logger=self.logger
+            )
+
+        if header.get("compression") not in COMPRESSION_METHODS.keys():
+            raise libiocage.lib.errors.InvalidJailStreamCompression(
+                compression=header.get("compression"),
+                logger=self.logger
+            )
+
+        return header
+
+    def snapshot(self, dataset_name, snapshot_name):
+        """
+        Recursively snapshot a dataset if the snapshot does not exist yet
+        """
+        snapshots = libiocage.lib.ZFSSnapshots.ZFSSnapshots(
+            zfs_command=self.zfs_command,
+            logger=self.logger
+        )
+
+        if snapshots.exists(dataset_name, snapshot_name):
+            self.logger.verbose(
+                f"Using existing snapshot {dataset_name}@{snapshot_name}"
+            )
+            return
+
+        snapshots.create([dataset_name], snapshot_name)
+
+    def send(self, destination, dataset_name, header):
+        """
+        Write a jail stream of a dataset snapshot to a file object
+
+        Yields the number of bytes sent so far in progress_interval steps
+        and once when the stream was read completely.
+        """
+        command = [self.zfs_command, "send", "-R"]
+
+        if header["incremental_from"] is not None:
+            command += ["-I", f"@{header['incremental_from']}"]
+
+        command.append(f"{dataset_name}@{header['snapshot']}")
+
+        self.write_header(destination, header)
+
+        compressor_factory, _ = COMPRESSION_METHODS[self.compression]
+        compressor = None
+        if compressor_factory is not None:
+            compressor = compressor_factory()
+
+        # a file does not block zfs when it writes more than a pipe buffer
+        with tempfile.TemporaryFile() as output_file:
+
+            process = libiocage.lib.helpers.exec_raw(
+                command,
+                logger=self.logger,
+                stdout=subprocess.PIPE,
+                stderr=output_file
+            )
+
+            for transferred in self._pump(process.stdout, destination,
+                                          transform=compressor):
+                yield transferred
+
+            if compressor is not None:
+                destination.write(compressor.flush())
+            destination.flush()
+
+            self._wait(process, command, output_file)
+
+    def receive(self, source, dataset_name, header, force=False):
+        """
+        Read the body of a jail stream into `zfs receive`
+
+        The header needs to be read from source in advance.
+        Yields the number of bytes received like send() does.
+        """
+        command = [self.zfs_command, "receive"]
+
+        if (force is True) or (header["incremental_from"] is not None):
+            command.append("-F")
+
+        command.append(dataset_name)
+
+        _, decompressor_factory = COMPRESSION_METHODS[header["compression"]]
+        decompressor = None
+        if decompressor_factory is not None:
+            decompressor = decompressor_factory()
+
+        # the output is collected in a file, so that zfs cannot block on a
+        # full pipe while the stream is written to its stdin
+        with tempfile.TemporaryFile() as output_file:
+
+            process = libiocage.lib.helpers.exec_raw(
+                command,
+                logger=self.logger,
+                stdin=subprocess.PIPE,
+                stdout=output_file,
+                stderr=output_file
+            )
+
+            try:
+                for transferred in self._pump(source, process.stdin,
+                                              transform=decompressor):
+                    yield transferred
+
+                if hasattr(decompressor, "flush"):
+                    process.stdin.write(decompressor.flush())
+            except BrokenPipeError:
+                # zfs receive exited early - the reason is in its output
+                pass
+            finally:
+                try:
+                    process.stdin.close()
+                except BrokenPipeError:
+                    pass
+
+            self._wait(process, command, output_file)
+
+    def _pump(self, source, destination, transform=None):
+
+        transferred = 0
+        last_progress = timer()
+
+        for chunk in iter(lambda: source.read(self.chunk_size), b""):
+
+            transferred += len(chunk)
+
+            if transform is not None:
+                if hasattr(transform, "compress"):
+                    chunk = transform.compress(chunk)
+                else:
+                    chunk = transform.decompress(chunk)
+
+            destination.write(chunk)
+
+            now = timer()
+            if (now - last_progress) >= self.progress_interval:
+                last_progress = now
+                yield transferred
+
+        yield transferred
+
+    def _wait(self, process, command, output_file):
+
+        returncode = process.wait()
+        output_file.seek(0)
+        stderr = output_file.read().decode("UTF-8", "replace").strip()
+
+        if returncode > 0:
+            command_str = " ".join(command)
+            self.logger.warn(
+                f"Command exited with {returncode}: {command_str}"
+            )
+            if stderr:
+                self.logger.warn(stderr, indent=1)
+            raise libiocage.lib.errors.CommandFailure(
+                returncode=returncode,
+                logger=self.logger
+            )
+
+
+def format_transfer(transferred, duration=None):
+    """
+    Return a human readable transfer size and (if available) rate
+    """
+    output = _format_size(transferred)
+
+    if duration:
+        rate = _format_size(transferred / duration)
+        output += f" ({rate}/s)"
+
+    return output
+
+
+def _format_size(size):
+    for unit in ["B", "KiB", "MiB", "GiB"]:
+        if size < 1024:
+            return f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} TiB"
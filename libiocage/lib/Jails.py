@@ -21,12 +21,20 @@
 # STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING
 # IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
 # POSSIBILITY OF SUCH DAMAGE.
+import concurrent.futures
+import json
+import os
+import subprocess
 from typing import Generator, Union, Iterable
 
-import libzfs
-
+import libiocage.lib.ConfigBatch
 import libiocage.lib.Jail
+import libiocage.lib.JailConfig
+import libiocage.lib.JailConfigJSON
 import libiocage.lib.JailFilter
+import libiocage.lib.ZFSSnapshots
+import libiocage.lib.errors
+import libiocage.lib.events
 import libiocage.lib.helpers
 
 
@@ -49,7 +57,6 @@ class JailsGenerator(list):
         libiocage.lib.helpers.init_logger(self, logger)
         libiocage.lib.helpers.init_zfs(self, zfs)
         libiocage.lib.helpers.init_host(self, host)
-        self.zfs = libzfs.ZFS(history=True, history_prefix="<iocage>")
 
         self._filters = None
         self.filters = filters
@@ -57,13 +64,20 @@ class JailsGenerator(list):
 
     def __iter__(self):
 
-        for jail_dataset in self.jail_datasets:
+        jail_datasets = self.jail_datasets
+        mismatches = self._get_index_mismatches(jail_datasets)
+
+        for jail_dataset in jail_datasets:
 
             jail_name = self._get_name_from_jail_dataset(jail_dataset)
             if self._filters.match_key("name", jail_name) is not True:
                 # Skip all jails that do not even match the name
                 continue
 
+            if jail_name in mismatches:
+                # the unchanged config of the jail contradicts the filters
+                continue
+
             # ToDo: Do not load jail if filters do not require to
             jail = self._load_jail_from_dataset(jail_dataset)
             if self._filters.match_jail(jail):
@@ -75,6 +89,357 @@ class JailsGenerator(list):
         kwargs["zfs"] = self.zfs
         return libiocage.lib.Jail.Jail(*args, **kwargs)
 
+    @property
+    def jail_states(self) -> dict:
+        """
+        Runtime state of all running jails by jail identifier
+
+        The state is read with a single jls call, so that it does not need
+        to be updated for each jail individually.
+        """
+        try:
+            stdout = subprocess.check_output([
+                "/usr/sbin/jls",
+                "-v",
+                "-h",
+                "--libxo=json"
+            ], shell=False, stderr=subprocess.DEVNULL)
+            output = json.loads(stdout.decode().strip())
+            jail_states = output["jail-information"]["jail"]
+        except Exception:
+            return {}
+
+        return dict((state["name"], state) for state in jail_states)
+
+    def _get_index_mismatches(self, jail_datasets: list) -> set:
+        """
+        Names of jails that do not match the filters according to the index
+
+        Only jails whose config file was not modified since they were
+        indexed are ruled out. The set is empty when the host has no jail
+        index.
+        """
+        query_index = self.host.query_index
+        if query_index.enabled is False:
+            return set()
+
+        try:
+            indexed_mismatches = query_index.get_mismatches(self._filters)
+        except Exception as e:
+            self.logger.debug(f"Jail index was not used: {e}")
+            return set()
+
+        mismatches = set()
+        for dataset in jail_datasets:
+            jail_name = self._get_name_from_jail_dataset(dataset)
+            indexed_at = indexed_mismatches.get(jail_name)
+            if indexed_at is None:
+                continue
+            modified_at = _get_config_mtime(dataset)
+            if (modified_at is not None) and (modified_at <= indexed_at):
+                mismatches.add(jail_name)
+
+        return mismatches
+
+    @property
+    def jail_dataset_names(self) -> list:
+        """
+        Names of the datasets of all jails matching the filters
+
+        Jails are only loaded when the filters require more than the name.
+        """
+        requires_jail = any(map(lambda term: term.key != "name", self.filters))
+
+        dataset_names = []
+        for jail_dataset in self.jail_datasets:
+
+            jail_name = self._get_name_from_jail_dataset(jail_dataset)
+            if self._filters.match_key("name", jail_name) is not True:
+                continue
+
+            if requires_jail is True:
+                jail = self._load_jail_from_dataset(jail_dataset)
+                if not self._filters.match_jail(jail):
+                    continue
+
+            dataset_names.append(jail_dataset.name)
+
+        return dataset_names
+
+    @property
+    def _snapshots(self):
+        return libiocage.lib.ZFSSnapshots.ZFSSnapshots(logger=self.logger)
+
+    def snapshot(self, snapshot_name: str = None) -> str:
+        """
+        Atomically snapshot all jails matching the filters
+
+        All datasets of the jails are snapshotted recursively in the same
+        ZFS transaction group.
+
+        Returns the name of the snapshot
+        """
+        if snapshot_name is None:
+            snapshot_name = self._snapshots.default_snapshot_name()
+
+        self._snapshots.create(self.jail_dataset_names, snapshot_name)
+        return snapshot_name
+
+    @property
+    def snapshots(self) -> list:
+        """
+        Snapshots of all jails matching the filters
+
+        Every snapshot is annotated with the name of its jail. All jails
+        are listed with a single ZFS property scan.
+        """
+        jail_dataset_names = self.jail_dataset_names
+        jails_dataset_names = set(map(
+            lambda name: name.rsplit("/", maxsplit=1)[0],
+            jail_dataset_names
+        ))
+
+        snapshots = []
+        for snapshot in self._snapshots.list(jails_dataset_names):
+            jail_dataset_name = self._get_jail_dataset_name(
+                snapshot.dataset_name,
+                jails_dataset_names
+            )
+            if jail_dataset_name not in jail_dataset_names:
+                continue
+            snapshot["jail"] = jail_dataset_name.rsplit("/", maxsplit=1)[1]
+            snapshots.append(snapshot)
+
+        return snapshots
+
+    def rollback(self, snapshot_name: str, max_workers: int = None):
+        """
+        Roll back all jails matching the filters in parallel
+
+        Every dataset of a jail that has the snapshot is rolled back.
+        More recent snapshots of these datasets are destroyed.
+
+        Args:
+
+            snapshot_name (string):
+                Name of the snapshot (the part after the @)
+
+            max_workers (int): (optional)
+                Number of jails rolled back concurrently
+        """
+        groups = {}
+        for snapshot in self.snapshots:
+            if snapshot.snapshot_name != snapshot_name:
+                continue
+            if snapshot["jail"] not in groups.keys():
+                groups[snapshot["jail"]] = []
+            groups[snapshot["jail"]].append(snapshot.name)
+
+        events = {}
+        for jail_name in groups.keys():
+            events[jail_name] = libiocage.lib.events.SnapshotRollback(
+                f"{jail_name}@{snapshot_name}"
+            )
+            yield events[jail_name].begin()
+
+        for jail_name, error in self._snapshots.rollback(
+            groups,
+            max_workers=max_workers
+        ):
+            if error is None:
+                yield events[jail_name].end()
+            else:
+                yield events[jail_name].fail(error)
+
+    def set(self, properties: dict, max_workers: int = None):
+        """
+        Change the config of all jails matching the filters
+
+        The changes are applied to every jail in memory first. The configs
+        of jails that changed are then saved in parallel and committed in
+        one ConfigBatch.
+
+        Args:
+
+            properties (dict):
+                New property values by name. A value of None deletes the
+                property from the jail config
+
+            max_workers (int): (optional)
+                Number of jail configs saved concurrently
+
+        Yields JailConfigUpdate events. The names of the changed properties
+        are available as event.data["properties"].
+        """
+        pending_saves = []
+
+        for jail in self:
+
+            event = libiocage.lib.events.JailConfigUpdate(jail)
+            yield event.begin()
+
+            try:
+                updated_properties = self._update_jail_config(
+                    jail,
+                    properties
+                )
+            except Exception as e:
+                yield event.fail(e)
+                continue
+
+            event.data["properties"] = updated_properties
+            if len(updated_properties) == 0:
+                yield event.skip(message="unchanged")
+            else:
+                pending_saves.append((jail, event))
+
+        if len(pending_saves) == 0:
+            return
+
+        batch = libiocage.lib.ConfigBatch.ConfigBatch(logger=self.logger)
+        with batch, concurrent.futures.ThreadPoolExecutor(
+            max_workers=max_workers
+        ) as executor:
+
+            futures = {}
+            for jail, event in pending_saves:
+                future = executor.submit(jail.config.save, batch=batch)
+                futures[future] = event
+
+            for future in concurrent.futures.as_completed(futures):
+                event = futures[future]
+                try:
+                    future.result()
+                    yield event.end()
+                except Exception as e:
+                    yield event.fail(e)
+
+    def _update_jail_config(self, jail, properties: dict) -> list:
+
+        updated_properties = []
+
+        for key, value in properties.items():
+
+            if value is None:
+                if key in jail.config.data.keys():
+                    del jail.config[key]
+                    updated_properties.append(key)
+            elif jail.config.set(key, value):
+                updated_properties.append(key)
+
+        return updated_properties
+
+    def migrate(self, max_workers: int = None, cleanup: bool = False):
+        """
+        Convert the legacy configs of all jails matching the filters to JSON
+
+        The config.json of each jail is read back and compared with the
+        legacy config before the jail index points to it.
+
+        Args:
+
+            max_workers (int): (optional)
+                Number of jails migrated concurrently
+
+            cleanup (bool): (default=False)
+                Remove the legacy UCL config file or ZFS properties after
+                the JSON config was verified
+        """
+        pending_migrations = []
+
+        for jail in self:
+            event = libiocage.lib.events.JailConfigMigration(jail)
+            yield event.begin()
+            if jail.config_format in ["ucl", "zfs"]:
+                pending_migrations.append((jail, event))
+            else:
+                yield event.skip(message=str(jail.config_format))
+
+        if len(pending_migrations) == 0:
+            return
+
+        with concurrent.futures.ThreadPoolExecutor(
+            max_workers=max_workers
+        ) as executor:
+
+            futures = {}
+            for jail, event in pending_migrations:
+                future = executor.submit(
+                    self._migrate_jail_config,
+                    jail,
+                    cleanup=cleanup
+                )
+                futures[future] = event
+
+            for future in concurrent.futures.as_completed(futures):
+                event = futures[future]
+                try:
+                    legacy_format = future.result()
+                    yield event.end(message=f"{legacy_format} -> json")
+                except Exception as e:
+                    yield event.fail(e)
+
+    def _migrate_jail_config(self, jail, cleanup: bool = False) -> str:
+
+        legacy_format = jail.config_format
+        json_config = libiocage.lib.JailConfigJSON.JailConfigJSON
+
+        jail.config["legacy"] = False
+        try:
+            jail.config.save_json()
+            self._verify_migrated_config(jail)
+        except Exception:
+            jail.config["legacy"] = True
+            if json_config.exists(jail.config):
+                json_config.remove(jail.config)
+            raise
+
+        jail.config_format = "json"
+        jail.host.jail_index.set_config_format(jail.config["id"], "json")
+
+        if cleanup is True:
+            legacy_config = libiocage.lib.JailConfig.CONFIG_FORMATS[
+                legacy_format
+            ]
+            legacy_config.remove(jail.config)
+
+        return legacy_format
+
+    def _verify_migrated_config(self, jail):
+
+        migrated_config = libiocage.lib.JailConfig.JailConfig(
+            data={"id": jail.config["id"]},
+            jail=jail,
+            logger=self.logger
+        )
+        libiocage.lib.JailConfigJSON.JailConfigJSON.read(migrated_config)
+
+        keys = set(jail.config.data.keys()) | set(migrated_config.data.keys())
+        keys.discard("legacy")
+
+        for key in keys:
+            expected = _get_string_or_none(jail.config, key)
+            if _get_string_or_none(migrated_config, key) != expected:
+                raise libiocage.lib.errors.JailConfigMigrationFailed(
+                    jail=jail,
+                    reason=f"property '{key}' differs after migration",
+                    logger=self.logger
+                )
+
+    def _get_jail_dataset_name(
+        self,
+        dataset_name: str,
+        jails_dataset_names: Iterable[str]
+    ) -> str:
+
+        for jails_dataset_name in jails_dataset_names:
+            prefix = f"{jails_dataset_name}/"
+            if dataset_name.startswith(prefix):
+                jail_name = dataset_name[len(prefix):].split("/")[0]
+                return f"{prefix}{jail_name}"
+
+        return None
+
     @property
     def filters(self):
         return self._filters
@@ -92,26 +457,50 @@ class JailsGenerator(list):
 
     @property
     def jail_datasets(self) -> list:
-        jails_dataset = self.host.datasets.jails
-        return list(jails_dataset.children)
+        """
+        The datasets of all jails on all active pools
+        """
+        datasets = []
+        for jails_dataset in self.host.datasets.jails_datasets:
+            datasets += list(jails_dataset.children)
+        return datasets
 
     def _load_jail_from_dataset(
         self,
-        dataset: libzfs.ZFSDataset
+        dataset
     ) -> Generator[libiocage.lib.Jail.JailGenerator, None, None]:
 
-        return self._create_jail({
-            "name": self._get_name_from_jail_dataset(dataset)
-        })
+        return self._create_jail(
+            {"name": self._get_name_from_jail_dataset(dataset)},
+            jails_dataset_name=dataset.name.rsplit("/", maxsplit=1)[0]
+        )
 
     def _get_name_from_jail_dataset(
         self,
-        dataset: libzfs.ZFSDataset
+        dataset
     ) -> str:
 
         return dataset.name.split("/").pop()
 
 
+def _get_config_mtime(dataset) -> float:
+    """
+    Latest modification time of the config files of a jail dataset
+
+    Returns None when the jail has no config file, e.g. for configs
+    stored in ZFS properties.
+    """
+    modified_at = None
+    for file_name in ["config.json", "config"]:
+        try:
+            mtime = os.stat(f"{dataset.mountpoint}/{file_name}").st_mtime
+        except (OSError, TypeError):
+            continue
+        if (modified_at is None) or (mtime > modified_at):
+            modified_at = mtime
+    return modified_at
+
+
 class Jails(JailsGenerator):
 
     def _create_jail(self, *args, **kwargs):
@@ -122,3 +511,19 @@ class Jails(JailsGenerator):
 
     def __iter__(self):
         return JailsGenerator.__iter__(self)
+
+    def rollback(self, *args, **kwargs):
+        return list(JailsGenerator.rollback(self, *args, **kwargs))
+
+    def set(self, *args, **kwargs):
+        return list(JailsGenerator.set(self, *args, **kwargs))
+
+    def migrate(self, *args, **kwargs):
+        return list(JailsGenerator.migrate(self, *args, **kwargs))
+
+
+def _get_string_or_none(config, key):
+    try:
+        return config.get_string(key)
+    except Exception:
+        return None
@@ -21,6 +21,7 @@
 # STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING
 # IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
 # POSSIBILITY OF SUCH DAMAGE.
+import libiocage.lib.ReleaseCatalog
 import libiocage.lib.errors
 import libiocage.lib.helpers
 
@@ -32,7 +33,12 @@ class Prompts:
 
     def release(self):
         default = None
-        available_releases = self.host.distribution.releases
+        catalog = self.host.distribution.catalog
+        available_releases = catalog.releases
+        catalog.refresh_if_stale()
+
+        age = libiocage.lib.ReleaseCatalog.format_age(catalog.age)
+        print(f"Releases (catalog updated {age} ago):")
         for i, available_release in enumerate(available_releases):
             if available_release.name == self.host.release_version:
                 default = i
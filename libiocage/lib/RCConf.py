@@ -22,21 +22,45 @@
 # IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
 # POSSIBILITY OF SUCH DAMAGE.
 import os
+import re
 
-import ucl
-
+import libiocage.lib.ConfigBatch
 import libiocage.lib.helpers
 
 
 class RCConf(dict):
+    """
+    A jail's rc.conf file
+
+    The file is parsed into its lines with a native parser for the shell
+    variable assignments rc.conf consists of. Comments, blank lines, the
+    order of assignments and their quoting are preserved when the file is
+    written back. Only assignments that were changed are rendered again.
+    Keys are indexed by the position of their (last) assignment.
+
+    Args:
+
+        path (string):
+            Path of the rc.conf file
+
+        logger (libiocage.lib.Logger): (optional)
+            Instance of the logger that receives messages
+
+        jail (libiocage.lib.Jail.JailGenerator): (optional)
+            The jail the rc.conf belongs to
+    """
+
     def __init__(self, path, data={}, logger=None, jail=None):
 
         dict.__init__(self, {})
         libiocage.lib.helpers.init_logger(self, logger=logger)
         self.jail = jail
 
+        self._lines = []
+        self._index = {}
+
         # No file was loaded yet, so we can't know the delta yet
-        self._file_content_changed = True
+        self._file_content = None
         self._path = None
         self.path = path
 
@@ -52,63 +76,88 @@ class RCConf(dict):
             self._read_file()
 
     def _read_file(self, silent=False, delete=False):
+        content = None
         try:
             if (self.path is not None) and os.path.isfile(self.path):
-                data = self._read(silent=silent)
+                content = self._read(silent=silent)
         except:
-            data = {}
             pass
 
-        existing_keys = set(self.keys())
-        new_keys = set(data.keys())
-        delete_keys = existing_keys - new_keys
-
-        if delete is True:
-            for key in delete_keys:
-                del self[key]
+        previous_data = dict(dict.items(self))
+        self._load(content or "")
+        self._file_content = content
 
-        for key in new_keys:
-            self[key] = data[key]
+        if delete is False:
+            for key, value in previous_data.items():
+                if key not in self._index.keys():
+                    # There are properties that are not in the file
+                    self._set_value(key, value)
 
         if silent is False:
             self.logger.verbose(f"Updated rc.conf data from {self.path}")
 
-        if delete is False and len(delete_keys) > 0:
-            # There are properties that are not in the file
-            self._file_content_changed = True
-        else:
-            # Current data matches with file contents
-            self._file_content_changed = False
-
     def _read(self, silent=False):
-        data = ucl.load(open(self.path).read())
+        with open(self.path) as f:
+            content = f.read()
         self.logger.spam(
             f"rc.conf was read from {self.path}",
             jail=self.jail
         )
-        return data
+        return content
+
+    def _load(self, content):
+        self._lines = parse(content)
+        self._update_index()
+
+    def _update_index(self):
+        dict.clear(self)
+        self._index = {}
+        for i, line in enumerate(self._lines):
+            if line.key is not None:
+                self._index[line.key] = i
+                dict.__setitem__(self, line.key, line.value)
+
+    def render(self):
+        return "".join(line.render() for line in self._lines)
 
-    def save(self):
+    def save(self, batch=None):
 
-        if self._file_content_changed is False:
+        output = self.render()
+
+        if output == self._file_content:
             self.logger.debug("rc.conf was not modified - skipping write")
-            return
+            return False
+
+        self.logger.verbose(
+            f"Writing rc.conf to {self.path}",
+            jail=self.jail
+        )
 
-        with open(self.path, "w") as rcconf:
-            output = ucl.dump(self, ucl.UCL_EMIT_CONFIG)
-            output = output.replace(" = \"", "=\"")
-            output = output.replace("\";\n", "\"\n")
+        libiocage.lib.ConfigBatch.write(self.path, output, batch)
+        self._file_content = output
 
-            self.logger.verbose(
-                f"Writing rc.conf to {self.path}",
-                jail=self.jail
-            )
+        self.logger.spam(output[:-1], jail=self.jail, indent=1)
+        return True
 
-            rcconf.write(output)
-            rcconf.truncate()
-            rcconf.close()
+    def _set_value(self, key, value):
 
-            self.logger.spam(output[:-1], jail=self.jail, indent=1)
+        if not is_valid_key(key):
+            raise ValueError(f"Invalid rc.conf variable name: {key}")
+
+        try:
+            line = self._lines[self._index[key]]
+            if line.value == value:
+                return
+            line.value = value
+            line.text = None
+        except KeyError:
+            if (len(self._lines) > 0) and \
+                    not self._lines[-1].render().endswith("\n"):
+                self._lines.append(RCConfLine(text="\n"))
+            self._lines.append(RCConfLine(key=key, value=value, quote="\""))
+            self._index[key] = len(self._lines) - 1
+
+        dict.__setitem__(self, key, value)
 
     def __setitem__(self, key, value):
         val = libiocage.lib.helpers.to_string(
@@ -117,8 +166,246 @@ class RCConf(dict):
             false="NO"
         )
 
-        dict.__setitem__(self, key, val)
+        self._set_value(key, val)
 
     def __getitem__(self, key):
         val = dict.__getitem__(self, key)
         return libiocage.lib.helpers.parse_user_input(val)
+
+    def __delitem__(self, key):
+        dict.__getitem__(self, key)
+        # earlier assignments would take effect otherwise
+        self._lines = [line for line in self._lines if line.key != key]
+        self._update_index()
+
+
+class RCConfLine:
+    """
+    A line of an rc.conf file
+
+    Lines that are not modified keep their original text. Assignments are
+    rendered from key, value and quote character once they were changed.
+
+    Args:
+
+        text (string): (optional)
+            The original text including the line break
+
+        key (string): (optional)
+            The variable name of an assignment
+
+        value (string): (optional)
+            The unquoted value of an assignment
+
+        quote (string): (optional)
+            The quote character the value was written with ('"', "'" or
+            an empty string)
+
+        prefix (string): (optional)
+            Text in front of the variable name (e.g. indentation)
+
+        suffix (string): (optional)
+            Text behind the value (e.g. a comment and the line break)
+    """
+
+    __slots__ = ("text", "key", "value", "quote", "prefix", "suffix")
+
+    def __init__(
+        self,
+        text=None,
+        key=None,
+        value=None,
+        quote="\"",
+        prefix="",
+        suffix="\n"
+    ):
+        self.text = text
+        self.key = key
+        self.value = value
+        self.quote = quote
+        self.prefix = prefix
+        self.suffix = suffix
+
+    def render(self):
+        if self.text is not None:
+            return self.text
+        return f"{self.prefix}{self.key}={quote(self.value, self.quote)}" \
+            f"{self.suffix}"
+
+
+_assignment_pattern = re.compile(
+    r"([ \t]*(?:export[ \t]+)?)([A-Za-z_]\w*)=",
+    re.ASCII
+)
+_key_pattern = re.compile(r"[A-Za-z_]\w*", re.ASCII)
+_unquoted_pattern = re.compile(r"[\w./:,+@%-]+", re.ASCII)
+_double_quoted_escapes = ["\\", "\"", "$", "`"]
+_simple_value_pattern = re.compile(
+    r"(?:\"([^\"\\$`]*)\"|'([^']*)'|([\w./:,+@%-]+))(?=[ \t\n;]|\Z)",
+    re.ASCII
+)
+# an assignment may only be followed by a comment or another command
+_suffix_pattern = re.compile(r"[ \t]*(?:[#;][^\n]*)?\n?", re.ASCII)
+
+
+def is_valid_key(key):
+    return isinstance(key, str) and (_key_pattern.fullmatch(key) is not None)
+
+
+def parse(content):
+    """
+    Split rc.conf content into RCConfLine objects
+
+    Variable assignments are recognized with unquoted, single and double
+    quoted values, including values continued on following lines. Values
+    with expansions or subshells ($, backticks, parentheses) and all other
+    lines are kept as they are, so that rendering the result yields the
+    exact content again.
+    """
+    lines = []
+    position = 0
+    length = len(content)
+
+    while position < length:
+
+        line_end = content.find("\n", position)
+        line_end = length if (line_end < 0) else (line_end + 1)
+
+        match = _assignment_pattern.match(content, position, line_end)
+        parsed = None
+        if match is not None:
+            parsed = _parse_value(content, match.end())
+
+        if parsed is None:
+            lines.append(RCConfLine(text=content[position:line_end]))
+            position = line_end
+            continue
+
+        value, quote_character, value_end = parsed
+        line_end = content.find("\n", value_end)
+        line_end = length if (line_end < 0) else (line_end + 1)
+
+        if _suffix_pattern.fullmatch(content, value_end, line_end) is None:
+            # e.g. a command run with the variable in its environment
+            lines.append(RCConfLine(text=content[position:line_end]))
+            position = line_end
+            continue
+
+        lines.append(RCConfLine(
+            text=content[position:line_end],
+            key=match.group(2),
+            value=value,
+            quote=quote_character,
+            prefix=match.group(1),
+            suffix=content[value_end:line_end]
+        ))
+        position = line_end
+
+    return lines
+
+
+def _parse_value(content, position):
+    """
+    Parse a shell word starting at position
+
+    Returns a tuple of the value, the quote character and the position
+    after the word, or None when a quote is not terminated or the value
+    cannot be read without evaluating it.
+    """
+    match = _simple_value_pattern.match(content, position)
+    if match is not None:
+        double_quoted, single_quoted, unquoted = match.groups()
+        if double_quoted is not None:
+            return double_quoted, "\"", match.end()
+        if single_quoted is not None:
+            return single_quoted, "'", match.end()
+        return unquoted, "", match.end()
+
+    value = []
+    quotes = set()
+    length = len(content)
+
+    while position < length:
+        character = content[position]
+
+        if character in "()$`":
+            # subshells, parameter expansion and command substitution
+            return None
+
+        if character in " \t\n;&|<>":
+            break
+
+        if character == "\\":
+            if position + 1 >= length:
+                return None
+            if content[position + 1] != "\n":
+                value.append(content[position + 1])
+            position += 2
+            quotes.add("")
+            continue
+
+        if character == "'":
+            end = content.find("'", position + 1)
+            if end < 0:
+                return None
+            value.append(content[(position + 1):end])
+            position = end + 1
+            quotes.add("'")
+            continue
+
+        if character == "\"":
+            position += 1
+            while True:
+                if position >= length:
+                    return None
+                character = content[position]
+                if character == "\"":
+                    position += 1
+                    break
+                if character in "$`":
+                    return None
+                if (character == "\\") and (position + 1 < length):
+                    escaped = content[position + 1]
+                    if escaped in _double_quoted_escapes:
+                        value.append(escaped)
+                        position += 2
+                        continue
+                    if escaped == "\n":
+                        position += 2
+                        continue
+                value.append(character)
+                position += 1
+            quotes.add("\"")
+            continue
+
+        value.append(character)
+        position += 1
+        quotes.add("")
+
+    if len(quotes) == 1:
+        quote_character = quotes.pop()
+    else:
+        # empty or mixed quoting is written with double quotes on change
+        quote_character = "\""
+
+    return "".join(value), quote_character, position
+
+
+def quote(value, quote_character="\""):
+    """
+    Quote a value for an rc.conf assignment
+
+    The preferred quote character is used when it can represent the value.
+    """
+    value = str(value)
+
+    if (quote_character == "") and \
+            (_unquoted_pattern.fullmatch(value) is not None):
+        return value
+
+    if (quote_character == "'") and ("'" not in value):
+        return f"'{value}'"
+
+    for character in _double_quoted_escapes:
+        value = value.replace(character, f"\\{character}")
+    return f"\"{value}\""
@@ -21,24 +21,54 @@
 # STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING
 # IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
 # POSSIBILITY OF SUCH DAMAGE.
+import concurrent.futures
 import datetime
 import hashlib
 import os
 import shutil
-import tarfile
+import subprocess
 import urllib.request
 import uuid
 from urllib.parse import urlparse
 
-import libzfs
 import ucl
 
+import libiocage.lib.AssetCache
+import libiocage.lib.AssetPipeline
+import libiocage.lib.HTTPClient
+import libiocage.lib.HTTPDownloader
 import libiocage.lib.Jail
+import libiocage.lib.JailStream
+import libiocage.lib.ReleaseGeneration
+import libiocage.lib.SnapshotRetention
+import libiocage.lib.TreeSync
 import libiocage.lib.errors
 import libiocage.lib.helpers
 import libiocage.lib.events
 
 
+def parse_hash_file(content):
+    """
+    Map asset names to their SHA-256 digests listed in a hash file
+
+    yes, this can read HardenedBSD and FreeBSD hash files
+    """
+    hashes = {}
+    for line in content.split("\n"):
+        s = set(line.replace("\t", " ").split(" "))
+        fingerprint = None
+        asset = None
+        for x in s:
+            x = x.strip("()")
+            if len(x) == 64:
+                fingerprint = x
+            elif x.endswith(".txz"):
+                asset = x[:-4]
+        if asset and fingerprint:
+            hashes[asset] = fingerprint
+    return hashes
+
+
 class ReleaseGenerator:
     DEFAULT_RC_CONF_SERVICES = {
         "netif": False,
@@ -47,6 +77,8 @@ class ReleaseGenerator:
         "sendmail_msp_queue": False,
         "sendmail_outbound": False
     }
+    ZFS_GENERATION_PROPERTY = "org.freebsd.ioc:generation"
+    UPDATE_SNAPSHOT_PREFIX = "pre-update"
 
     def __init__(self, name=None,
                  dataset=None,
@@ -54,7 +86,10 @@ class ReleaseGenerator:
                  zfs=None,
                  logger=None,
                  check_hashes=True,
-                 eol=False):
+                 eol=False,
+                 iocage_dataset=None,
+                 asset_cache=None,
+                 downloader=None):
 
         libiocage.lib.helpers.init_logger(self, logger)
         libiocage.lib.helpers.init_zfs(self, zfs)
@@ -65,12 +100,21 @@ class ReleaseGenerator:
 
         self.name = name
         self.eol = eol
+        # the iocage root of the pool the release is stored on
+        self.iocage_dataset = iocage_dataset
         self._hashes = None
         self._dataset = None
         self._root_dataset = None
         self.dataset = dataset
         self.check_hashes = check_hashes is True
         self._hbsd_release_branch = None
+        self._asset_pipelines = {}
+        self._asset_sources = {}
+        self.asset_cache = asset_cache
+        # a downloader shared with concurrently fetched releases
+        self.downloader = downloader
+        self.retention_policy = \
+            libiocage.lib.SnapshotRetention.RetentionPolicy()
 
         self._assets = ["base"]
         if self.host.distribution.name != "HardenedBSD":
@@ -84,7 +128,7 @@ class ReleaseGenerator:
 
     @dataset.setter
     def dataset(self, value):
-        if isinstance(value, libzfs.ZFSDataset):
+        if libiocage.lib.helpers.is_zfs_dataset(value):
             try:
                 value.mountpoint
             except:
@@ -102,7 +146,7 @@ class ReleaseGenerator:
             try:
                 ds = self.zfs.get_dataset(self.root_dataset_name)
             except:
-                self.host.datasets.releases.pool.create(
+                self.releases_dataset.pool.create(
                     self.root_dataset_name,
                     {},
                     create_ancestors=True
@@ -113,17 +157,25 @@ class ReleaseGenerator:
 
         return self._root_dataset
 
+    @property
+    def releases_dataset(self):
+        return self.host.datasets.get_dataset("releases", self.iocage_dataset)
+
+    @property
+    def base_parent_dataset(self):
+        return self.host.datasets.get_dataset("base", self.iocage_dataset)
+
     @property
     def dataset_name(self):
-        return f"{self.host.datasets.releases.name}/{self.name}"
+        return f"{self.releases_dataset.name}/{self.name}"
 
     @property
     def root_dataset_name(self):
-        return f"{self.host.datasets.releases.name}/{self.name}/root"
+        return f"{self.releases_dataset.name}/{self.name}/root"
 
     @property
     def releases_folder(self):
-        return self.host.datasets.releases.mountpoint
+        return self.releases_dataset.mountpoint
 
     @property
     def base_dataset(self):
@@ -133,7 +185,94 @@ class ReleaseGenerator:
 
     @property
     def base_dataset_name(self):
-        return f"{self.host.datasets.base.name}/{self.name}/root"
+        return f"{self.base_parent_dataset.name}/{self.name}/root"
+
+    @property
+    def generations_directory(self):
+        return f"{self.dataset.mountpoint}/generations"
+
+    @property
+    def generations(self):
+        """
+        All generations of the release, oldest first
+        """
+
+        if not os.path.isdir(self.generations_directory):
+            return []
+
+        generations = []
+        for file_name in os.listdir(self.generations_directory):
+            if file_name.endswith(".json"):
+                generations.append(self.get_generation(file_name[:-5]))
+
+        return sorted(generations, key=lambda x: x.created)
+
+    @property
+    def current_generation(self):
+        """
+        The generation new jails are cloned from or None
+        """
+
+        try:
+            properties = self.root_dataset.properties
+            identifier = properties[self.ZFS_GENERATION_PROPERTY].value
+        except KeyError:
+            return None
+
+        if identifier in (None, "", "-"):
+            return None
+
+        return self.get_generation(identifier)
+
+    def get_generation(self, identifier):
+        generation = libiocage.lib.ReleaseGeneration.ReleaseGeneration(
+            release=self,
+            identifier=identifier,
+            logger=self.logger
+        )
+        # raises ReleaseGenerationNotFound for unknown identifiers
+        generation.manifest
+        return generation
+
+    def create_generation(self):
+        """
+        Snapshot the release root as new generation unless unchanged
+
+        Generations are named after the digest of their content, so that
+        an update that results in a known state reuses that generation.
+        """
+
+        current = self.current_generation
+        parent = None if current is None else current.identifier
+
+        generation = libiocage.lib.ReleaseGeneration.ReleaseGeneration
+        generation = generation.from_directory(
+            release=self,
+            root_dir=self.root_dir,
+            parent=parent,
+            logger=self.logger
+        )
+
+        if generation.identifier == parent:
+            self.logger.verbose(
+                f"Release '{self.name}' is unchanged since generation {parent}"
+            )
+            return current
+
+        try:
+            self.zfs.get_snapshot(generation.snapshot_name)
+            generation = self.get_generation(generation.identifier)
+        except libiocage.lib.helpers.ZFSException:
+            self.root_dataset.snapshot(generation.snapshot_name)
+            generation.save()
+
+        self.root_dataset.properties[self.ZFS_GENERATION_PROPERTY] = \
+            libiocage.lib.helpers.zfs_user_property(generation.identifier)
+
+        self.logger.verbose(
+            f"Release '{self.name}' is at generation {generation.identifier}"
+        )
+        return generation
 
     @property
     def download_directory(self):
@@ -201,12 +340,10 @@ class ReleaseGenerator:
 
     @property
     def available(self):
-        try:
-            request = urllib.request.Request(self.remote_url, method="HEAD")
-            resource = urllib.request.urlopen(request)
-            return resource.getcode() == 200
-        except:
-            return False
+        return self.host.distribution.http_client.exists(
+            self.remote_url,
+            ttl=libiocage.lib.HTTPClient.AVAILABILITY_TTL
+        )
 
     @property
     def fetched(self):
@@ -229,7 +366,7 @@ class ReleaseGenerator:
             pass
 
         try:
-            return self.host.datasets.releases.pool
+            return self.releases_dataset.pool
         except:
             pass
 
@@ -290,6 +427,7 @@ class ReleaseGenerator:
         releaseExtractionEvent = events.ReleaseExtraction(self)
         releaseConfigurationEvent = events.ReleaseConfiguration(self)
         releaseCopyBaseEvent = events.ReleaseCopyBase(self)
+        releaseGenerationEvent = events.ReleaseGenerationCreate(self)
 
         if not self.fetched:
 
@@ -303,7 +441,12 @@ class ReleaseGenerator:
             yield releasePrepareStorageEvent.end()
             yield releaseDownloadEvent.begin()
 
-            self._fetch_assets()
+            try:
+                for event in self._fetch_assets():
+                    yield event
+            except Exception as e:
+                yield releaseDownloadEvent.fail(e)
+                raise
 
             yield releaseDownloadEvent.end()
             yield releaseExtractionEvent.begin()
@@ -354,6 +497,17 @@ class ReleaseGenerator:
         else:
             yield releaseCopyBaseEvent.skip(message="release unchanged")
 
+        if release_changed or (self.current_generation is None):
+            yield releaseGenerationEvent.begin()
+            try:
+                generation = self.create_generation()
+            except Exception as e:
+                yield releaseGenerationEvent.fail(e)
+                raise
+            yield releaseGenerationEvent.end(message=generation.identifier)
+        else:
+            yield releaseGenerationEvent.skip(message="release unchanged")
+
         self._cleanup()
 
     def fetch_updates(self):
@@ -453,7 +607,9 @@ class ReleaseGenerator:
 
     def update(self):
         dataset = self.dataset
-        snapshot_name = self._append_datetime(f"{dataset.name}@pre-update")
+        snapshot_name = self._append_datetime(
+            f"{dataset.name}@{ReleaseGenerator.UPDATE_SNAPSHOT_PREFIX}"
+        )
 
         runReleaseUpdateEvent = libiocage.lib.events.RunReleaseUpdate(self)
         yield runReleaseUpdateEvent.begin()
@@ -502,8 +658,138 @@ class ReleaseGenerator:
             yield runReleaseUpdateEvent.fail(e)
             raise e
 
+        try:
+            for event in ReleaseGenerator.prune_snapshots(self):
+                yield event
+        except Exception as e:
+            # the update succeeded even when old snapshots remain
+            self.logger.warn(f"Pruning update snapshots failed: {e}")
+
         return changed
 
+    def get_snapshot_prune_plan(self):
+        """
+        Pre-update snapshots that the retention policy would destroy
+        """
+        return self._get_snapshot_pruner().plan(
+            self.dataset_name,
+            prefix=ReleaseGenerator.UPDATE_SNAPSHOT_PREFIX
+        )
+
+    def prune_snapshots(self, dry_run=False):
+        """
+        Destroy pre-update snapshots according to the retention policy
+
+        Snapshots that are origins of jail clones are kept.
+        """
+        releaseSnapshotPruneEvent = \
+            libiocage.lib.events.ReleaseSnapshotPrune(self)
+        yield releaseSnapshotPruneEvent.begin()
+
+        try:
+            plan = self.get_snapshot_prune_plan()
+            if (dry_run is False) and (len(plan.delete) > 0):
+                self._get_snapshot_pruner().prune(plan)
+        except Exception as e:
+            yield releaseSnapshotPruneEvent.fail(e)
+            raise
+
+        if len(plan.delete) == 0:
+            yield releaseSnapshotPruneEvent.skip(message="nothing to prune")
+            return
+
+        size = libiocage.lib.JailStream.format_transfer(plan.reclaim)
+        verb = "would free" if dry_run else "freed"
+        yield releaseSnapshotPruneEvent.end(
+            message=f"{len(plan.delete)} snapshots - {verb} {size}"
+        )
+
+    def _get_snapshot_pruner(self):
+        return libiocage.lib.SnapshotRetention.SnapshotPruner(
+            policy=self.retention_policy,
+            logger=self.logger
+        )
+
+    def replicate(self, source):
+        """
+        Copy a fetched release from another pool with zfs send/receive
+
+        Jails are cloned from a release on their own pool, so releases are
+        replicated to a pool the first time a jail is placed on it.
+
+        Args:
+
+            source (libiocage.lib.Release.ReleaseGenerator):
+                The fetched release on another pool
+        """
+
+        releaseReplicationEvent = libiocage.lib.events.ReleaseReplication(
+            self
+        )
+        yield releaseReplicationEvent.begin()
+
+        snapshot_name = self._append_datetime("ioc-replica-")
+        base_name = f"{source.base_parent_dataset.name}/{self.name}"
+
+        try:
+            self._replicate_dataset(
+                source.dataset_name,
+                self.dataset_name,
+                snapshot_name
+            )
+
+            try:
+                self.zfs.get_dataset(base_name)
+                has_base_datasets = True
+            except libiocage.lib.helpers.ZFSException:
+                has_base_datasets = False
+
+            if has_base_datasets is True:
+                self._replicate_dataset(
+                    base_name,
+                    f"{self.base_parent_dataset.name}/{self.name}",
+                    snapshot_name
+                )
+        except Exception as e:
+            yield releaseReplicationEvent.fail(e)
+            raise
+
+        self._dataset = None
+        self._root_dataset = None
+
+        yield releaseReplicationEvent.end()
+
+    def _replicate_dataset(self, source_name, target_name, snapshot_name):
+
+        snapshot = f"{source_name}@{snapshot_name}"
+        self.zfs.get_dataset(source_name).snapshot(snapshot, recursive=True)
+        self.logger.verbose(f"Replicating {snapshot} to {target_name}")
+
+        send = libiocage.lib.helpers.exec_raw(
+            ["/sbin/zfs", "send", "-R", snapshot],
+            logger=self.logger,
+            stdout=subprocess.PIPE
+        )
+        receive = libiocage.lib.helpers.exec_raw(
+            ["/sbin/zfs", "receive", "-F", target_name],
+            logger=self.logger,
+            stdin=send.stdout,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE
+        )
+
+        # allow send to receive a SIGPIPE if receive exits
+        send.stdout.close()
+        _, stderr = receive.communicate()
+        returncode = send.wait() or receive.returncode
+
+        if returncode != 0:
+            self.logger.warn(stderr.decode("UTF-8").strip())
+            raise libiocage.lib.errors.CommandFailure(
+                returncode=returncode,
+                logger=self.logger
+            )
+
     def _update_hbsd_jail(self, jail):
 
         events = libiocage.lib.events
@@ -617,7 +903,7 @@ class ReleaseGenerator:
         return text
 
     def _basejail_datasets_already_exists(self, release_name):
-        base_dataset = self.host.datasets.base
+        base_dataset = self.base_parent_dataset
         for dataset in base_dataset.children:
             if dataset.name == f"{base_dataset.name}/release_name":
                 return True
@@ -629,7 +915,7 @@ class ReleaseGenerator:
             name = self.dataset_name
 
         try:
-            if isinstance(self.dataset, libzfs.ZFSDataset):
+            if libiocage.lib.helpers.is_zfs_dataset(self.dataset):
                 return
         except:
             pass
@@ -652,17 +938,115 @@ class ReleaseGenerator:
         self.logger.debug(f"Hashes downloaded to {path}")
 
     def _fetch_assets(self):
+        """
+        Download all missing assets concurrently
+
+        Partial downloads of an earlier attempt are resumed. The assets
+        are hashed and extracted to a staging directory while they are
+        downloaded, and committed by _extract_assets(). Assets found in
+        the asset cache are not downloaded at all.
+        """
+
+        downloads = []
+        cached_assets = []
         for asset in self.assets:
-            url = f"{self.remote_url}/{asset}.txz"
             path = self._get_asset_location(asset)
 
             if os.path.isfile(path):
                 self.logger.verbose(f"{path} already exists - skipping.")
-                return
+                continue
+
+            cached_path = self._get_cached_asset(asset)
+            if cached_path is not None:
+                self._asset_sources[asset] = cached_path
+                cached_assets.append(asset)
+                continue
+
+            url = f"{self.remote_url}/{asset}.txz"
+            self.logger.debug(f"Starting download of {url}")
+            pipeline = self._create_asset_pipeline(asset)
+            self._asset_pipelines[asset] = pipeline
+            downloads.append(libiocage.lib.HTTPDownloader.Download(
+                url=url,
+                path=path,
+                name=asset,
+                sink=pipeline
+            ))
+
+        for asset in cached_assets:
+            yield libiocage.lib.events.ReleaseAssetDownload(
+                self,
+                asset
+            ).skip(message="cached")
+
+        assetDownloadEvents = {}
+        for download in downloads:
+            event = libiocage.lib.events.ReleaseAssetDownload(
+                self,
+                download.name
+            )
+            assetDownloadEvents[download.name] = event
+            yield event.begin()
+
+        downloader = self.downloader
+        if downloader is None:
+            downloader = libiocage.lib.HTTPDownloader.HTTPDownloader(
+                logger=self.logger
+            )
+        format_transfer = libiocage.lib.JailStream.format_transfer
+
+        failed = []
+        for download in downloader.download(downloads):
+            event = assetDownloadEvents[download.name]
+            message = format_transfer(
+                download.transferred - download.resumed_at,
+                download.duration
+            )
+            if download.size:
+                percent = int(100 * download.transferred / download.size)
+                message = f"{percent}% - {message}"
+
+            if download.error is not None:
+                failed.append(download)
+                self._asset_pipelines.pop(download.name).abort()
+                yield event.fail(download.error)
+            elif download.done is True:
+                yield event.end(message=message)
             else:
-                self.logger.debug(f"Starting download of {url}")
-                urllib.request.urlretrieve(url, path)
-                self.logger.verbose(f"{url} was saved to {path}")
+                yield event.step(message=message)
+
+        if self.downloader is None:
+            downloader.close()
+
+        if len(failed) > 0:
+            for pipeline in self._asset_pipelines.values():
+                pipeline.abort()
+            self._asset_pipelines = {}
+            raise failed[0].error
+
+    def _get_cached_asset(self, asset_name):
+        """
+        Location of the asset in the cache, if it is cached
+
+        Cached assets are looked up by the digest from the hash file, so
+        that the cache is only used when hashes are checked.
+        """
+        if (self.asset_cache is None) or (self.check_hashes is False):
+            return None
+
+        digest = self.hashes.get(asset_name)
+        if digest is None:
+            return None
+
+        return self.asset_cache.get(digest)
+
+    def _create_asset_pipeline(self, asset_name):
+        return libiocage.lib.AssetPipeline.AssetPipeline(
+            staging_dir=f"{self.root_dir}/.ioc-staging-{asset_name}",
+            validate_member=lambda x: self._check_tar_info(x, asset_name),
+            compression="xz",
+            logger=self.logger
+        )
 
     def _clean_dataset(self):
 
@@ -682,22 +1066,9 @@ class ReleaseGenerator:
             self._rmtree(asset_path)
 
     def read_hashes(self):
-        # yes, this can read HardenedBSD and FreeBSD hash files
         path = self.__get_hashfile_location()
-        hashes = {}
         with open(path, "r") as f:
-            for line in f.read().split("\n"):
-                s = set(line.replace("\t", " ").split(" "))
-                fingerprint = None
-                asset = None
-                for x in s:
-                    x = x.strip("()")
-                    if len(x) == 64:
-                        fingerprint = x
-                    elif x.endswith(".txz"):
-                        asset = x[:-4]
-                if asset and fingerprint:
-                    hashes[asset] = fingerprint
+            hashes = parse_hash_file(f.read())
         count = len(hashes)
         self.logger.spam(f"{count} hashes read from {path}")
         return hashes
@@ -710,22 +1081,88 @@ class ReleaseGenerator:
         return f"{self.download_directory}/{asset_name}.txz"
 
     def _extract_assets(self):
-
+        """
+        Verify the hashes of the staged assets and commit them
+
+        Assets that were already downloaded before or that were found in
+        the asset cache are read once, hashed and extracted in the same
+        pass. Every asset is extracted into its own staging directory, so
+        that they are unpacked concurrently. Verified downloads are moved
+        into the asset cache afterwards.
+        """
+
+        pipelines = {}
+        downloaded_before = []
         for asset in self.assets:
+            pipeline = self._asset_pipelines.pop(asset, None)
+            if pipeline is None:
+                self.logger.debug(f"Extracting {asset}")
+                pipeline = self._create_asset_pipeline(asset)
+                downloaded_before.append(asset)
+            pipelines[asset] = pipeline
+
+        def finish(asset):
+            pipeline = pipelines[asset]
+            if asset in downloaded_before:
+                pipeline.feed_file(self._asset_sources.get(
+                    asset,
+                    self._get_asset_location(asset)
+                ))
+            pipeline.close()
+
+        max_workers = max(len(pipelines), 1)
+        with concurrent.futures.ThreadPoolExecutor(max_workers) as executor:
+            futures = {
+                asset: executor.submit(finish, asset)
+                for asset in pipelines.keys()
+            }
 
-            if self.check_hashes:
-                self._check_asset_hash(asset)
+        try:
+            for asset, future in futures.items():
+                future.result()
+                if self.check_hashes:
+                    self._check_asset_hash(asset, pipelines[asset].digest)
+        except libiocage.lib.errors.InvalidReleaseAssetSignature:
+            self._abort_extraction(pipelines)
+            self._remove_cached_assets()
+            raise
+        except Exception:
+            self._abort_extraction(pipelines)
+            raise
+
+        for asset, pipeline in pipelines.items():
+            pipeline.commit(self.root_dir)
+            self.logger.verbose(
+                f"Asset {asset} was extracted to {self.root_dir}"
+            )
+            self._cache_asset(asset, pipeline.digest)
 
-            with tarfile.open(self._get_asset_location(asset)) as f:
+        self._asset_sources = {}
 
-                self.logger.verbose(f"Verifying file structure in {asset}")
-                self._check_tar_files(f.getmembers(), asset_name=asset)
+    def _abort_extraction(self, pipelines):
+        for pipeline in pipelines.values():
+            pipeline.abort()
 
-                self.logger.debug(f"Extracting {asset}")
-                f.extractall(self.root_dir)
-                self.logger.verbose(
-                    f"Asset {asset} was extracted to {self.root_dir}"
-                )
+    def _cache_asset(self, asset_name, digest):
+        if (self.asset_cache is None) or (asset_name in self._asset_sources):
+            return
+
+        asset_location = self._get_asset_location(asset_name)
+        if not os.path.isfile(asset_location):
+            return
+
+        try:
+            self.asset_cache.put(digest, asset_location, move=True)
+        except OSError as e:
+            self.logger.warn(f"Asset {asset_name} was not cached: {e}")
+
+    def _remove_cached_assets(self):
+        """
+        Drop cached assets that were used for a failed extraction
+        """
+        for asset in self._asset_sources.keys():
+            self.asset_cache.remove(self.hashes[asset])
+        self._asset_sources = {}
 
     def _create_default_rcconf(self):
         file = f"{self.root_dir}/etc/rc.conf"
@@ -753,19 +1190,20 @@ class ReleaseGenerator:
     def _update_zfs_base(self):
 
         try:
-            self.host.datasets.base.pool.create(
+            self.base_parent_dataset.pool.create(
                 self.base_dataset_name, {}, create_ancestors=True)
             self.base_dataset.mount()
         except:
             pass
 
         base_dataset = self.base_dataset
-        pool = self.host.datasets.base.pool
+        pool = self.base_parent_dataset.pool
 
         basedirs = libiocage.lib.helpers.get_basedir_list(
             distribution_name=self.host.distribution.name
         )
 
+        tree_sync = libiocage.lib.TreeSync.TreeSync(logger=self.logger)
         for folder in basedirs:
             try:
                 pool.create(
@@ -781,50 +1219,11 @@ class ReleaseGenerator:
             src = f"{self.root_dataset.mountpoint}/{folder}"
             dst = f"{base_dataset.mountpoint}/{folder}"
 
-            self.logger.verbose(f"Copying {folder} from {src} to {dst}")
-            self._copytree(src, dst)
+            self.logger.verbose(f"Syncing {folder} from {src} to {dst}")
+            tree_sync.sync(src, dst)
 
         self.logger.debug(f"Updated release base datasets for {self.name}")
 
-    def _copytree(self, src_path, dst_path, delete=False):
-
-        src_dir = set(os.listdir(src_path))
-        dst_dir = set(os.listdir(dst_path))
-
-        if delete is True:
-            for item in dst_dir - src_dir:
-                self._rmtree("f{dst_dir}/{item}")
-
-        for item in os.listdir(src_path):
-            src = os.path.join(src_path, item)
-            dst = os.path.join(dst_path, item)
-            if os.path.islink(src) or os.path.isfile(src):
-                self._copyfile(src, dst)
-            else:
-                if not os.path.isdir(dst):
-                    src_stat = os.stat(src)
-                    os.makedirs(dst, src_stat.st_mode)
-                self._copytree(src, dst)
-
-    def _copyfile(self, src_path, dst_path):
-
-        dst_flags = None
-
-        if os.path.islink(dst_path):
-            os.unlink(dst_path)
-        elif os.path.isfile(dst_path) or os.path.isdir(dst_path):
-            dst_stat = os.stat(dst_path)
-            dst_flags = dst_stat.st_flags
-            self._rmtree(dst_path)
-
-        if os.path.islink(src_path):
-            linkto = os.readlink(src_path)
-            os.symlink(linkto, dst_path)
-        else:
-            shutil.copy2(src_path, dst_path)
-            if dst_flags is not None:
-                os.chflags(dst_path, dst_flags)
-
     def _rmtree(self, path):
         if os.path.islink(path):
             os.unlink(path)
@@ -844,8 +1243,9 @@ class ReleaseGenerator:
             if os.path.isfile(asset_location):
                 os.remove(asset_location)
 
-    def _check_asset_hash(self, asset_name):
-        local_file_hash = self._read_asset_hash(asset_name)
+    def _check_asset_hash(self, asset_name, local_file_hash=None):
+        if local_file_hash is None:
+            local_file_hash = self._read_asset_hash(asset_name)
         expected_hash = self.hashes[asset_name]
 
         has_valid_hash = local_file_hash == expected_hash
@@ -872,10 +1272,6 @@ class ReleaseGenerator:
                 sha256.update(block)
         return sha256.hexdigest()
 
-    def _check_tar_files(self, tar_infos, asset_name):
-        for i in tar_infos:
-            self._check_tar_info(i, asset_name)
-
     def _check_tar_info(self, tar_info, asset_name):
         if tar_info.name == ".":
             return
@@ -904,3 +1300,9 @@ class Release(ReleaseGenerator):
 
     def update(self, *args, **kwargs):
         return list(ReleaseGenerator.update(self, *args, **kwargs))
+
+    def prune_snapshots(self, *args, **kwargs):
+        return list(ReleaseGenerator.prune_snapshots(self, *args, **kwargs))
+
+    def replicate(self, *args, **kwargs):
+        return list(ReleaseGenerator.replicate(self, *args, **kwargs))
@@ -0,0 +1,303 @@
+# Copyright (c) 2014-2017, iocage
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted providing that the following conditions
+# are met:
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in the
+#    documentation and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE AUTHOR ``AS IS'' AND ANY EXPRESS OR
+# IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED.  IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR ANY
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS
+# OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION)
+# HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT,
+# STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING
+# IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+"""
+Persisted catalog of the releases available on the mirror
+"""
+import concurrent.futures
+import http.client
+import json
+import threading
+import time
+
+import libiocage.lib.ConfigBatch
+import libiocage.lib.Release
+import libiocage.lib.errors
+import libiocage.lib.helpers
+
+
+class ReleaseCatalog:
+    """
+    Releases of the distribution mirror stored under the iocage root
+
+    The catalog lists the names, EOL flags, asset hashes and asset sizes
+    of all remote releases. It is read from disk without network access
+    and refreshed on demand or in a background thread, so that listing
+    and selecting releases never waits for the mirror. Only the first
+    use on a host needs to fetch the catalog synchronously.
+
+    Args:
+
+        distribution (libiocage.lib.Distribution.DistributionGenerator):
+            The distribution whose mirror is cataloged
+
+        path (string): (optional)
+            Location of the catalog file. Defaults to catalog.json in the
+            mountpoint of the iocage root dataset
+
+        max_age (int): (default=86400)
+            Seconds after which the catalog is considered stale
+    """
+
+    CATALOG_VERSION = 1
+
+    def __init__(
+        self,
+        distribution,
+        path=None,
+        max_age=24 * 60 * 60,
+        max_workers=4,
+        logger=None
+    ):
+
+        libiocage.lib.helpers.init_logger(self, logger)
+        self.distribution = distribution
+        self._path = path
+        self.max_age = max_age
+        self.max_workers = max_workers
+        self._data = None
+        self._refresh_thread = None
+        self._refresh_succeeded = False
+        self._lock = threading.Lock()
+
+    @property
+    def path(self):
+        if self._path is None:
+            root = self.distribution.host.datasets.root
+            self._path = f"{root.mountpoint}/catalog.json"
+        return self._path
+
+    @property
+    def data(self):
+        """
+        Catalog data read from disk (None when there is no catalog)
+        """
+        if self._data is None:
+            self._data = self._read()
+        return self._data
+
+    @property
+    def updated_at(self):
+        if self.data is None:
+            return None
+        return self.data["updated_at"]
+
+    @property
+    def age(self):
+        """
+        Seconds since the catalog was refreshed
+        """
+        if self.data is None:
+            return None
+        return max(time.time() - self.updated_at, 0)
+
+    @property
+    def stale(self):
+        return (self.data is None) or (self.age > self.max_age)
+
+    @property
+    def releases(self):
+        """
+        Cataloged releases
+
+        The catalog is only fetched synchronously when none exists yet.
+        """
+        if self.data is None:
+            self.refresh()
+
+        distribution = self.distribution
+        return list(map(
+            lambda x: distribution._class_release(
+                name=x["name"],
+                host=distribution.host,
+                zfs=distribution.zfs,
+                logger=self.logger,
+                eol=x["eol"]
+            ),
+            self.data["releases"]
+        ))
+
+    def get(self, release_name):
+        """
+        Catalog entry of a release or None when it is not cataloged
+        """
+        if self.data is None:
+            return None
+        for entry in self.data["releases"]:
+            if entry["name"] == release_name:
+                return entry
+        return None
+
+    def refresh(self):
+        """
+        Fetch the release list, hashes and asset sizes from the mirror
+        """
+        distribution = self.distribution
+        self.logger.verbose(
+            f"Refreshing release catalog from {distribution.mirror_url}"
+        )
+
+        releases = distribution.fetch_releases()
+        with concurrent.futures.ThreadPoolExecutor(
+            max_workers=self.max_workers
+        ) as executor:
+            entries = list(executor.map(self._catalog_release, releases))
+
+        data = dict(
+            version=ReleaseCatalog.CATALOG_VERSION,
+            distribution=distribution.name,
+            mirror_url=distribution.mirror_url,
+            updated_at=time.time(),
+            releases=entries
+        )
+        self._write(data)
+        self._data = data
+        self.logger.verbose(
+            f"Release catalog with {len(entries)} releases saved"
+        )
+        return data
+
+    def refresh_in_background(self):
+        """
+        Refresh the catalog in a thread unless a refresh is running
+
+        The thread is a daemon, so that interactive commands do not wait
+        for the mirror when they exit. Commands that report the result use
+        wait_for_refresh(). The catalog is replaced atomically, an
+        interrupted refresh leaves the previous catalog in place.
+        """
+        with self._lock:
+            thread = self._refresh_thread
+            if (thread is not None) and thread.is_alive():
+                return thread
+            thread = threading.Thread(
+                target=self._refresh_quietly,
+                daemon=True
+            )
+            self._refresh_thread = thread
+            thread.start()
+        return thread
+
+    def refresh_if_stale(self):
+        """
+        Refresh stale catalogs in the background
+
+        Returns the refresh thread or None when the catalog is current.
+        """
+        if (self.data is not None) and (self.stale is False):
+            return None
+        return self.refresh_in_background()
+
+    def wait_for_refresh(self, timeout=None):
+        """
+        Wait for the background refresh to finish
+
+        Args:
+
+            timeout (float): (optional)
+                Seconds to wait for the mirror before giving up
+
+        Returns:
+
+            bool: True when the refresh finished and the catalog was saved
+        """
+        thread = self._refresh_thread
+        if thread is None:
+            return False
+        thread.join(timeout)
+        return (thread.is_alive() is False) and self._refresh_succeeded
+
+    def _refresh_quietly(self):
+        self._refresh_succeeded = False
+        try:
+            self.refresh()
+            self._refresh_succeeded = True
+        except Exception as e:
+            self.logger.warn(f"Release catalog refresh failed: {e}")
+
+    def _catalog_release(self, release):
+        client = self.distribution.http_client
+        remote_url = release.remote_url
+
+        try:
+            hash_file = client.get(
+                f"{remote_url}/{self.distribution.hash_file}"
+            )
+            hashes = libiocage.lib.Release.parse_hash_file(hash_file.text)
+        except (
+            OSError,
+            http.client.HTTPException,
+            libiocage.lib.errors.DownloadFailed
+        ) as e:
+            self.logger.verbose(f"No hashes for {release.name}: {e}")
+            hashes = {}
+
+        assets = {}
+        for asset in release.assets:
+            try:
+                size = client.head(f"{remote_url}/{asset}.txz").size
+            except (
+                OSError,
+                http.client.HTTPException,
+                libiocage.lib.errors.DownloadFailed
+            ):
+                size = None
+            assets[asset] = dict(sha256=hashes.get(asset), size=size)
+
+        return dict(
+            name=release.name,
+            eol=release.eol,
+            assets=assets
+        )
+
+    def _read(self):
+        try:
+            with open(self.path, "r") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        if data.get("version") != ReleaseCatalog.CATALOG_VERSION:
+            return None
+        if data.get("mirror_url") != self.distribution.mirror_url:
+            self.logger.verbose("Release catalog of another mirror ignored")
+            return None
+
+        return data
+
+    def _write(self, data):
+        libiocage.lib.ConfigBatch.write_atomic(
+            self.path,
+            json.dumps(data, indent=2, sort_keys=True)
+        )
+
+
+def format_age(seconds):
+    """
+    Return a short human readable age like 5m or 3d
+    """
+    for unit, size in [("s", 60), ("m", 60), ("h", 24)]:
+        if seconds < size:
+            return f"{int(seconds)}{unit}"
+        seconds /= size
+    return f"{int(seconds)}d"
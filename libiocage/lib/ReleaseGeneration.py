@@ -0,0 +1,265 @@
+# Copyright (c) 2014-2017, iocage
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted providing that the following conditions
+# are met:
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in the
+#    documentation and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE AUTHOR ``AS IS'' AND ANY EXPRESS OR
+# IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED.  IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR ANY
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS
+# OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION)
+# HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT,
+# STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING
+# IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+import datetime
+import hashlib
+import json
+import os
+import stat
+
+import libiocage.lib.errors
+import libiocage.lib.helpers
+
+
+class ReleaseGeneration:
+    """
+    Immutable, content-addressed state of a release
+
+    Every fetch or update of a release creates a snapshot of its root
+    dataset named after the digest of its content. A manifest listing all
+    files of the generation is stored next to the release root, so that
+    the changes a jail made to its clone can be determined without
+    reading unchanged files.
+
+    Args:
+
+        release (libiocage.lib.Release.ReleaseGenerator):
+            The release this generation belongs to
+
+        identifier (string):
+            Digest prefix that names the generation
+
+        manifest (dict): (optional)
+            Manifest data of a generation that was just created
+    """
+
+    SNAPSHOT_PREFIX = "ioc-gen-"
+    IDENTIFIER_LENGTH = 16
+    MANIFEST_VERSION = 1
+
+    def __init__(self, release, identifier, manifest=None, logger=None):
+        libiocage.lib.helpers.init_logger(self, logger)
+        self.release = release
+        self.identifier = identifier
+        self._manifest = manifest
+
+    @property
+    def snapshot_name(self):
+        return f"{self.release.root_dataset_name}@{self.snapshot_suffix}"
+
+    @property
+    def snapshot_suffix(self):
+        return f"{ReleaseGeneration.SNAPSHOT_PREFIX}{self.identifier}"
+
+    @property
+    def manifest_path(self):
+        directory = self.release.generations_directory
+        return f"{directory}/{self.identifier}.json"
+
+    @property
+    def manifest(self):
+        if self._manifest is None:
+            try:
+                with open(self.manifest_path, "r") as f:
+                    self._manifest = json.load(f)
+            except FileNotFoundError:
+                raise libiocage.lib.errors.ReleaseGenerationNotFound(
+                    release_name=self.release.name,
+                    identifier=self.identifier,
+                    logger=self.logger
+                )
+        return self._manifest
+
+    @property
+    def files(self):
+        return self.manifest["files"]
+
+    @property
+    def created(self):
+        return self.manifest["created"]
+
+    @property
+    def parent(self):
+        return self.manifest["parent"]
+
+    @staticmethod
+    def from_directory(release, root_dir, parent=None, logger=None):
+        """
+        Describe the current content of a release root directory
+        """
+        files = read_manifest_files(root_dir)
+        digest = get_manifest_digest(files)
+        identifier = digest[:ReleaseGeneration.IDENTIFIER_LENGTH]
+        manifest = {
+            "version": ReleaseGeneration.MANIFEST_VERSION,
+            "release": release.name,
+            "digest": digest,
+            "created": datetime.datetime.utcnow().isoformat(),
+            "parent": parent,
+            "files": files
+        }
+        return ReleaseGeneration(
+            release=release,
+            identifier=identifier,
+            manifest=manifest,
+            logger=logger
+        )
+
+    def save(self):
+        os.makedirs(self.release.generations_directory, exist_ok=True)
+        temporary_path = f"{self.manifest_path}.tmp"
+        with open(temporary_path, "w") as f:
+            json.dump(self.manifest, f, sort_keys=True)
+        os.rename(temporary_path, self.manifest_path)
+
+    def diff(self, root_dir):
+        """
+        Compare a clone of this generation with the generation
+
+        Files with unchanged type, mode, owner, file flags, size and mtime
+        are considered unchanged. Regular files with the same size but a
+        different mtime are hashed to tell touched files from modified ones.
+
+        Args:
+
+            root_dir (string):
+                Root directory of a clone of this generation
+
+        Returns:
+
+            tuple: Changed or added paths and deleted paths
+        """
+
+        files = self.files
+        changed = []
+        seen = set()
+
+        for path, entry in _scan(root_dir):
+            seen.add(path)
+            known = files.get(path)
+            if (known is not None) and _entries_equal(known, entry):
+                continue
+            if (known is not None) and _same_content(
+                known,
+                entry,
+                f"{root_dir}/{path}"
+            ):
+                continue
+            changed.append(path)
+
+        # sorted paths list directories before their content
+        deleted = sorted(set(files.keys()) - seen)
+        return sorted(changed), deleted
+
+    def __str__(self):
+        return self.identifier
+
+
+def read_manifest_files(root_dir):
+    files = {}
+    for path, entry in _scan(root_dir):
+        if entry["type"] == "f":
+            entry["sha256"] = _hash_file(f"{root_dir}/{path}")
+        files[path] = entry
+    return files
+
+
+def get_manifest_digest(files):
+    """
+    Digest of the content of a manifest, independent of timestamps
+    """
+    sha256 = hashlib.sha256()
+    for path in sorted(files.keys()):
+        entry = files[path]
+        content = entry.get("sha256", entry.get("target", ""))
+        attributes = "\0".join(
+            str(entry[key]) for key in (("type",) + _ATTRIBUTE_KEYS)
+        )
+        sha256.update(f"{path}\0{attributes}\0{content}\n".encode())
+    return sha256.hexdigest()
+
+
+# metadata that is compared for every kind of file
+_ATTRIBUTE_KEYS = ("mode", "uid", "gid", "flags")
+
+
+def _scan(root_dir, relative_path=""):
+    directory = f"{root_dir}/{relative_path}" if relative_path else root_dir
+    for item in os.scandir(directory):
+        path = f"{relative_path}/{item.name}" if relative_path else item.name
+        item_stat = item.stat(follow_symlinks=False)
+        entry = {
+            "mode": stat.S_IMODE(item_stat.st_mode),
+            "uid": item_stat.st_uid,
+            "gid": item_stat.st_gid,
+            # schg/uchg file flags only exist on BSD
+            "flags": getattr(item_stat, "st_flags", 0),
+            "mtime": item_stat.st_mtime_ns
+        }
+        if stat.S_ISLNK(item_stat.st_mode):
+            entry["type"] = "l"
+            entry["target"] = os.readlink(item.path)
+        elif stat.S_ISDIR(item_stat.st_mode):
+            entry["type"] = "d"
+        elif stat.S_ISREG(item_stat.st_mode):
+            entry["type"] = "f"
+            entry["size"] = item_stat.st_size
+        else:
+            # FIFOs, sockets and device nodes are skipped like in TreeSync
+            continue
+        yield path, entry
+        if entry["type"] == "d":
+            yield from _scan(root_dir, path)
+
+
+def _same_attributes(known, entry):
+    return all(
+        known.get(key) == entry[key] for key in (("type",) + _ATTRIBUTE_KEYS)
+    )
+
+
+def _entries_equal(known, entry):
+    if not _same_attributes(known, entry):
+        return False
+    if entry["type"] == "d":
+        return True
+    for key in ("size", "mtime", "target"):
+        if known.get(key) != entry.get(key):
+            return False
+    return True
+
+
+def _same_content(known, entry, path):
+    if (entry["type"] != "f") or not _same_attributes(known, entry):
+        return False
+    if known["size"] != entry["size"]:
+        return False
+    return known["sha256"] == _hash_file(path)
+
+
+def _hash_file(path):
+    sha256 = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(65536), b""):
+            sha256.update(block)
+    return sha256.hexdigest()
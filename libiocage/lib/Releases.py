@@ -21,6 +21,10 @@
 # STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING
 # IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
 # POSSIBILITY OF SUCH DAMAGE.
+import concurrent.futures
+import queue
+
+import libiocage.lib.HTTPDownloader
 import libiocage.lib.Release
 import libiocage.lib.helpers
 
@@ -55,3 +59,87 @@ class Releases:
     @property
     def releases_folder(self):
         return self.dataset.mountpoint
+
+    def fetch(
+        self,
+        releases,
+        update=None,
+        fetch_updates=None,
+        max_workers=None,
+        max_downloads=4,
+        max_rate=None
+    ):
+        """
+        Fetch (and update) multiple releases concurrently
+
+        Every release is prepared in its own thread, so that extracting or
+        updating one release overlaps with the downloads of another. All
+        downloads share one connection pool and are limited together.
+
+        Args:
+
+            releases (list):
+                The releases to fetch
+
+            max_workers (int): (optional)
+                Number of releases prepared at the same time (default: all)
+
+            max_downloads (int): (default=4)
+                Number of assets downloaded at the same time
+
+            max_rate (int): (optional)
+                Bandwidth limit of all downloads in bytes per second
+
+        Yields the events of all releases as they occur. The first error
+        is raised after all releases were processed.
+        """
+
+        releases = list(releases)
+        if len(releases) == 0:
+            return
+
+        downloader = libiocage.lib.HTTPDownloader.HTTPDownloader(
+            max_workers=max_downloads,
+            max_rate=max_rate,
+            logger=self.logger
+        )
+        events = queue.Queue()
+        errors = []
+
+        def fetch_release(release):
+            release.downloader = downloader
+            try:
+                for event in libiocage.lib.Release.ReleaseGenerator.fetch(
+                    release,
+                    update=update,
+                    fetch_updates=fetch_updates
+                ):
+                    events.put(event)
+            except Exception as e:
+                errors.append(e)
+            finally:
+                release.downloader = None
+                events.put(None)
+
+        if max_workers is None:
+            max_workers = len(releases)
+
+        try:
+            with concurrent.futures.ThreadPoolExecutor(
+                max_workers=max_workers
+            ) as executor:
+                for release in releases:
+                    executor.submit(fetch_release, release)
+
+                pending = len(releases)
+                while pending > 0:
+                    event = events.get()
+                    if event is None:
+                        pending -= 1
+                    else:
+                        yield event
+        finally:
+            downloader.close()
+
+        if len(errors) > 0:
+            raise errors[0]
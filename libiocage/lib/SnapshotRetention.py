@@ -0,0 +1,175 @@
+# Copyright (c) 2014-2017, iocage
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted providing that the following conditions
+# are met:
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in the
+#    documentation and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE AUTHOR ``AS IS'' AND ANY EXPRESS OR
+# IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED.  IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR ANY
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS
+# OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION)
+# HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT,
+# STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING
+# IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+"""
+Retention policies for recurring snapshots like release pre-update ones
+"""
+import datetime
+
+import libiocage.lib.ZFSSnapshots
+import libiocage.lib.helpers
+
+
+class RetentionPolicy:
+    """
+    Select which of a series of snapshots are kept
+
+    A snapshot is kept when it is one of the keep_last most recent ones,
+    the most recent one of one of the keep_daily most recent days or the
+    most recent one of one of the keep_weekly most recent ISO weeks.
+
+    Args:
+
+        keep_last (int): (default=3)
+
+        keep_daily (int): (default=7)
+
+        keep_weekly (int): (default=4)
+    """
+
+    def __init__(self, keep_last=3, keep_daily=7, keep_weekly=4):
+        self.keep_last = keep_last
+        self.keep_daily = keep_daily
+        self.keep_weekly = keep_weekly
+
+    def select(self, snapshots):
+        """
+        Names of the snapshots to keep
+
+        Args:
+
+            snapshots (list):
+                Tuples of snapshot name and creation timestamp
+        """
+        snapshots = sorted(snapshots, key=lambda x: x[1], reverse=True)
+        keep = set(map(lambda x: x[0], snapshots[:self.keep_last]))
+
+        buckets = [
+            (self.keep_daily, lambda x: x.date()),
+            (self.keep_weekly, lambda x: x.isocalendar()[:2])
+        ]
+        for count, get_bucket in buckets:
+            seen = set()
+            for name, creation in snapshots:
+                if len(seen) >= count:
+                    break
+                bucket = get_bucket(datetime.datetime.utcfromtimestamp(
+                    creation
+                ))
+                if bucket not in seen:
+                    seen.add(bucket)
+                    keep.add(name)
+
+        return keep
+
+
+class PrunePlan:
+
+    def __init__(self, dataset_name, keep, delete, protected, reclaim=0):
+        self.dataset_name = dataset_name
+        self.keep = keep
+        self.delete = delete
+        self.protected = protected
+        self.reclaim = reclaim
+
+
+class SnapshotPruner:
+    """
+    Plan and destroy recursive snapshots of a dataset by retention policy
+
+    Only snapshots whose name starts with the given prefix are considered.
+    Snapshots that are the origin of a clone (on the dataset or any of
+    its children) are never destroyed.
+
+    Args:
+
+        policy (RetentionPolicy): (optional)
+
+        zfs_snapshots (libiocage.lib.ZFSSnapshots.ZFSSnapshots): (optional)
+    """
+
+    LIST_PROPERTIES = ("name", "clones", "creation")
+
+    def __init__(self, policy=None, zfs_snapshots=None, logger=None):
+        libiocage.lib.helpers.init_logger(self, logger)
+        self.policy = RetentionPolicy() if (policy is None) else policy
+        if zfs_snapshots is None:
+            zfs_snapshots = libiocage.lib.ZFSSnapshots.ZFSSnapshots(
+                logger=self.logger
+            )
+        self.zfs_snapshots = zfs_snapshots
+
+    def plan(self, dataset_name, prefix):
+        """
+        Determine the snapshots to destroy and the space they would free
+        """
+        snapshots = self.zfs_snapshots.list(
+            [dataset_name],
+            properties=SnapshotPruner.LIST_PROPERTIES
+        )
+
+        creation = {}
+        protected = set()
+        for snapshot in snapshots:
+            name = snapshot.snapshot_name
+            if not name.startswith(prefix):
+                continue
+            creation[name] = min(
+                creation.get(name, snapshot["creation"]),
+                snapshot["creation"]
+            )
+            if snapshot["clones"] not in ("", "-"):
+                protected.add(name)
+
+        keep = self.policy.select(creation.items())
+        delete = sorted(
+            creation.keys() - keep - protected,
+            key=lambda name: creation[name]
+        )
+
+        reclaim = self.zfs_snapshots.destroy_snapshots(
+            dataset_name,
+            delete,
+            dry_run=True
+        )
+
+        return PrunePlan(
+            dataset_name=dataset_name,
+            keep=sorted(keep, key=lambda name: creation[name]),
+            delete=delete,
+            protected=sorted(protected, key=lambda name: creation[name]),
+            reclaim=reclaim
+        )
+
+    def prune(self, plan):
+        """
+        Destroy the snapshots of a plan and return the reclaimed bytes
+        """
+        reclaimed = self.zfs_snapshots.destroy_snapshots(
+            plan.dataset_name,
+            plan.delete
+        )
+        self.logger.verbose(
+            f"{len(plan.delete)} snapshots of {plan.dataset_name} destroyed"
+        )
+        return reclaimed
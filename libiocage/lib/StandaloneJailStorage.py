@@ -21,6 +21,10 @@
 # STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING
 # IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
 # POSSIBILITY OF SUCH DAMAGE.
+import os
+import shutil
+
+import libiocage.lib.TreeSync
 
 
 class StandaloneJailStorage:
@@ -44,3 +48,120 @@ class StandaloneJailStorage:
 
         self.logger.verbose("Cloning the release once to the root dataset")
         self.clone_release(release)
+
+    def rebase(self, source_generation, target_generation):
+        """
+        Re-clone the jail root from another release generation
+
+        The changes the jail made to its clone of source_generation are
+        copied onto a fresh clone of target_generation before the root
+        datasets are swapped. Files changed in the jail take precedence
+        over the target generation.
+
+        Args:
+
+            source_generation (libiocage.lib.ReleaseGeneration):
+                The generation the jail root was cloned from
+
+            target_generation (libiocage.lib.ReleaseGeneration):
+                The generation the jail root is rebased to
+        """
+
+        root_name = self.jail_root_dataset_name
+        rebase_name = f"{self.jail.dataset_name}/root-rebase"
+        previous_name = f"{self.jail.dataset_name}/root-previous"
+
+        current_root = self.jail_root_dataset
+        changed, deleted = source_generation.diff(current_root.mountpoint)
+        self.logger.verbose(
+            f"{len(changed)} changed and {len(deleted)} deleted paths are"
+            f" applied to generation {target_generation.identifier}",
+            jail=self.jail
+        )
+
+        self.clone_zfs_snapshot(target_generation.snapshot_name, rebase_name)
+        rebase_root = self.zfs.get_dataset(rebase_name)
+
+        try:
+            StandaloneJailStorage._apply_delta(
+                self,
+                current_root.mountpoint,
+                rebase_root.mountpoint,
+                changed,
+                deleted
+            )
+        except Exception:
+            rebase_root.umount()
+            rebase_root.delete()
+            raise
+
+        rebase_root.umount()
+        current_root.umount()
+        current_root.rename(previous_name)
+        try:
+            rebase_root.rename(root_name)
+        except Exception:
+            current_root.rename(root_name)
+            current_root.mount()
+            raise
+
+        self.jail_root_dataset.mount()
+
+        previous_root = self.zfs.get_dataset(previous_name)
+        if len(list(previous_root.snapshots)) > 0:
+            self.logger.warn(
+                f"The previous root dataset {previous_name} has snapshots"
+                " and was kept",
+                jail=self.jail
+            )
+            return
+
+        self.delete_dataset_recursive(previous_root)
+
+    def _apply_delta(self, source_dir, target_dir, changed, deleted):
+
+        for path in deleted:
+            target = f"{target_dir}/{path}"
+            if os.path.islink(target) or os.path.isfile(target):
+                _remove_file(target)
+            elif os.path.isdir(target):
+                shutil.rmtree(target, onerror=_remove_immutable)
+
+        for path in changed:
+            source = f"{source_dir}/{path}"
+            target = f"{target_dir}/{path}"
+            source_stat = os.lstat(source)
+
+            if os.path.isdir(source) and not os.path.islink(source):
+                if os.path.islink(target) or os.path.isfile(target):
+                    _remove_file(target)
+                os.makedirs(target, exist_ok=True)
+                shutil.copystat(source, target)
+                os.chown(target, source_stat.st_uid, source_stat.st_gid)
+                continue
+
+            if os.path.isdir(target) and not os.path.islink(target):
+                shutil.rmtree(target, onerror=_remove_immutable)
+            elif os.path.lexists(target):
+                _remove_file(target)
+
+            if os.path.islink(source):
+                os.symlink(os.readlink(source), target)
+            else:
+                libiocage.lib.TreeSync.copy_file_data(source, target)
+                shutil.copystat(source, target)
+            os.lchown(target, source_stat.st_uid, source_stat.st_gid)
+
+
+def _remove_file(path):
+    try:
+        os.unlink(path)
+    except PermissionError:
+        # clear schg/uchg file flags of release files
+        os.lchflags(path, 0)
+        os.unlink(path)
+
+
+def _remove_immutable(function, path, excinfo):
+    os.lchflags(path, 0)
+    function(path)
@@ -25,6 +25,7 @@ import grp
 import os
 import pwd
 
+import libiocage.lib.ZFSSnapshots
 import libiocage.lib.helpers
 
 
@@ -59,16 +60,68 @@ class Storage:
 
     @property
     def _pool(self):
-        return self.jail.host.datasets.root.pool
+        return self.jail.iocage_dataset.pool
 
     def clone_release(self, release):
-        self.clone_zfs_dataset(
-            release.root_dataset.name,
+        generation = release.current_generation
+        if generation is None:
+            generation = release.create_generation()
+
+        self.clone_zfs_snapshot(
+            generation.snapshot_name,
             self.jail_root_dataset_name
         )
+        self.jail.config.data["release_generation"] = generation.identifier
+
+        jail_name = self.jail.humanreadable_name
+        self.logger.verbose(
+            f"Cloned release '{release.name}' generation"
+            f" {generation.identifier} to {jail_name}",
+            jail=self.jail
+        )
+
+    @property
+    def _snapshots(self):
+        return libiocage.lib.ZFSSnapshots.ZFSSnapshots(logger=self.logger)
+
+    @property
+    def snapshots(self):
+        """
+        Snapshots of all datasets of the jail
+        """
+        return self._snapshots.list([self.jail.dataset_name])
+
+    def snapshot(self, snapshot_name=None):
+        """
+        Atomically snapshot all datasets of the jail
+
+        Returns the name of the snapshot
+        """
+        if snapshot_name is None:
+            snapshot_name = self._snapshots.default_snapshot_name()
+
+        self._snapshots.create([self.jail.dataset_name], snapshot_name)
+        return snapshot_name
+
+    def rollback(self, snapshot_name):
+        """
+        Roll back all datasets of the jail that have the snapshot
+        """
+        snapshot_names = list(map(
+            lambda snapshot: snapshot.name,
+            filter(
+                lambda snapshot: snapshot.snapshot_name == snapshot_name,
+                self.snapshots
+            )
+        ))
+
         jail_name = self.jail.humanreadable_name
+        for _, error in self._snapshots.rollback({jail_name: snapshot_names}):
+            if error is not None:
+                raise error
+
         self.logger.verbose(
-            f"Cloned release '{release.name}' to {jail_name}",
+            f"Rolled back {len(snapshot_names)} datasets to {snapshot_name}",
             jail=self.jail
         )
 
@@ -99,20 +152,6 @@ class Storage:
 
         snapshot_name = f"{source}@{self.jail.name}"
 
-        # delete target dataset if it already exists
-        try:
-            existing_dataset = self.zfs.get_dataset(target)
-            self.logger.verbose(
-                f"Deleting existing dataset {target}",
-                jail=self.jail
-            )
-            if existing_dataset.mountpoint is not None:
-                existing_dataset.umount()
-            existing_dataset.delete()
-            del existing_dataset
-        except:
-            pass
-
         # delete existing snapshot if existing
         existing_snapshot = None
         try:
@@ -121,6 +160,7 @@ class Storage:
             pass
 
         if existing_snapshot:
+            self._delete_existing_dataset(target)
             self.logger.verbose(
                 f"Deleting existing snapshot {snapshot_name}",
                 jail=self.jail
@@ -129,6 +169,11 @@ class Storage:
 
         # snapshot release
         self.zfs.get_dataset(source).snapshot(snapshot_name)
+        self.clone_zfs_snapshot(snapshot_name, target)
+
+    def clone_zfs_snapshot(self, snapshot_name, target):
+
+        self._delete_existing_dataset(target)
         snapshot = self.zfs.get_snapshot(snapshot_name)
 
         # clone snapshot
@@ -151,10 +196,26 @@ class Storage:
         target_dataset = self.zfs.get_dataset(target)
         target_dataset.mount()
         self.logger.verbose(
-            f"Successfully cloned {source} to {target}",
+            f"Successfully cloned {snapshot_name} to {target}",
             jail=self.jail
         )
 
+    def _delete_existing_dataset(self, target):
+
+        # delete target dataset if it already exists
+        try:
+            existing_dataset = self.zfs.get_dataset(target)
+            self.logger.verbose(
+                f"Deleting existing dataset {target}",
+                jail=self.jail
+            )
+            if existing_dataset.mountpoint is not None:
+                existing_dataset.umount()
+            existing_dataset.delete()
+            del existing_dataset
+        except:
+            pass
+
     def create_jail_dataset(self):
         self._create_dataset(self.jail.dataset_name)
 
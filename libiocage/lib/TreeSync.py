@@ -0,0 +1,430 @@
+# Copyright (c) 2014-2017, iocage
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted providing that the following conditions
+# are met:
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in the
+#    documentation and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE AUTHOR ``AS IS'' AND ANY EXPRESS OR
+# IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED.  IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR ANY
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS
+# OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION)
+# HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT,
+# STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING
+# IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+"""
+One-way directory synchronization that only copies changed entries
+"""
+import concurrent.futures
+import errno
+import filecmp
+import os
+import shutil
+import stat
+
+import libiocage.lib.helpers
+
+TEMPORARY_SUFFIX = ".ioc-sync"
+
+COPY_BACKENDS = ("copy_file_range", "sendfile", "buffered")
+COPY_BLOCK_SIZE = 8 * 1024 * 1024
+
+# errors that indicate a kernel copy is not possible for a pair of files
+_FALLBACK_ERRNOS = (
+    errno.EXDEV,
+    errno.EINVAL,
+    errno.ENOSYS,
+    errno.ENOTSOCK,
+    errno.EOPNOTSUPP,
+    errno.EBADF
+)
+_unsupported_backends = set()
+
+
+class TreeSyncStats:
+
+    def __init__(self):
+        self.copied = 0
+        self.copied_bytes = 0
+        self.linked = 0
+        self.updated = 0
+        self.deleted = 0
+        self.unchanged = 0
+        self.skipped = 0
+
+    def __str__(self):
+        return (
+            f"{self.copied} copied ({self.copied_bytes} bytes), "
+            f"{self.linked} linked, {self.updated} updated, "
+            f"{self.deleted} deleted, {self.unchanged} unchanged, "
+            f"{self.skipped} skipped"
+        )
+
+
+class TreeSync:
+    """
+    rsync-style synchronization of a target directory with a source
+
+    Files are considered unchanged when their size and modification time
+    match (and their content when checksum is enabled). Changed files are
+    copied concurrently on a thread pool with kernel-assisted copies (see
+    copy_file_data) and replaced with an atomic rename. Small files are
+    copied in batches. Hard links within the source are recreated as hard
+    links in the target. Entries that differ only in mode, ownership or
+    file flags are updated in place. Entries missing in the source are
+    removed, even when they have schg/uchg flags set. Special files
+    (devices, fifos and sockets) are skipped.
+
+    Args:
+
+        checksum (bool): (default=False)
+            Compare the content of files with equal size and mtime
+
+        delete (bool): (default=True)
+            Remove target entries that do not exist in the source
+
+        max_workers (int): (default=8)
+            Number of concurrent copy tasks
+
+        backends (tuple): (optional)
+            Copy backends in order of preference (default: COPY_BACKENDS)
+
+        batch_size (int): (default=64)
+            Maximum number of small files copied by one task
+
+        small_file_size (int): (default=64KiB)
+            Files up to this size are copied in batches
+    """
+
+    def __init__(
+        self,
+        checksum=False,
+        delete=True,
+        max_workers=8,
+        backends=COPY_BACKENDS,
+        batch_size=64,
+        small_file_size=64 * 1024,
+        logger=None
+    ):
+
+        libiocage.lib.helpers.init_logger(self, logger)
+        self.checksum = checksum
+        self.delete = delete
+        self.max_workers = max_workers
+        self.backends = backends
+        self.batch_size = batch_size
+        self.small_file_size = small_file_size
+
+    def sync(self, source_dir, target_dir):
+        """
+        Make target_dir equal to source_dir and return TreeSyncStats
+        """
+        if not os.path.isdir(target_dir):
+            os.makedirs(target_dir)
+
+        with concurrent.futures.ThreadPoolExecutor(
+            max_workers=self.max_workers
+        ) as executor:
+            run = _SyncRun(self, executor)
+            try:
+                run.sync_directory(source_dir, target_dir)
+                run.flush()
+            finally:
+                for future in concurrent.futures.as_completed(run.futures):
+                    future.result()
+
+        # hard links are created once the linked files were copied
+        run.create_links()
+
+        # directories change their mtime while their content is synced
+        run.directories.append((source_dir, target_dir))
+        for source, target in reversed(run.directories):
+            source_stat = os.lstat(source)
+            target_stat = os.lstat(target)
+            if (source_stat.st_mtime_ns != target_stat.st_mtime_ns) or \
+                    not _metadata_equals(source_stat, target_stat):
+                _copy_metadata(source, target)
+
+        self.logger.verbose(
+            f"Synced {source_dir} to {target_dir}: {run.stats}"
+        )
+        return run.stats
+
+
+class _SyncRun:
+    """
+    State of a single TreeSync.sync() call
+    """
+
+    def __init__(self, tree_sync, executor):
+        self.tree_sync = tree_sync
+        self.executor = executor
+        self.stats = TreeSyncStats()
+        self.directories = []
+        self.futures = []
+        self.links = []
+        self._inodes = {}
+        self._batch = []
+
+    def sync_directory(self, source_dir, target_dir):
+
+        source_entries = _scandir(source_dir)
+        target_entries = _scandir(target_dir)
+
+        if self.tree_sync.delete is True:
+            for name in target_entries.keys() - source_entries.keys():
+                _remove(target_entries[name].path)
+                self.stats.deleted += 1
+
+        for name, source in source_entries.items():
+            target = target_entries.get(name)
+            target_path = os.path.join(target_dir, name)
+            source_stat = source.stat(follow_symlinks=False)
+            if target is None:
+                target_stat = None
+            else:
+                target_stat = target.stat(follow_symlinks=False)
+
+            if stat.S_ISDIR(source_stat.st_mode):
+                if (target_stat is not None) and \
+                        not stat.S_ISDIR(target_stat.st_mode):
+                    _remove(target_path)
+                    target_stat = None
+                if target_stat is None:
+                    os.mkdir(target_path, stat.S_IMODE(source_stat.st_mode))
+                    self.stats.copied += 1
+                self.directories.append((source.path, target_path))
+                self.sync_directory(source.path, target_path)
+
+            elif stat.S_ISLNK(source_stat.st_mode):
+                self.sync_symlink(source, target_path, target_stat)
+
+            elif stat.S_ISREG(source_stat.st_mode):
+                self.sync_file(source, source_stat, target_path, target_stat)
+
+            else:
+                self.tree_sync.logger.spam(
+                    f"Skipping special file {source.path}"
+                )
+                self.stats.skipped += 1
+
+    def sync_symlink(self, source, target_path, target_stat):
+        link = os.readlink(source.path)
+        if (target_stat is not None) and \
+                stat.S_ISLNK(target_stat.st_mode) and \
+                (os.readlink(target_path) == link):
+            self.stats.unchanged += 1
+            return
+        if target_stat is not None:
+            _remove(target_path)
+        os.symlink(link, target_path)
+        _copy_metadata(source.path, target_path)
+        self.stats.copied += 1
+
+    def sync_file(self, source, source_stat, target_path, target_stat):
+
+        if source_stat.st_nlink > 1:
+            inode = (source_stat.st_dev, source_stat.st_ino)
+            first_target_path = self._inodes.get(inode)
+            if first_target_path is not None:
+                self.links.append((first_target_path, target_path))
+                return
+            self._inodes[inode] = target_path
+
+        if (target_stat is not None) and stat.S_ISREG(target_stat.st_mode):
+            content_unchanged = \
+                (source_stat.st_size == target_stat.st_size) and \
+                (source_stat.st_mtime_ns == target_stat.st_mtime_ns)
+            if (content_unchanged is True) and \
+                    (self.tree_sync.checksum is True):
+                content_unchanged = filecmp.cmp(
+                    source.path,
+                    target_path,
+                    shallow=False
+                )
+
+            if content_unchanged is True:
+                if _metadata_equals(source_stat, target_stat):
+                    self.stats.unchanged += 1
+                else:
+                    _copy_metadata(source.path, target_path)
+                    self.stats.updated += 1
+                return
+
+        self.stats.copied += 1
+        self.stats.copied_bytes += source_stat.st_size
+        task = (source.path, target_path, target_stat)
+
+        if source_stat.st_size > self.tree_sync.small_file_size:
+            self.submit([task])
+            return
+
+        self._batch.append(task)
+        if len(self._batch) >= self.tree_sync.batch_size:
+            self.flush()
+
+    def submit(self, tasks):
+        self.futures.append(self.executor.submit(
+            _copy_files,
+            tasks,
+            self.tree_sync.backends
+        ))
+
+    def flush(self):
+        if len(self._batch) > 0:
+            self.submit(self._batch)
+            self._batch = []
+
+    def create_links(self):
+        for first_target_path, target_path in self.links:
+            if os.path.lexists(target_path):
+                if os.path.samefile(first_target_path, target_path):
+                    self.stats.unchanged += 1
+                    continue
+                _remove(target_path)
+            os.link(first_target_path, target_path)
+            self.stats.linked += 1
+
+
+def copy_file_data(source_path, target_path, backends=COPY_BACKENDS):
+    """
+    Copy the content of a file with the fastest available backend
+
+    copy_file_range copies within the kernel (and lets file systems
+    share or clone blocks), sendfile avoids userspace buffers where it
+    accepts regular files as output, and buffered is a plain read/write
+    loop. Backends the kernel rejects fall back to the next one.
+
+    Returns the name of the backend that copied the file.
+    """
+    with open(source_path, "rb") as source, \
+            open(target_path, "wb") as target:
+
+        size = os.fstat(source.fileno()).st_size
+        for backend in backends:
+            if backend in _unsupported_backends:
+                continue
+            try:
+                if backend == "copy_file_range":
+                    _copy_file_range(source.fileno(), target.fileno(), size)
+                elif backend == "sendfile":
+                    _sendfile(source.fileno(), target.fileno(), size)
+                else:
+                    shutil.copyfileobj(source, target, COPY_BLOCK_SIZE)
+                return backend
+            except (OSError, AttributeError) as e:
+                if isinstance(e, OSError) and \
+                        (e.errno not in _FALLBACK_ERRNOS):
+                    raise
+                if isinstance(e, AttributeError) or \
+                        (e.errno in (errno.ENOSYS, errno.ENOTSOCK)):
+                    _unsupported_backends.add(backend)
+                # a failed kernel copy may have written a prefix
+                source.seek(0)
+                target.seek(0)
+                target.truncate()
+
+    raise OSError(errno.ENOTSUP, f"No copy backend for {source_path}")
+
+
+def _copy_file_range(source_fd, target_fd, size):
+    offset = 0
+    while offset < size:
+        copied = os.copy_file_range(
+            source_fd,
+            target_fd,
+            min(size - offset, COPY_BLOCK_SIZE)
+        )
+        if copied == 0:
+            break
+        offset += copied
+
+
+def _sendfile(source_fd, target_fd, size):
+    offset = 0
+    while offset < size:
+        sent = os.sendfile(
+            target_fd,
+            source_fd,
+            offset,
+            min(size - offset, COPY_BLOCK_SIZE)
+        )
+        if sent == 0:
+            break
+        offset += sent
+
+
+def _scandir(path):
+    with os.scandir(path) as entries:
+        return {entry.name: entry for entry in entries}
+
+
+def _metadata_equals(a, b):
+    return (a.st_mode == b.st_mode) and \
+        (a.st_uid == b.st_uid) and \
+        (a.st_gid == b.st_gid) and \
+        (getattr(a, "st_flags", 0) == getattr(b, "st_flags", 0))
+
+
+def _copy_files(tasks, backends):
+    for source_path, target_path, target_stat in tasks:
+        _copy_file(source_path, target_path, target_stat, backends)
+
+
+def _copy_file(source_path, target_path, target_stat, backends):
+    temporary_path = f"{target_path}{TEMPORARY_SUFFIX}"
+    try:
+        copy_file_data(source_path, temporary_path, backends)
+        if target_stat is not None:
+            if stat.S_ISDIR(target_stat.st_mode):
+                _remove(target_path)
+            else:
+                _clear_flags(target_path)
+        os.rename(temporary_path, target_path)
+    except BaseException:
+        if os.path.lexists(temporary_path):
+            os.unlink(temporary_path)
+        raise
+    _copy_metadata(source_path, target_path)
+
+
+def _copy_metadata(source_path, target_path):
+    source_stat = os.lstat(source_path)
+    target_stat = os.lstat(target_path)
+    _clear_flags(target_path)
+    if (source_stat.st_uid, source_stat.st_gid) != \
+            (target_stat.st_uid, target_stat.st_gid):
+        os.chown(
+            target_path,
+            source_stat.st_uid,
+            source_stat.st_gid,
+            follow_symlinks=False
+        )
+    # copystat sets mode, times and file flags (where supported) last
+    shutil.copystat(source_path, target_path, follow_symlinks=False)
+
+
+def _clear_flags(path):
+    if hasattr(os, "lchflags") and (os.lstat(path).st_flags != 0):
+        os.lchflags(path, 0)
+
+
+def _remove(path):
+    if os.path.isdir(path) and not os.path.islink(path):
+        for root, dirs, files in os.walk(path):
+            for name in dirs + files:
+                _clear_flags(os.path.join(root, name))
+        _clear_flags(path)
+        shutil.rmtree(path)
+    else:
+        _clear_flags(path)
+        os.unlink(path)
@@ -0,0 +1,664 @@
+# Copyright (c) 2014-2017, iocage
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted providing that the following conditions
+# are met:
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in the
+#    documentation and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE AUTHOR ``AS IS'' AND ANY EXPRESS OR
+# IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED.  IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR ANY
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS
+# OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION)
+# HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT,
+# STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING
+# IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+"""
+In-memory stand-in for libzfs
+
+Mirrors the subset of the py-libzfs API used by iocage (pools, datasets,
+snapshots, clones, user properties and mounts), so that storage code can
+be exercised and measured on hosts without ZFS. Dataset contents live in
+directories below a temporary mount root; snapshots and clones copy them.
+
+Example:
+
+    zfs = libiocage.lib.ZFSMemory.ZFS(pools=["zroot"], latency=0.001)
+    datasets = libiocage.lib.Datasets.Datasets(zfs=zfs)
+"""
+import enum
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+
+class Error(enum.IntEnum):
+    SUCCESS = 0
+    NOMEM = 2000
+    BADPROP = 2001
+    PROPREADONLY = 2002
+    EXISTS = 2008
+    BUSY = 2009
+    NOENT = 2011
+    INVALIDNAME = 2013
+
+
+class ZFSException(RuntimeError):
+
+    def __init__(self, code, message):
+        super().__init__(message)
+        self.code = code
+
+
+class DatasetType(enum.IntEnum):
+    FILESYSTEM = 1
+    SNAPSHOT = 2
+
+
+class ZFSProperty(object):
+
+    def __init__(self, value, source="local"):
+        self.value = value
+        self.source = source
+
+    @property
+    def rawvalue(self):
+        return str(self.value)
+
+    def __str__(self):
+        return str(self.value)
+
+
+class ZFSUserProperty(ZFSProperty):
+
+    def __init__(self, value):
+        ZFSProperty.__init__(self, value)
+
+
+class ZFSPropertyDict(dict):
+    """
+    Properties of a dataset or snapshot
+
+    Native properties are computed by the owning object, while user
+    properties (names containing a colon) and settable native properties
+    are stored locally. Inherited values are resolved from ancestors.
+    """
+
+    READONLY = ("name", "type", "used", "available", "referenced",
+                "creation", "origin", "mounted")
+
+    def __init__(self, owner):
+        dict.__init__(self)
+        self.owner = owner
+
+    def __getitem__(self, name):
+        native = self.owner._native_property(name)
+        if native is not None:
+            return native
+
+        if dict.__contains__(self, name):
+            return dict.__getitem__(self, name)
+
+        parent = self.owner._parent
+        while parent is not None:
+            if dict.__contains__(parent.properties, name):
+                inherited = dict.__getitem__(parent.properties, name)
+                return ZFSProperty(
+                    inherited.value,
+                    source=f"inherited from {parent.name}"
+                )
+            parent = parent._parent
+
+        raise KeyError(name)
+
+    def __setitem__(self, name, prop):
+        if name in self.READONLY:
+            raise ZFSException(
+                Error.PROPREADONLY,
+                f"property '{name}' is read-only"
+            )
+        value = prop.value if hasattr(prop, "value") else prop
+        self.owner._zfs._delay("set")
+        dict.__setitem__(self, name, ZFSProperty(value))
+
+    def __contains__(self, name):
+        try:
+            self[name]
+            return True
+        except KeyError:
+            return False
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def keys(self):
+        names = set(dict.keys(self))
+        parent = self.owner._parent
+        while parent is not None:
+            names.update(
+                x for x in dict.keys(parent.properties) if ":" in x
+            )
+            parent = parent._parent
+        names.update(self.owner.NATIVE_PROPERTIES)
+        return sorted(names)
+
+    def get(self, name, default=None):
+        try:
+            return self[name]
+        except KeyError:
+            return default
+
+
+class _ZFSObject(object):
+
+    NATIVE_PROPERTIES = ("name", "type", "used", "referenced", "creation")
+
+    def __init__(self, zfs, name, parent):
+        self._zfs = zfs
+        self._name = name
+        self._parent = parent
+        self.creation = int(time.time())
+        self.properties = ZFSPropertyDict(self)
+
+    @property
+    def name(self):
+        return self._name
+
+    def _native_property(self, name):
+        if name == "name":
+            return ZFSProperty(self.name, source="none")
+        elif name == "creation":
+            return ZFSProperty(self.creation, source="none")
+        elif name in ("used", "referenced"):
+            return ZFSProperty(self._referenced, source="none")
+        return None
+
+    @property
+    def _referenced(self):
+        return _directory_size(self._data_directory, self._excluded_names)
+
+    @property
+    def _excluded_names(self):
+        return []
+
+    def __repr__(self):
+        return f"<{self.__class__.__name__} {self.name}>"
+
+
+class ZFSSnapshot(_ZFSObject):
+
+    def __init__(self, zfs, dataset, snapshot_name):
+        _ZFSObject.__init__(self, zfs, f"{dataset.name}@{snapshot_name}", None)
+        self._dataset = dataset
+        self.snapshot_name = snapshot_name
+        self._data_directory = zfs._allocate_directory("snapshots")
+        _copy_directory(
+            dataset._data_directory,
+            self._data_directory,
+            dataset._excluded_names
+        )
+
+    @property
+    def parent(self):
+        return self._dataset
+
+    @property
+    def pool(self):
+        return self._dataset.pool
+
+    def _native_property(self, name):
+        if name == "type":
+            return ZFSProperty("snapshot", source="none")
+        return _ZFSObject._native_property(self, name)
+
+    def clone(self, name, opts=None):
+        with self._zfs._lock:
+            self._zfs._delay("clone")
+            dataset = self.pool._create_dataset(name, opts or {})
+            dataset._origin = self
+            _copy_directory(self._data_directory, dataset._data_directory)
+            return dataset
+
+    def rollback(self, force=False):
+        with self._zfs._lock:
+            self._zfs._delay("rollback")
+            dataset = self._dataset
+            later = dataset._snapshots[dataset._snapshots.index(self) + 1:]
+            if (len(later) > 0) and (force is False):
+                raise ZFSException(
+                    Error.EXISTS,
+                    f"more recent snapshots exist for {dataset.name}"
+                )
+            for snapshot in later:
+                snapshot.delete()
+            _clear_directory(
+                dataset._data_directory,
+                dataset._excluded_names
+            )
+            _copy_directory(self._data_directory, dataset._data_directory)
+
+    def delete(self, defer=False):
+        with self._zfs._lock:
+            self._zfs._delay("destroy")
+            if any(x._origin is self for x in self._zfs._datasets.values()):
+                raise ZFSException(
+                    Error.BUSY,
+                    f"snapshot {self.name} has dependent clones"
+                )
+            self._dataset._snapshots.remove(self)
+            shutil.rmtree(self._data_directory, ignore_errors=True)
+
+
+class ZFSDataset(_ZFSObject):
+
+    NATIVE_PROPERTIES = _ZFSObject.NATIVE_PROPERTIES + (
+        "available", "mountpoint", "mounted", "origin"
+    )
+
+    def __init__(self, zfs, pool, name, parent):
+        _ZFSObject.__init__(self, zfs, name, parent)
+        self._pool = pool
+        self._snapshots = []
+        self._origin = None
+        self._mounted = False
+
+    @property
+    def pool(self):
+        return self._pool
+
+    @property
+    def children(self):
+        prefix = f"{self.name}/"
+        for name in sorted(self._zfs._datasets.keys()):
+            if name.startswith(prefix) and ("/" not in name[len(prefix):]):
+                yield self._zfs._datasets[name]
+
+    @property
+    def snapshots(self):
+        return iter(list(self._snapshots))
+
+    @property
+    def snapshots_recursive(self):
+        for snapshot in self._snapshots:
+            yield snapshot
+        for child in self.children:
+            yield from child.snapshots_recursive
+
+    @property
+    def mountpoint(self):
+        if self._mounted is False:
+            return None
+        return self._data_directory
+
+    @property
+    def _data_directory(self):
+        return self._zfs._mount_root + self._logical_mountpoint
+
+    @property
+    def _logical_mountpoint(self):
+        if dict.__contains__(self.properties, "mountpoint"):
+            return dict.__getitem__(self.properties, "mountpoint").value
+        if self._parent is None:
+            return f"/{self.name}"
+        basename = self.name.split("/")[-1]
+        return f"{self._parent._logical_mountpoint}/{basename}"
+
+    @property
+    def _excluded_names(self):
+        names = []
+        for child in self.children:
+            directory = os.path.relpath(
+                child._data_directory,
+                self._data_directory
+            )
+            if not directory.startswith(".."):
+                names.append(directory.split("/")[0])
+        return names
+
+    def _native_property(self, name):
+        if name == "type":
+            return ZFSProperty("filesystem", source="none")
+        elif name == "mountpoint":
+            source = "local"
+            if not dict.__contains__(self.properties, "mountpoint"):
+                source = "default"
+            return ZFSProperty(self._logical_mountpoint, source=source)
+        elif name == "mounted":
+            return ZFSProperty("yes" if self._mounted else "no", "none")
+        elif name == "origin":
+            if self._origin is None:
+                return ZFSProperty("", source="none")
+            return ZFSProperty(self._origin.name, source="none")
+        elif name == "used":
+            used = self._referenced + sum(
+                x.properties["used"].value for x in self.children
+            )
+            return ZFSProperty(used, source="none")
+        elif name == "available":
+            return ZFSProperty(self._pool._available, source="none")
+        return _ZFSObject._native_property(self, name)
+
+    def mount(self):
+        self._zfs._delay("mount")
+        os.makedirs(self._data_directory, exist_ok=True)
+        self._mounted = True
+
+    def mount_recursive(self, ignore_errors=False):
+        self.mount()
+        for child in self.children:
+            child.mount_recursive(ignore_errors=ignore_errors)
+
+    def umount(self, force=False):
+        self._zfs._delay("umount")
+        self._mounted = False
+
+    def umount_recursive(self, force=False):
+        for child in self.children:
+            child.umount_recursive(force=force)
+        self.umount(force=force)
+
+    def snapshot(self, name, fsopts=None, recursive=False):
+        dataset_name, snapshot_name = name.split("@", maxsplit=1)
+        with self._zfs._lock:
+            if dataset_name != self.name:
+                raise ZFSException(
+                    Error.INVALIDNAME,
+                    f"snapshot {name} does not belong to {self.name}"
+                )
+            self._snapshot(snapshot_name, fsopts, recursive)
+
+    def _snapshot(self, snapshot_name, fsopts, recursive):
+        self._zfs._delay("snapshot")
+        if any(x.snapshot_name == snapshot_name for x in self._snapshots):
+            raise ZFSException(
+                Error.EXISTS,
+                f"snapshot {self.name}@{snapshot_name} already exists"
+            )
+        snapshot = ZFSSnapshot(self._zfs, self, snapshot_name)
+        for key, value in (fsopts or {}).items():
+            snapshot.properties[key] = value
+        self._snapshots.append(snapshot)
+        if recursive is True:
+            for child in self.children:
+                child._snapshot(snapshot_name, fsopts, recursive)
+
+    def rename(self, new_name):
+        with self._zfs._lock:
+            self._zfs._delay("rename")
+            if new_name in self._zfs._datasets:
+                raise ZFSException(
+                    Error.EXISTS,
+                    f"dataset {new_name} already exists"
+                )
+            old_prefix = self.name
+            old_directory = self._data_directory
+            for name in sorted(self._zfs._datasets.keys()):
+                if (name == old_prefix) or name.startswith(f"{old_prefix}/"):
+                    dataset = self._zfs._datasets.pop(name)
+                    dataset._name = new_name + name[len(old_prefix):]
+                    self._zfs._datasets[dataset.name] = dataset
+            parent_name = new_name.rsplit("/", maxsplit=1)[0]
+            self._parent = self._zfs._datasets[parent_name]
+            new_directory = self._data_directory
+            if os.path.isdir(old_directory):
+                os.makedirs(os.path.dirname(new_directory), exist_ok=True)
+                os.rename(old_directory, new_directory)
+
+    def delete(self):
+        with self._zfs._lock:
+            self._zfs._delay("destroy")
+            if self._parent is None:
+                raise ZFSException(
+                    Error.INVALIDNAME,
+                    f"cannot destroy the root dataset of {self.pool.name}"
+                )
+            if len(list(self.children)) > 0:
+                raise ZFSException(
+                    Error.BUSY,
+                    f"dataset {self.name} has children"
+                )
+            if len(self._snapshots) > 0:
+                raise ZFSException(
+                    Error.BUSY,
+                    f"dataset {self.name} has snapshots"
+                )
+            if self._mounted is True:
+                raise ZFSException(
+                    Error.BUSY,
+                    f"dataset {self.name} is busy"
+                )
+            del self._zfs._datasets[self.name]
+            if os.path.isdir(self._data_directory):
+                shutil.rmtree(self._data_directory, ignore_errors=True)
+
+
+class ZFSPool(object):
+
+    def __init__(self, zfs, name, size):
+        self._zfs = zfs
+        self.name = name
+        self.status = "ONLINE"
+        self.size = size
+        self.root_dataset = ZFSDataset(zfs, self, name, None)
+        zfs._datasets[name] = self.root_dataset
+
+    @property
+    def _available(self):
+        return max(0, self.size - self.root_dataset.properties["used"].value)
+
+    def create(self, name, fsopts, fstype=DatasetType.FILESYSTEM,
+               sparse_vol=False, create_ancestors=False):
+        with self._zfs._lock:
+            self._zfs._delay("create")
+            if create_ancestors is True:
+                self._create_ancestors(name)
+            self._create_dataset(name, fsopts)
+
+    def _create_ancestors(self, name):
+        parts = name.split("/")
+        for i in range(2, len(parts)):
+            ancestor = "/".join(parts[0:i])
+            if ancestor not in self._zfs._datasets:
+                self._create_dataset(ancestor, {})
+
+    def _create_dataset(self, name, fsopts):
+        if name.split("/")[0] != self.name:
+            raise ZFSException(
+                Error.INVALIDNAME,
+                f"dataset {name} is not on pool {self.name}"
+            )
+        if name in self._zfs._datasets:
+            raise ZFSException(
+                Error.EXISTS,
+                f"dataset {name} already exists"
+            )
+        parent_name = name.rsplit("/", maxsplit=1)[0]
+        if parent_name not in self._zfs._datasets:
+            raise ZFSException(
+                Error.NOENT,
+                f"parent of {name} does not exist"
+            )
+        dataset = ZFSDataset(
+            self._zfs,
+            self,
+            name,
+            self._zfs._datasets[parent_name]
+        )
+        self._zfs._datasets[name] = dataset
+        for key, value in fsopts.items():
+            dataset.properties[key] = value
+        return dataset
+
+    def __repr__(self):
+        return f"<ZFSPool {self.name}>"
+
+
+class ZFS(object):
+    """
+    In-memory replacement for libzfs.ZFS
+
+    Args:
+
+        pools (tuple): (default=("zroot",))
+            Names of the pools that are created initially
+
+        mount_root (str): (optional)
+            Directory below which dataset mountpoints are created.
+            A temporary directory is used and removed with close()
+            when no mount_root is given
+
+        latency (float|dict): (default=0)
+            Seconds every operation is delayed, or a dict of delays by
+            operation name (create, clone, snapshot, rollback, destroy,
+            rename, mount, umount, set, get, list)
+
+        pool_size (int): (default=1TiB)
+            Capacity reported for each pool
+    """
+
+    def __init__(
+        self,
+        pools=("zroot",),
+        mount_root=None,
+        latency=0,
+        pool_size=1024 ** 4,
+        history=True,
+        history_prefix=None
+    ):
+
+        self._lock = threading.RLock()
+        self._datasets = {}
+        self._pools = {}
+        self.latency = latency
+
+        if mount_root is None:
+            self._mount_root = tempfile.mkdtemp(prefix="iocage-zfs-")
+            self._temporary_mount_root = True
+        else:
+            self._mount_root = os.path.abspath(mount_root)
+            self._temporary_mount_root = False
+
+        self._data_counter = 0
+        for pool_name in pools:
+            self.create(pool_name, size=pool_size)
+
+    def create(self, name, topology=None, opts=None, fsopts=None,
+               size=1024 ** 4):
+        with self._lock:
+            if name in self._pools:
+                raise ZFSException(Error.EXISTS, f"pool {name} exists")
+            pool = ZFSPool(self, name, size)
+            self._pools[name] = pool
+            pool.root_dataset.mount()
+            return pool
+
+    @property
+    def pools(self):
+        return iter(list(self._pools.values()))
+
+    @property
+    def datasets(self):
+        return iter(list(self._datasets.values()))
+
+    @property
+    def snapshots(self):
+        for dataset in list(self._datasets.values()):
+            yield from dataset.snapshots
+
+    def get(self, name):
+        try:
+            return self._pools[name]
+        except KeyError:
+            raise ZFSException(Error.NOENT, f"pool {name} not found")
+
+    def get_dataset(self, name):
+        self._delay("get")
+        try:
+            return self._datasets[name]
+        except KeyError:
+            raise ZFSException(Error.NOENT, f"dataset {name} not found")
+
+    def get_snapshot(self, name):
+        self._delay("get")
+        dataset_name, snapshot_name = name.split("@", maxsplit=1)
+        dataset = self.get_dataset(dataset_name)
+        for snapshot in dataset._snapshots:
+            if snapshot.snapshot_name == snapshot_name:
+                return snapshot
+        raise ZFSException(Error.NOENT, f"snapshot {name} not found")
+
+    def get_object(self, name):
+        if "@" in name:
+            return self.get_snapshot(name)
+        return self.get_dataset(name)
+
+    def close(self):
+        if self._temporary_mount_root is True:
+            shutil.rmtree(self._mount_root, ignore_errors=True)
+
+    def _delay(self, operation):
+        if isinstance(self.latency, dict):
+            seconds = self.latency.get(operation, 0)
+        else:
+            seconds = self.latency
+        if seconds > 0:
+            time.sleep(seconds)
+
+    def _allocate_directory(self, kind):
+        with self._lock:
+            self._data_counter += 1
+            path = f"{self._mount_root}/.{kind}/{self._data_counter}"
+        os.makedirs(path)
+        return path
+
+
+def _directory_size(path, excluded_names=[]):
+    size = 0
+    if not os.path.isdir(path):
+        return size
+    for entry in os.scandir(path):
+        if entry.name in excluded_names:
+            continue
+        if entry.is_symlink():
+            continue
+        elif entry.is_dir():
+            size += _directory_size(entry.path)
+        else:
+            size += entry.stat().st_size
+    return size
+
+
+def _copy_directory(source, destination, excluded_names=[]):
+    os.makedirs(destination, exist_ok=True)
+    if not os.path.isdir(source):
+        return
+    for entry in os.scandir(source):
+        if entry.name in excluded_names:
+            continue
+        target = f"{destination}/{entry.name}"
+        if entry.is_dir(follow_symlinks=False):
+            shutil.copytree(entry.path, target, symlinks=True)
+        else:
+            shutil.copy2(entry.path, target, follow_symlinks=False)
+
+
+def _clear_directory(path, excluded_names=[]):
+    if not os.path.isdir(path):
+        return
+    for entry in os.scandir(path):
+        if entry.name in excluded_names:
+            continue
+        if entry.is_dir(follow_symlinks=False):
+            shutil.rmtree(entry.path)
+        else:
+            os.unlink(entry.path)
@@ -0,0 +1,219 @@
+# Copyright (c) 2014-2017, iocage
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted providing that the following conditions
+# are met:
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in the
+#    documentation and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE AUTHOR ``AS IS'' AND ANY EXPRESS OR
+# IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED.  IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR ANY
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS
+# OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION)
+# HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT,
+# STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING
+# IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+"""Batch operations on ZFS snapshots of many datasets."""
+import concurrent.futures
+import datetime
+import os
+
+import libiocage.lib.helpers
+
+
+class ZFSSnapshot(dict):
+    """
+    A snapshot row of a `zfs list` property scan
+    """
+
+    @property
+    def name(self):
+        return self["name"]
+
+    @property
+    def dataset_name(self):
+        return self["name"].split("@", maxsplit=1)[0]
+
+    @property
+    def snapshot_name(self):
+        return self["name"].split("@", maxsplit=1)[1]
+
+
+class ZFSSnapshots:
+    """
+    Snapshot, list and roll back many datasets with few zfs invocations
+
+    Creating snapshots of multiple datasets with a single `zfs snapshot`
+    command is atomic: all snapshots are taken in the same transaction
+    group, so they represent one consistent point in time.
+    """
+
+    LIST_PROPERTIES = ("name", "creation", "used", "referenced")
+    INTEGER_PROPERTIES = ("creation", "used", "referenced")
+
+    def __init__(self, zfs_command="/sbin/zfs", logger=None):
+        libiocage.lib.helpers.init_logger(self, logger)
+        self.zfs_command = zfs_command
+
+    def default_snapshot_name(self, prefix="ioc"):
+        now = datetime.datetime.utcnow()
+        return f"{prefix}-{now.strftime('%Y%m%d%H%M%S')}"
+
+    def create(self, dataset_names, snapshot_name, recursive=True):
+        """
+        Atomically snapshot a list of datasets
+        """
+        dataset_names = list(dataset_names)
+        if len(dataset_names) == 0:
+            return
+
+        command = [self.zfs_command, "snapshot"]
+        if recursive is True:
+            command.append("-r")
+        command += list(map(
+            lambda dataset_name: f"{dataset_name}@{snapshot_name}",
+            dataset_names
+        ))
+
+        libiocage.lib.helpers.exec(command, logger=self.logger)
+        self.logger.verbose(
+            f"Snapshot {snapshot_name} of {len(dataset_names)} datasets"
+            " created"
+        )
+
+    def list(self, dataset_names, depth=None, properties=LIST_PROPERTIES):
+        """
+        List the snapshots below the given datasets with one property scan
+        """
+        dataset_names = list(dataset_names)
+        if len(dataset_names) == 0:
+            return []
+
+        command = [
+            self.zfs_command,
+            "list",
+            "-H",
+            "-p",
+            "-t", "snapshot",
+            "-o", ",".join(properties)
+        ]
+
+        if depth is None:
+            command.append("-r")
+        else:
+            command += ["-d", str(depth)]
+
+        _, stdout, _ = libiocage.lib.helpers.exec(
+            command + dataset_names,
+            logger=self.logger
+        )
+
+        snapshots = []
+        for line in stdout.split("\n"):
+            values = line.split("\t")
+            if len(values) != len(properties):
+                continue
+            snapshot = ZFSSnapshot(zip(properties, values))
+            for key in ZFSSnapshots.INTEGER_PROPERTIES:
+                if key in snapshot:
+                    snapshot[key] = int(snapshot[key])
+            snapshots.append(snapshot)
+
+        return snapshots
+
+    def exists(self, dataset_name, snapshot_name):
+        snapshots = self.list([dataset_name], depth=1)
+        full_name = f"{dataset_name}@{snapshot_name}"
+        return full_name in map(lambda snapshot: snapshot.name, snapshots)
+
+    def rollback(self, groups, max_workers=None):
+        """
+        Roll back groups of snapshots in parallel
+
+        The snapshots of a group (e.g. all datasets of a jail) are rolled
+        back one after another, while groups are processed concurrently.
+        More recent snapshots are destroyed.
+
+        Args:
+
+            groups (dict):
+                Lists of full snapshot names by group key
+
+            max_workers (int): (optional)
+                Number of concurrent zfs processes (default: CPU count)
+
+        Yields a tuple of the group key and None or the raised exception
+        for every group as soon as it is finished.
+        """
+        return self._execute_groups(
+            groups,
+            lambda name: [self.zfs_command, "rollback", "-r", name],
+            max_workers=max_workers
+        )
+
+    def destroy(self, groups, max_workers=None):
+        """
+        Destroy groups of snapshots in parallel (see rollback)
+        """
+        return self._execute_groups(
+            groups,
+            lambda name: [self.zfs_command, "destroy", name],
+            max_workers=max_workers
+        )
+
+    def destroy_snapshots(self, dataset_name, snapshot_names, recursive=True,
+                          dry_run=False):
+        """
+        Destroy snapshots of a dataset with a single zfs command
+
+        Returns the number of bytes that were (or with dry_run would be)
+        reclaimed.
+        """
+        snapshot_names = list(snapshot_names)
+        if len(snapshot_names) == 0:
+            return 0
+
+        command = [self.zfs_command, "destroy", "-v", "-p"]
+        if dry_run is True:
+            command.append("-n")
+        if recursive is True:
+            command.append("-r")
+        command.append(f"{dataset_name}@{','.join(snapshot_names)}")
+
+        _, stdout, _ = libiocage.lib.helpers.exec(command, logger=self.logger)
+
+        reclaimed = 0
+        for line in stdout.split("\n"):
+            values = line.split("\t")
+            if (len(values) == 2) and (values[0] == "reclaim"):
+                reclaimed = int(values[1])
+        return reclaimed
+
+    def _execute_groups(self, groups, get_command, max_workers=None):
+
+        if max_workers is None:
+            max_workers = os.cpu_count() or 1
+
+        def execute_group(snapshot_names):
+            for snapshot_name in snapshot_names:
+                libiocage.lib.helpers.exec(
+                    get_command(snapshot_name),
+                    logger=self.logger
+                )
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers) as executor:
+            futures = {}
+            for key, snapshot_names in groups.items():
+                future = executor.submit(execute_group, snapshot_names)
+                futures[future] = key
+
+            for future in concurrent.futures.as_completed(futures):
+                yield (futures[future], future.exception())
@@ -88,6 +88,24 @@ class JailUnknownIdentifier(IocageException):
         msg = "The jail has no identifier yet"
         IocageException.__init__(self, msg, *args, **kwargs)
 
+# Jail Streams
+
+
+class InvalidJailStream(IocageException):
+
+    def __init__(self, reason=None, *args, **kwargs):
+        msg = "Invalid jail stream"
+        if reason is not None:
+            msg += f": {reason}"
+        super().__init__(msg, *args, **kwargs)
+
+
+class InvalidJailStreamCompression(InvalidJailStream):
+
+    def __init__(self, compression, *args, **kwargs):
+        reason = f"unknown compression method '{compression}'"
+        super().__init__(reason=reason, *args, **kwargs)
+
 # JailConfig
 
 
@@ -136,6 +154,23 @@ class InvalidJailConfigAddress(InvalidJailConfigValue):
         )
 
 
+class JailConfigMigrationFailed(JailConfigError):
+
+    def __init__(self, jail, reason, *args, **kwargs):
+        msg = (
+            f"Config of jail '{jail.humanreadable_name}' could not be "
+            f"migrated: {reason}"
+        )
+        super().__init__(msg, *args, **kwargs)
+
+
+class JailQueryIndexUnavailable(IocageException):
+
+    def __init__(self, *args, **kwargs):
+        msg = "The jail index requires the Python sqlite3 module"
+        super().__init__(msg, *args, **kwargs)
+
+
 class JailConfigNotFound(IocageException):
 
     def __init__(self, config_type, *args, **kwargs):
@@ -193,6 +228,13 @@ class DistributionUnknown(IocageException):
 # Storage
 
 
+class ZFSBackendUnavailable(IocageException):
+
+    def __init__(self, *args, **kwargs):
+        msg = "libzfs is not available on this host"
+        IocageException.__init__(self, msg, *args, **kwargs)
+
+
 class UnmountFailed(IocageException):
 
     def __init__(self, mountpoint, *args, **kwargs):
@@ -249,6 +291,20 @@ class ZFSPoolUnavailable(IocageException):
         super().__init__(msg, *args, **kwargs)
 
 
+class ZFSPoolNotActivated(IocageException):
+
+    def __init__(self, pool_name, *args, **kwargs):
+        msg = f"ZFS pool '{pool_name}' is not activated for iocage"
+        super().__init__(msg, *args, **kwargs)
+
+
+class InvalidPlacementPolicy(IocageException, ValueError):
+
+    def __init__(self, policy, *args, **kwargs):
+        msg = f"Invalid jail placement policy '{policy}'"
+        super().__init__(msg, *args, **kwargs)
+
+
 # Network
 
 
@@ -304,6 +360,13 @@ class IllegalReleaseAssetContent(ReleaseUpdateFailure):
         super().__init__(release_name, reason=msg, *args, **kwargs)
 
 
+class IllegalArchiveMember(IocageException):
+
+    def __init__(self, name, reason, *args, **kwargs):
+        msg = f"Refusing to extract {name} - {reason}"
+        super().__init__(msg, *args, **kwargs)
+
+
 class ReleaseNotFetched(IocageException):
 
     def __init__(self, name, *args, **kwargs):
@@ -320,6 +383,29 @@ class ReleaseUpdateBranchLookup(IocageException):
         super.__init__(msg, *args, **kwargs)
 
 
+class DownloadFailed(IocageException):
+
+    def __init__(self, url, reason=None, *args, **kwargs):
+        msg = f"Download of {url} failed"
+        if reason is not None:
+            msg += f": {reason}"
+        super().__init__(msg, *args, **kwargs)
+
+
+class ReleaseGenerationNotFound(IocageException):
+
+    def __init__(self, release_name, identifier, *args, **kwargs):
+        msg = f"Release '{release_name}' has no generation '{identifier}'"
+        super().__init__(msg, *args, **kwargs)
+
+
+class JailRebaseFailure(IocageException):
+
+    def __init__(self, jail, reason, *args, **kwargs):
+        msg = f"Jail '{jail.humanreadable_name}' cannot be rebased: {reason}"
+        super().__init__(msg, *args, **kwargs)
+
+
 # Prompts
 
 
@@ -47,11 +47,9 @@ class IocageEvent:
         Initializes an IocageEvent
         """
 
-        for event in IocageEvent.HISTORY:
-            if event.__hash__() == self.__hash__():
-                return event
-
-        self.identifier = None
+        # subclasses assign their identifier before calling this method
+        if "identifier" not in self.__dict__:
+            self.identifier = None
         self._started_at = None
         self._stopped_at = None
         self._pending = False
@@ -224,6 +222,52 @@ class JailMountTeardown(JailEvent):
     def __init__(self, jail, **kwargs):
         JailEvent.__init__(self, jail, **kwargs)
 
+
+class JailExport(JailEvent):
+
+    def __init__(self, jail, **kwargs):
+        JailEvent.__init__(self, jail, **kwargs)
+
+
+class JailImport(JailEvent):
+
+    def __init__(self, jail, **kwargs):
+        JailEvent.__init__(self, jail, **kwargs)
+
+
+class JailRebase(JailEvent):
+
+    def __init__(self, jail, **kwargs):
+        JailEvent.__init__(self, jail, **kwargs)
+
+
+class JailConfigUpdate(JailEvent):
+
+    def __init__(self, jail, **kwargs):
+        JailEvent.__init__(self, jail, **kwargs)
+
+
+class JailConfigMigration(JailEvent):
+
+    def __init__(self, jail, **kwargs):
+        JailEvent.__init__(self, jail, **kwargs)
+
+
+# ZFS Snapshots
+
+
+class SnapshotEvent(IocageEvent):
+
+    def __init__(self, name, **kwargs):
+        self.identifier = name
+        IocageEvent.__init__(self, **kwargs)
+
+
+class SnapshotRollback(SnapshotEvent):
+
+    def __init__(self, name, **kwargs):
+        SnapshotEvent.__init__(self, name, **kwargs)
+
 # Release
 
 
@@ -262,6 +306,13 @@ class ReleaseExtraction(FetchRelease):
         FetchRelease.__init__(self, release, **kwargs)
 
 
+class ReleaseAssetDownload(ReleaseDownload):
+
+    def __init__(self, release, asset_name, **kwargs):
+        ReleaseDownload.__init__(self, release, asset=asset_name, **kwargs)
+        self.identifier = f"{self.identifier}/{asset_name}"
+
+
 class ReleaseCopyBase(FetchRelease):
 
     def __init__(self, release, **kwargs):
@@ -274,6 +325,24 @@ class ReleaseConfiguration(FetchRelease):
         FetchRelease.__init__(self, release, **kwargs)
 
 
+class ReleaseReplication(ReleaseEvent):
+
+    def __init__(self, release, **kwargs):
+        ReleaseEvent.__init__(self, release, **kwargs)
+
+
+class ReleaseGenerationCreate(ReleaseEvent):
+
+    def __init__(self, release, **kwargs):
+        ReleaseEvent.__init__(self, release, **kwargs)
+
+
+class ReleaseSnapshotPrune(ReleaseEvent):
+
+    def __init__(self, release, **kwargs):
+        ReleaseEvent.__init__(self, release, **kwargs)
+
+
 class ReleaseUpdate(ReleaseEvent):
 
     def __init__(self, release, **kwargs):
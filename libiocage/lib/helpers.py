@@ -25,24 +25,47 @@ import re
 import subprocess
 import uuid
 
-import libzfs
-
 import libiocage.lib.Datasets
 import libiocage.lib.Host
 import libiocage.lib.Logger
+import libiocage.lib.ZFSMemory
+
+try:
+    import libzfs
+    _zfs_backends = (libzfs, libiocage.lib.ZFSMemory)
+except ImportError:
+    libzfs = None
+    _zfs_backends = (libiocage.lib.ZFSMemory,)
+
+ZFSException = tuple(x.ZFSException for x in _zfs_backends)
 
 
 def init_zfs(self, zfs):
-    if isinstance(zfs, libzfs.ZFS):
+    if isinstance(zfs, tuple(x.ZFS for x in _zfs_backends)):
         self.zfs = zfs
     else:
         self.zfs = get_zfs()
 
 
 def get_zfs():
+    if libzfs is None:
+        raise libiocage.lib.errors.ZFSBackendUnavailable()
     return libzfs.ZFS(history=True, history_prefix="<iocage>")
 
 
+def is_zfs_dataset(value):
+    return isinstance(value, tuple(x.ZFSDataset for x in _zfs_backends))
+
+
+def is_zfs_pool(value):
+    return isinstance(value, tuple(x.ZFSPool for x in _zfs_backends))
+
+
+def zfs_user_property(value):
+    backend = _zfs_backends[0]
+    return backend.ZFSUserProperty(value)
+
+
 def init_host(self, host=None):
     if host:
         self.host = host
@@ -0,0 +1,122 @@
+# Copyright (c) 2014-2017, iocage
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted providing that the following conditions
+# are met:
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in the
+#    documentation and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE AUTHOR ``AS IS'' AND ANY EXPRESS OR
+# IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED.  IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR ANY
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS
+# OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION)
+# HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT,
+# STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING
+# IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+"""
+Copy throughput benchmark against a synthetic base system tree
+
+Builds a tree shaped like a FreeBSD base system (many small files, a
+few large binaries, hard links and symlinks) and measures an initial
+copy with each TreeSync copy backend, a shutil.copytree baseline and a
+re-sync of the unchanged tree.
+"""
+import os
+import shutil
+import tempfile
+
+import benchmark
+
+import libiocage.lib.Logger
+import libiocage.lib.TreeSync
+
+
+def create_base_tree(root, files, large_files, large_file_size):
+    data = os.urandom(large_file_size)
+    for i in range(files):
+        directory = f"{root}/usr/share/dir{i % 100}"
+        os.makedirs(directory, exist_ok=True)
+        with open(f"{directory}/file{i}", "wb") as f:
+            f.write(data[:512 + (i * 97) % 16384])
+    os.makedirs(f"{root}/bin", exist_ok=True)
+    for i in range(large_files):
+        with open(f"{root}/bin/binary{i}", "wb") as f:
+            f.write(data)
+        os.link(f"{root}/bin/binary{i}", f"{root}/bin/link{i}")
+        os.symlink(f"binary{i}", f"{root}/bin/symlink{i}")
+
+
+def run(count, files, large_files, large_file_size):
+    logger = libiocage.lib.Logger.Logger(print_level=False)
+    work_dir = tempfile.mkdtemp(prefix="ioc-bench-copy-")
+    source = f"{work_dir}/source"
+    create_base_tree(source, files, large_files, large_file_size)
+    tree_size = (large_files * large_file_size) >> 20
+
+    result = benchmark.Benchmark(
+        f"copy of {files} small and {large_files} large files "
+        f"(~{tree_size} MiB)"
+    )
+
+    def target(name, i):
+        path = f"{work_dir}/{name}{i}"
+        if os.path.exists(path):
+            shutil.rmtree(path)
+        return path
+
+    result.measure(
+        "copytree",
+        lambda i: shutil.copytree(source, target("copytree", i),
+                                  symlinks=True),
+        count
+    )
+
+    for backend in libiocage.lib.TreeSync.COPY_BACKENDS:
+        tree_sync = libiocage.lib.TreeSync.TreeSync(
+            backends=(backend, "buffered"),
+            logger=logger
+        )
+        result.measure(
+            backend,
+            lambda i: tree_sync.sync(source, target(backend, i)),
+            count
+        )
+
+    tree_sync = libiocage.lib.TreeSync.TreeSync(logger=logger)
+    resync_target = f"{work_dir}/resync"
+    tree_sync.sync(source, resync_target)
+    result.measure(
+        "resync",
+        lambda i: tree_sync.sync(source, resync_target),
+        count
+    )
+
+    shutil.rmtree(work_dir)
+    return result
+
+
+if __name__ == "__main__":
+    parser = benchmark.get_argument_parser(__doc__.strip().split("\n")[0])
+    parser.add_argument(
+        "--files", type=int, default=5000,
+        help="Number of small files in the tree"
+    )
+    parser.add_argument(
+        "--large-files", type=int, default=8,
+        help="Number of large files in the tree"
+    )
+    parser.add_argument(
+        "--large-file-size", type=int, default=16 * 1024 * 1024,
+        help="Size of each large file in bytes"
+    )
+    args = parser.parse_args()
+    run(args.count, args.files, args.large_files, args.large_file_size) \
+        .report()
@@ -0,0 +1,92 @@
+# Copyright (c) 2014-2017, iocage
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted providing that the following conditions
+# are met:
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in the
+#    documentation and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE AUTHOR ``AS IS'' AND ANY EXPRESS OR
+# IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED.  IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR ANY
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS
+# OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION)
+# HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT,
+# STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING
+# IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+"""
+fstab model benchmark
+
+Parses a jail fstab with many nullfs mounts and measures lookups, adds
+and iteration including the cached basejail lines.
+"""
+import benchmark
+
+import libiocage.lib.JailConfig
+import libiocage.lib.JailConfigFstab
+import libiocage.lib.Logger
+
+
+class FakeJail(object):
+
+    def __init__(self, config):
+        self.path = "/iocage/jails/bench"
+        self.config = config
+        self.host = type("Host", (), {})()
+        self.host.distribution = type("Distribution", (), {})()
+        self.host.distribution.name = "FreeBSD"
+        self.release = type("Release", (), {})()
+        self.release.releases_folder = "/iocage/releases"
+
+
+def create_fstab(mounts):
+    config = libiocage.lib.JailConfig.JailConfig(data={
+        "id": "bench",
+        "basejail": "yes",
+        "cloned_release": "11.1-RELEASE"
+    })
+    fstab = libiocage.lib.JailConfigFstab.JailConfigFstab(
+        jail=FakeJail(config),
+        logger=libiocage.lib.Logger.Logger()
+    )
+    config.fstab = fstab
+    content = "".join(
+        f"/data/{i}\t/iocage/jails/bench/root/mnt/{i}\tnullfs\tro\t0\t0\n"
+        for i in range(mounts)
+    )
+    return fstab, content
+
+
+def run(count, mounts):
+    fstab, content = create_fstab(mounts)
+    result = benchmark.Benchmark(f"fstab with {mounts} nullfs mounts")
+
+    result.measure("parse", lambda i: fstab.parse_lines(content), count)
+
+    destination = f"/iocage/jails/bench/root/mnt/{mounts - 1}"
+    result.measure("lookup", lambda i: destination in fstab, count)
+    result.measure(
+        "add",
+        lambda i: fstab.add("/data/new", destination, options="rw"),
+        count
+    )
+    result.measure("iterate", lambda i: sum(1 for line in fstab), count)
+    result.measure("render", lambda i: str(fstab), count)
+    return result
+
+
+if __name__ == "__main__":
+    parser = benchmark.get_argument_parser(__doc__.strip().split("\n")[0])
+    parser.add_argument(
+        "--mounts", type=int, default=500,
+        help="Number of nullfs mounts in the fstab"
+    )
+    args = parser.parse_args()
+    run(args.count, args.mounts).report()
@@ -0,0 +1,113 @@
+# Copyright (c) 2014-2017, iocage
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted providing that the following conditions
+# are met:
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in the
+#    documentation and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE AUTHOR ``AS IS'' AND ANY EXPRESS OR
+# IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED.  IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR ANY
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS
+# OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION)
+# HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT,
+# STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING
+# IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+"""
+Jail config property lookup benchmark
+
+Measures reading the properties a jail start touches (user data, mapped
+getters, defaults and passthrough attributes) through the compiled
+property schema and through the former attribute probing lookup.
+"""
+import benchmark
+
+import libiocage.lib.JailConfig
+import libiocage.lib.Logger
+
+PROPERTIES = [
+    "id", "basejail", "basejail_type", "vnet", "ip4_addr", "ip6_addr",
+    "interfaces", "defaultrouter", "resolver", "release", "tags",
+    "login_flags", "host_hostuuid", "jail_zfs", "exec_prestart",
+    "exec_start", "exec_poststart", "exec_prestop", "exec_stop",
+    "exec_poststop", "exec_timeout", "exec_clean", "exec_fib",
+    "stop_timeout", "securelevel", "devfs_ruleset", "enforce_statfs",
+    "children_max", "allow_set_hostname", "allow_sysvipc",
+    "allow_raw_sockets", "allow_chflags", "allow_mount", "allow_quotas",
+    "allow_socket_af", "mount_devfs", "mount_fdescfs", "sysvmsg",
+    "mac_prefix", "all_properties"
+]
+
+
+def legacy_getitem(config, key):
+    """
+    Property lookup as implemented before the schema was compiled
+    """
+    try:
+        return config.__getattribute__(key)
+    except Exception:
+        pass
+    try:
+        return config.__getattribute__(f"_get_{key}")()
+    except Exception:
+        pass
+    try:
+        return config.data[key]
+    except Exception:
+        pass
+    return config.defaults[key]
+
+
+def run(count, iterations):
+    logger = libiocage.lib.Logger.Logger(print_level=False)
+    config = libiocage.lib.JailConfig.JailConfig(
+        data={
+            "id": "benchmark",
+            "basejail": "yes",
+            "release": "11.1-RELEASE",
+            "ip4_addr": "vnet0|10.0.0.2/24",
+            "interfaces": "vnet0:bridge0",
+            "vnet": "yes",
+            "tags": "bench,mark",
+            "securelevel": "3"
+        },
+        logger=logger
+    )
+
+    for key in PROPERTIES:
+        assert repr(config[key]) == repr(legacy_getitem(config, key)), key
+
+    lookups = len(PROPERTIES) * iterations
+    result = benchmark.Benchmark(f"{lookups} jail config property lookups")
+
+    def lookup_schema(i):
+        for _ in range(iterations):
+            for key in PROPERTIES:
+                config[key]
+
+    def lookup_legacy(i):
+        for _ in range(iterations):
+            for key in PROPERTIES:
+                legacy_getitem(config, key)
+
+    result.measure("attribute probing", lookup_legacy, count)
+    result.measure("compiled schema", lookup_schema, count)
+    return result
+
+
+if __name__ == "__main__":
+    parser = benchmark.get_argument_parser(__doc__.strip().split("\n")[0])
+    parser.add_argument(
+        "--iterations", type=int, default=1000,
+        help="Number of lookups of each property per run"
+    )
+    args = parser.parse_args()
+    run(args.count, args.iterations).report()
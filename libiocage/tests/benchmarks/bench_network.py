@@ -0,0 +1,84 @@
+# Copyright (c) 2014-2017, iocage
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted providing that the following conditions
+# are met:
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in the
+#    documentation and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE AUTHOR ``AS IS'' AND ANY EXPRESS OR
+# IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED.  IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR ANY
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS
+# OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION)
+# HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT,
+# STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING
+# IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+"""
+Network config listing benchmark
+
+Loads the configs of many jails and reads their address columns as a
+jail listing does. Every measurement includes loading the configs: once
+the serialized strings are read, once the parsed objects are stringified
+twice.
+"""
+import benchmark
+
+import libiocage.lib.JailConfig
+import libiocage.lib.Logger
+
+COLUMNS = ["ip4_addr", "ip6_addr", "interfaces"]
+
+
+def create_data(jails):
+    return [{
+        "id": f"jail{i}",
+        "ip4_addr": f"vnet0|10.{i % 256}.0.2/24 vnet1|10.{i % 256}.1.2/24",
+        "ip6_addr": f"vnet0|fd00:{i:x}::2/64",
+        "interfaces": "vnet0:bridge0 vnet1:bridge1"
+    } for i in range(jails)]
+
+
+def run(count, jails):
+    logger = libiocage.lib.Logger.Logger(print_level=False)
+    data = create_data(jails)
+    result = benchmark.Benchmark(f"address columns of {jails} jails")
+
+    def load():
+        return [
+            libiocage.lib.JailConfig.JailConfig(data=x, logger=logger)
+            for x in data
+        ]
+
+    def list_strings(i):
+        for config in load():
+            for column in COLUMNS:
+                config.get_string(column)
+
+    def list_parsed(i):
+        for config in load():
+            for column in COLUMNS:
+                str(config[column])
+                str(config[column])
+
+    result.measure("load only", lambda i: load(), count)
+    result.measure("get_string", list_strings, count)
+    result.measure("parse + str", list_parsed, count)
+    return result
+
+
+if __name__ == "__main__":
+    parser = benchmark.get_argument_parser(__doc__.strip().split("\n")[0])
+    parser.add_argument(
+        "--jails", type=int, default=1000,
+        help="Number of jail configs"
+    )
+    args = parser.parse_args()
+    run(args.count, args.jails).report()
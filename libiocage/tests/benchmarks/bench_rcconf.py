@@ -0,0 +1,89 @@
+# Copyright (c) 2014-2017, iocage
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted providing that the following conditions
+# are met:
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in the
+#    documentation and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE AUTHOR ``AS IS'' AND ANY EXPRESS OR
+# IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED.  IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR ANY
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS
+# OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION)
+# HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT,
+# STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING
+# IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+"""
+rc.conf parser benchmark
+
+Parses a generated rc.conf with the native RCConf parser and, when the
+ucl module is installed, with ucl.load as used before. Editing a single
+key and rendering the file is measured as well.
+"""
+import benchmark
+
+import libiocage.lib.RCConf
+
+try:
+    import ucl
+except ImportError:
+    ucl = None
+
+
+def create_rc_conf(keys):
+    lines = ["# generated rc.conf", ""]
+    for i in range(keys):
+        if i % 10 == 0:
+            lines.append(f"# section {i // 10}")
+        if i % 3 == 0:
+            lines.append(f"service{i}_enable=\"YES\"")
+        elif i % 3 == 1:
+            lines.append(f"service{i}_flags=\"-a -b {i} -c /var/run/{i}\"")
+        else:
+            lines.append(f"ifconfig_epair{i}b=\"inet 10.{i % 256}.0.2/24\"")
+    return "\n".join(lines) + "\n"
+
+
+def run(count, keys):
+    content = create_rc_conf(keys)
+    result = benchmark.Benchmark(f"rc.conf with {keys} assignments")
+
+    result.measure(
+        "native parse",
+        lambda i: libiocage.lib.RCConf.parse(content),
+        count
+    )
+
+    if ucl is not None:
+        result.measure("ucl.load", lambda i: ucl.load(content), count)
+
+    lines = libiocage.lib.RCConf.parse(content)
+    index = dict((line.key, n) for n, line in enumerate(lines) if line.key)
+    key = "service0_enable"
+
+    def edit(i):
+        line = lines[index[key]]
+        line.value = "NO" if (i % 2 == 0) else "YES"
+        line.text = None
+        "".join(line.render() for line in lines)
+
+    result.measure("edit + render", edit, count)
+    return result
+
+
+if __name__ == "__main__":
+    parser = benchmark.get_argument_parser(__doc__.strip().split("\n")[0])
+    parser.add_argument(
+        "--keys", type=int, default=200,
+        help="Number of assignments in the rc.conf"
+    )
+    args = parser.parse_args()
+    run(args.count, args.keys).report()
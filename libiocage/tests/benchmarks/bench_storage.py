@@ -0,0 +1,101 @@
+# Copyright (c) 2014-2017, iocage
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted providing that the following conditions
+# are met:
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in the
+#    documentation and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE AUTHOR ``AS IS'' AND ANY EXPRESS OR
+# IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED.  IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR ANY
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS
+# OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION)
+# HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT,
+# STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING
+# IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+"""
+Storage benchmark against the in-memory libzfs backend
+
+Measures the dataset operations iocage performs for jail life cycles
+(create, clone from a release snapshot, list with property lookups and
+recursive destroy) with a configurable per-operation latency, so that
+changes to the storage layer can be compared without a ZFS host.
+"""
+import benchmark
+
+import libiocage.lib.Datasets
+import libiocage.lib.Logger
+import libiocage.lib.ZFSMemory
+
+
+def run(count, latency):
+    zfs = libiocage.lib.ZFSMemory.ZFS(pools=["bench"], latency=latency)
+    logger = libiocage.lib.Logger.Logger(print_level=False)
+    datasets = libiocage.lib.Datasets.Datasets(
+        pool=zfs.get("bench"),
+        zfs=zfs,
+        logger=logger
+    )
+    datasets.activate()
+
+    pool = datasets.root.pool
+    jails_name = datasets.jails.name
+    release_name = f"{datasets.releases.name}/11.1-RELEASE/root"
+    pool.create(release_name, {}, create_ancestors=True)
+    release = zfs.get_dataset(release_name)
+    release.mount()
+    with open(f"{release.mountpoint}/COPYRIGHT", "w") as f:
+        f.write("release content\n" * 64)
+
+    def create(i):
+        name = f"{jails_name}/jail{i}"
+        pool.create(name, {})
+        dataset = zfs.get_dataset(name)
+        dataset.properties["org.freebsd.iocage:tag"] = f"jail{i}"
+        dataset.mount()
+
+    def clone(i):
+        snapshot_name = f"{release_name}@jail{i}"
+        release.snapshot(snapshot_name)
+        zfs.get_snapshot(snapshot_name).clone(f"{jails_name}/jail{i}/root")
+        zfs.get_dataset(f"{jails_name}/jail{i}/root").mount()
+
+    def list_jails(i):
+        for dataset in datasets.jails.children:
+            dataset.properties["org.freebsd.iocage:tag"].value
+
+    def destroy(i):
+        jail = zfs.get_dataset(f"{jails_name}/jail{i}")
+        for dataset in [*jail.children, jail]:
+            dataset.umount()
+            dataset.delete()
+        zfs.get_snapshot(f"{release_name}@jail{i}").delete()
+
+    result = benchmark.Benchmark(
+        f"in-memory ZFS storage, {count} jails, latency={latency}s"
+    )
+    result.measure("create", create, count)
+    result.measure("clone", clone, count)
+    result.measure("list", list_jails, max(1, count // 10))
+    result.measure("destroy", destroy, count)
+
+    zfs.close()
+    return result
+
+
+if __name__ == "__main__":
+    parser = benchmark.get_argument_parser(__doc__.strip().split("\n")[0])
+    parser.add_argument(
+        "--latency", "-l", type=float, default=0,
+        help="Seconds every simulated ZFS operation takes"
+    )
+    args = parser.parse_args()
+    run(args.count, args.latency).report()
@@ -0,0 +1,78 @@
+# Copyright (c) 2014-2017, iocage
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted providing that the following conditions
+# are met:
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in the
+#    documentation and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE AUTHOR ``AS IS'' AND ANY EXPRESS OR
+# IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED.  IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR ANY
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS
+# OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION)
+# HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT,
+# STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING
+# IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+"""
+Shared helpers for the benchmark scripts in this directory
+
+Benchmarks are plain scripts and are not collected by pytest:
+
+    python libiocage/tests/benchmarks/bench_storage.py --count 200
+"""
+import argparse
+import statistics
+import sys
+import time
+
+
+class Benchmark(object):
+
+    def __init__(self, title):
+        self.title = title
+        self.results = []
+
+    def measure(self, name, function, iterations):
+        durations = []
+        for i in range(iterations):
+            start = time.perf_counter()
+            function(i)
+            durations.append(time.perf_counter() - start)
+        self.results.append((name, durations))
+        return durations
+
+    def report(self, output=sys.stdout):
+        output.write(f"{self.title}\n")
+        output.write(
+            f"{'operation':<16}{'runs':>8}{'total':>12}"
+            f"{'mean':>12}{'median':>12}{'max':>12}\n"
+        )
+        for name, durations in self.results:
+            output.write(
+                f"{name:<16}{len(durations):>8}"
+                f"{_ms(sum(durations)):>12}"
+                f"{_ms(statistics.mean(durations)):>12}"
+                f"{_ms(statistics.median(durations)):>12}"
+                f"{_ms(max(durations)):>12}\n"
+            )
+
+
+def get_argument_parser(description):
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument(
+        "--count", "-n", type=int, default=100,
+        help="Number of iterations per operation"
+    )
+    return parser
+
+
+def _ms(seconds):
+    return f"{seconds * 1000:.3f}ms"
@@ -22,12 +22,13 @@
 # IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
 # POSSIBILITY OF SUCH DAMAGE.
 import helper_functions
-import libzfs
 import pytest
 
 import libiocage.lib.Host
 import libiocage.lib.Logger
 import libiocage.lib.Release
+import libiocage.lib.ZFSMemory
+import libiocage.lib.helpers
 
 # Inject lib directory to path
 # iocage_lib_dir = os.path.abspath(os.path.join(
@@ -43,6 +44,8 @@ _force_clean = False
 def pytest_addoption(parser):
     parser.addoption("--force-clean", action="store_true",
                      help="Force cleaning the /iocage-test dataset")
+    parser.addoption("--zfs-memory", action="store_true",
+                     help="Run against an in-memory ZFS instead of libzfs")
 
 
 def pytest_generate_tests(metafunc):
@@ -55,8 +58,16 @@ def force_clean():
 
 
 @pytest.fixture
-def zfs():
-    return libzfs.ZFS(history=True, history_prefix="<iocage>")
+def zfs(request):
+    if request.config.getoption("zfs_memory") is False:
+        yield libiocage.lib.helpers.get_zfs()
+        return
+
+    zfs = libiocage.lib.ZFSMemory.ZFS(pools=["iocage-test"])
+    pool = zfs.get("iocage-test")
+    pool.root_dataset.properties["org.freebsd.ioc:active"] = "yes"
+    yield zfs
+    zfs.close()
 
 
 @pytest.fixture
@@ -0,0 +1,81 @@
+# Copyright (c) 2014-2017, iocage
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted providing that the following conditions
+# are met:
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in the
+#    documentation and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE AUTHOR ``AS IS'' AND ANY EXPRESS OR
+# IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED.  IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR ANY
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS
+# OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION)
+# HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT,
+# STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING
+# IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+import hashlib
+import os
+
+import libiocage.lib.AssetCache
+
+
+def _create_asset(tmpdir, name, content):
+    path = str(tmpdir.join(name))
+    with open(path, "wb") as f:
+        f.write(content)
+    return path, hashlib.sha256(content).hexdigest()
+
+
+class TestAssetCache(object):
+
+    def test_assets_are_found_by_digest(self, tmpdir, logger):
+        cache = libiocage.lib.AssetCache.AssetCache(
+            directory=str(tmpdir.join("cache")),
+            logger=logger
+        )
+        path, digest = _create_asset(tmpdir, "base.txz", b"base")
+
+        assert cache.get(digest) is None
+
+        cached_path = cache.put(digest, path, move=True)
+        assert not os.path.exists(path)
+        assert cache.get(digest) == cached_path
+        with open(cached_path, "rb") as f:
+            assert f.read() == b"base"
+
+        cache.remove(digest)
+        assert cache.get(digest) is None
+
+    def test_least_recently_used_assets_are_evicted(self, tmpdir, logger):
+        cache = libiocage.lib.AssetCache.AssetCache(
+            directory=str(tmpdir.join("cache")),
+            max_size=2500,
+            logger=logger
+        )
+
+        digests = []
+        for i, name in enumerate(["a", "b"]):
+            path, digest = _create_asset(tmpdir, name, name.encode() * 1000)
+            cache.put(digest, path)
+            os.utime(cache.get_path(digest), (i, i))
+            digests.append(digest)
+
+        assert cache.size == 2000
+        assert cache.get(digests[0]) is not None
+
+        path, digest = _create_asset(tmpdir, "c", b"c" * 1000)
+        cache.put(digest, path)
+
+        # b was used least recently after a was accessed again
+        assert cache.get(digests[1]) is None
+        assert cache.get(digests[0]) is not None
+        assert cache.get(digest) is not None
+        assert cache.size == 2000
@@ -0,0 +1,200 @@
+# Copyright (c) 2014-2017, iocage
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted providing that the following conditions
+# are met:
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in the
+#    documentation and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE AUTHOR ``AS IS'' AND ANY EXPRESS OR
+# IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED.  IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR ANY
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS
+# OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION)
+# HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT,
+# STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING
+# IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+import hashlib
+import io
+import os
+import shutil
+import tarfile
+
+import pytest
+
+import libiocage.lib.AssetPipeline
+import libiocage.lib.errors
+
+
+def _create_txz(files):
+    data = io.BytesIO()
+    with tarfile.open(fileobj=data, mode="w:xz") as tar:
+        for name, content in files.items():
+            if content is None:
+                info = tarfile.TarInfo(name)
+                info.type = tarfile.DIRTYPE
+                info.mode = 0o755
+                tar.addfile(info)
+            elif isinstance(content, tuple):
+                link_type, link_name = content
+                info = tarfile.TarInfo(name)
+                info.type = link_type
+                info.linkname = link_name
+                tar.addfile(info)
+            else:
+                info = tarfile.TarInfo(name)
+                info.size = len(content)
+                tar.addfile(info, io.BytesIO(content))
+    return data.getvalue()
+
+
+def _reject_parent_references(member):
+    if ".." in member.name:
+        raise ValueError(f"illegal member {member.name}")
+
+
+compressions = [
+    None,
+    pytest.param("xz", marks=pytest.mark.skipif(
+        shutil.which("xz") is None,
+        reason="xz is not installed"
+    ))
+]
+
+
+class TestAssetPipeline(object):
+
+    @pytest.mark.parametrize("compression", compressions)
+    def test_asset_is_hashed_and_extracted(
+        self,
+        compression,
+        tmpdir,
+        logger
+    ):
+        txz = _create_txz({
+            "./etc": None,
+            "./etc/rc.conf": b"sendmail_enable=\"NO\"\n",
+            "./bin/sh": b"binary"
+        })
+        target_dir = str(tmpdir.mkdir("root"))
+        os.makedirs(f"{target_dir}/etc")
+        with open(f"{target_dir}/etc/existing", "w") as f:
+            f.write("kept")
+
+        pipeline = libiocage.lib.AssetPipeline.AssetPipeline(
+            staging_dir=f"{target_dir}/.staging",
+            compression=compression,
+            logger=logger
+        )
+        for i in range(0, len(txz), 1000):
+            pipeline.write(txz[i:i + 1000])
+        pipeline.close()
+
+        assert pipeline.digest == hashlib.sha256(txz).hexdigest()
+        assert pipeline.bytes_written == len(txz)
+
+        pipeline.commit(target_dir)
+
+        assert sorted(os.listdir(target_dir)) == ["bin", "etc"]
+        assert sorted(os.listdir(f"{target_dir}/etc")) == \
+            ["existing", "rc.conf"]
+        with open(f"{target_dir}/bin/sh", "rb") as f:
+            assert f.read() == b"binary"
+
+    @pytest.mark.parametrize("compression", compressions)
+    def test_invalid_members_abort_the_pipeline(
+        self,
+        compression,
+        tmpdir,
+        logger
+    ):
+        txz = _create_txz({
+            "./etc/rc.conf": b"",
+            "./../escape": b"outside"
+        })
+        staging_dir = str(tmpdir.join("staging"))
+
+        pipeline = libiocage.lib.AssetPipeline.AssetPipeline(
+            staging_dir=staging_dir,
+            validate_member=_reject_parent_references,
+            compression=compression,
+            logger=logger
+        )
+
+        with pytest.raises(ValueError):
+            pipeline.write(txz)
+            pipeline.close()
+
+        pipeline.abort()
+        assert not os.path.exists(staging_dir)
+        assert not os.path.exists(str(tmpdir.join("escape")))
+
+    @pytest.mark.parametrize("members", [
+        # a symlink pointing out of the staging directory is written through
+        [("./link", (tarfile.SYMTYPE, "{outside}")), ("./link/escaped", b"")],
+        [("./link", (tarfile.SYMTYPE, "../../outside")), ("./other", b"")],
+        [("./passwd", (tarfile.LNKTYPE, "{outside}/escaped")), ("./a", b"")]
+    ])
+    def test_members_escaping_the_staging_directory_are_refused(
+        self,
+        members,
+        tmpdir,
+        logger
+    ):
+        outside_dir = str(tmpdir.mkdir("outside"))
+        with open(f"{outside_dir}/escaped", "w") as f:
+            f.write("host file")
+        txz = _create_txz({
+            name: content if not isinstance(content, tuple) else (
+                content[0],
+                content[1].format(outside=outside_dir)
+            ) for name, content in members
+        })
+        staging_dir = str(tmpdir.join("staging"))
+
+        pipeline = libiocage.lib.AssetPipeline.AssetPipeline(
+            staging_dir=staging_dir,
+            logger=logger
+        )
+
+        with pytest.raises(libiocage.lib.errors.IllegalArchiveMember):
+            pipeline.write(txz)
+            pipeline.close()
+
+        pipeline.abort()
+        assert os.listdir(outside_dir) == ["escaped"]
+        with open(f"{outside_dir}/escaped") as f:
+            assert f.read() == "host file"
+        assert not os.path.exists(staging_dir)
+
+    def test_links_within_the_archive_are_extracted(self, tmpdir, logger):
+        txz = _create_txz({
+            "./etc": None,
+            "./etc/termcap": (tarfile.SYMTYPE, "/usr/share/misc/termcap"),
+            "./usr/lib/libc.so": (tarfile.SYMTYPE, "../../lib/libc.so.7"),
+            "./lib/libc.so.7": b"library",
+            "./lib/libc.so": (tarfile.LNKTYPE, "./lib/libc.so.7")
+        })
+        target_dir = str(tmpdir.mkdir("root"))
+
+        pipeline = libiocage.lib.AssetPipeline.AssetPipeline(
+            staging_dir=f"{target_dir}/.staging",
+            logger=logger
+        )
+        pipeline.write(txz)
+        pipeline.close()
+        pipeline.commit(target_dir)
+
+        assert os.readlink(f"{target_dir}/etc/termcap") == \
+            "/usr/share/misc/termcap"
+        with open(f"{target_dir}/usr/lib/libc.so", "rb") as f:
+            assert f.read() == b"library"
+        with open(f"{target_dir}/lib/libc.so", "rb") as f:
+            assert f.read() == b"library"
@@ -0,0 +1,89 @@
+# Copyright (c) 2014-2017, iocage
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted providing that the following conditions
+# are met:
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in the
+#    documentation and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE AUTHOR ``AS IS'' AND ANY EXPRESS OR
+# IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED.  IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR ANY
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS
+# OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION)
+# HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT,
+# STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING
+# IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+import os
+import stat
+
+import libiocage.lib.ConfigBatch
+import libiocage.lib.JailConfig
+import libiocage.lib.JailConfigJSON
+
+
+class _Dataset:
+    def __init__(self, mountpoint):
+        self.mountpoint = mountpoint
+
+
+class _Jail:
+    def __init__(self, mountpoint):
+        self.dataset = _Dataset(mountpoint)
+
+
+class TestConfigBatch(object):
+
+    def test_write_atomic_keeps_mode(self, tmpdir):
+        path = str(tmpdir.join("config.json"))
+        libiocage.lib.ConfigBatch.write_atomic(path, "first")
+        assert stat.S_IMODE(os.stat(path).st_mode) == 0o644
+        os.chmod(path, 0o600)
+
+        libiocage.lib.ConfigBatch.write_atomic(path, b"second")
+
+        with open(path) as f:
+            assert f.read() == "second"
+        assert stat.S_IMODE(os.stat(path).st_mode) == 0o600
+        assert os.listdir(str(tmpdir)) == ["config.json"]
+
+    def test_batch_syncs_directories_on_commit(self, tmpdir):
+        directories = [tmpdir.mkdir("a"), tmpdir.mkdir("b")]
+
+        with libiocage.lib.ConfigBatch.ConfigBatch() as batch:
+            for directory in directories:
+                batch.write(str(directory.join("config.json")), "{}")
+                batch.write(str(directory.join("rc.conf")), "")
+            assert len(batch.directories) == 2
+
+        assert len(batch.directories) == 0
+        for directory in directories:
+            assert sorted(os.listdir(str(directory))) == [
+                "config.json",
+                "rc.conf"
+            ]
+
+    def test_unchanged_json_config_is_not_written(self, tmpdir):
+        config = libiocage.lib.JailConfig.JailConfig(
+            data={"id": "foo", "securelevel": "3"}
+        )
+        config.jail = _Jail(str(tmpdir))
+        json_config = libiocage.lib.JailConfigJSON.JailConfigJSON
+
+        assert json_config.save(config) is True
+        assert json_config.save(config) is False
+
+        config["securelevel"] = "2"
+        assert json_config.save(config) is True
+
+        reread_config = libiocage.lib.JailConfig.JailConfig(data={})
+        reread_config.jail = _Jail(str(tmpdir))
+        json_config.read(reread_config)
+        assert json_config.save(reread_config) is False
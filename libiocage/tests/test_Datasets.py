@@ -29,7 +29,7 @@ import libiocage.lib
 class TestDatasets(object):
 
     @pytest.fixture
-    def MockedDatasets(self, logger, pool):
+    def MockedDatasets(self, logger, pool, zfs):
 
         class DatasetsMock(libiocage.lib.Datasets.Datasets):
             ZFS_POOL_ACTIVE_PROPERTY = "org.freebsd.ioc-test:active"
@@ -39,6 +39,17 @@ class TestDatasets(object):
         prop = DatasetsMock.ZFS_POOL_ACTIVE_PROPERTY
         pool.root_dataset.properties[prop].value = "no"
 
-    def test_pool_can_be_activated(self, MockedDatasets, pool, logger):
-        datasets = MockedDatasets(pool=pool, logger=logger)
+    def test_pool_can_be_activated(self, MockedDatasets, pool, logger, zfs):
+        datasets = MockedDatasets(pool=pool, logger=logger, zfs=zfs)
         datasets.activate()
+
+    def test_single_pool_placement(self, MockedDatasets, pool, logger, zfs):
+        datasets = MockedDatasets(pool=pool, logger=logger, zfs=zfs)
+        datasets.activate()
+
+        for policy in MockedDatasets.PLACEMENT_POLICIES:
+            root = datasets.select_root(policy=policy)
+            assert root.name == datasets.root.name
+
+        root = datasets.select_root(pool_name=pool.name)
+        assert root.name == datasets.root.name
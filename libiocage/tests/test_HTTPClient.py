@@ -0,0 +1,169 @@
+# Copyright (c) 2014-2017, iocage
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted providing that the following conditions
+# are met:
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in the
+#    documentation and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE AUTHOR ``AS IS'' AND ANY EXPRESS OR
+# IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED.  IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR ANY
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS
+# OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION)
+# HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT,
+# STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING
+# IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+import http.server
+import socketserver
+import threading
+
+import pytest
+
+import libiocage.lib.HTTPClient
+import libiocage.lib.errors
+
+INDEX = b"<a href=\"11.1-RELEASE/\">11.1-RELEASE/</a>"
+ETAG = "\"index-1\""
+
+
+class MetadataHandler(http.server.BaseHTTPRequestHandler):
+
+    protocol_version = "HTTP/1.1"
+    requests = []
+    failing = False
+
+    def do_HEAD(self):
+        self._respond(send_body=False)
+
+    def do_GET(self):
+        self._respond(send_body=True)
+
+    def _respond(self, send_body):
+        MetadataHandler.requests.append(
+            (self.command, self.path, self.headers.get("If-None-Match"))
+        )
+
+        if MetadataHandler.failing is True:
+            self.send_response(503)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        if self.path != "/index.html":
+            self.send_response(404)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        if self.headers.get("If-None-Match") == ETAG:
+            self.send_response(304)
+            self.send_header("ETag", ETAG)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        self.send_response(200)
+        self.send_header("ETag", ETAG)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(INDEX)))
+        self.end_headers()
+        if send_body is True:
+            self.wfile.write(INDEX)
+
+    def log_message(self, *args):
+        pass
+
+
+class ThreadingServer(socketserver.ThreadingMixIn, http.server.HTTPServer):
+    daemon_threads = True
+
+
+@pytest.fixture
+def server_url():
+    MetadataHandler.requests = []
+    MetadataHandler.failing = False
+    server = ThreadingServer(("127.0.0.1", 0), MetadataHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+class TestHTTPClient(object):
+
+    def test_responses_are_cached_per_ttl(self, server_url, tmpdir, logger):
+        cache_dir = str(tmpdir.join("cache"))
+        url = f"{server_url}/index.html"
+
+        client = libiocage.lib.HTTPClient.HTTPClient(
+            cache_dir=cache_dir,
+            logger=logger
+        )
+        assert client.get(url, ttl=60).text == INDEX.decode()
+        assert client.get(url, ttl=60).text == INDEX.decode()
+        assert len(MetadataHandler.requests) == 1
+
+        # another process reads the on-disk cache
+        other_client = libiocage.lib.HTTPClient.HTTPClient(
+            cache_dir=cache_dir,
+            logger=logger
+        )
+        assert other_client.get(url, ttl=60).body == INDEX
+        assert len(MetadataHandler.requests) == 1
+
+        # expired entries are revalidated
+        assert other_client.get(url, ttl=0).body == INDEX
+        assert MetadataHandler.requests[-1] == ("GET", "/index.html", ETAG)
+        assert len(MetadataHandler.requests) == 2
+
+    def test_availability_is_cached(self, server_url, tmpdir, logger):
+        client = libiocage.lib.HTTPClient.HTTPClient(
+            cache_dir=str(tmpdir.join("cache")),
+            logger=logger
+        )
+
+        assert client.exists(f"{server_url}/index.html", ttl=60) is True
+        assert client.exists(f"{server_url}/index.html", ttl=60) is True
+        assert len(MetadataHandler.requests) == 1
+
+        # failed responses are not cached
+        assert client.exists(f"{server_url}/missing", ttl=60) is False
+        assert client.exists(f"{server_url}/missing", ttl=60) is False
+        assert len(MetadataHandler.requests) == 3
+
+        with pytest.raises(libiocage.lib.errors.DownloadFailed):
+            client.get(f"{server_url}/missing")
+
+    def test_stale_responses_are_served_on_errors(
+        self,
+        server_url,
+        tmpdir,
+        logger
+    ):
+        client = libiocage.lib.HTTPClient.HTTPClient(
+            cache_dir=str(tmpdir.join("cache")),
+            logger=logger
+        )
+        url = f"{server_url}/index.html"
+        assert client.get(url, ttl=60).body == INDEX
+
+        MetadataHandler.failing = True
+        assert client.get(url, ttl=0).body == INDEX
+        assert len(MetadataHandler.requests) == 2
+
+        with pytest.raises(libiocage.lib.errors.DownloadFailed):
+            client.get(f"{server_url}/other.html", ttl=60)
+
+        # the server error was not cached
+        MetadataHandler.failing = False
+        assert client.get(url, ttl=0).body == INDEX
+        assert len(MetadataHandler.requests) == 4
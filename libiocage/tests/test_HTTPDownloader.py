@@ -0,0 +1,252 @@
+# Copyright (c) 2014-2017, iocage
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted providing that the following conditions
+# are met:
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in the
+#    documentation and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE AUTHOR ``AS IS'' AND ANY EXPRESS OR
+# IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED.  IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR ANY
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS
+# OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION)
+# HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT,
+# STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING
+# IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+import http.server
+import io
+import os
+import re
+import socketserver
+import threading
+import time
+
+import pytest
+
+import libiocage.lib.HTTPDownloader
+import libiocage.lib.errors
+
+ASSETS = {
+    "/base.txz": os.urandom(300 * 1024),
+    "/lib32.txz": os.urandom(70 * 1024)
+}
+
+
+class MirrorHandler(http.server.BaseHTTPRequestHandler):
+
+    protocol_version = "HTTP/1.1"
+    requests = []
+
+    def do_HEAD(self):
+        self._respond(send_body=False)
+
+    def do_GET(self):
+        self._respond(send_body=True)
+
+    def _respond(self, send_body):
+        MirrorHandler.requests.append(
+            (self.command, self.path, self.headers.get("Range"))
+        )
+
+        if self.path not in ASSETS:
+            self.send_response(404)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        content = ASSETS[self.path]
+        status = 200
+        match = re.match(r"bytes=(\d+)-(\d*)", self.headers.get("Range", ""))
+        if match is not None:
+            start = int(match.group(1))
+            end = int(match.group(2) or (len(content) - 1))
+            content = content[start:end + 1]
+            status = 206
+
+        self.send_response(status)
+        self.send_header("Accept-Ranges", "bytes")
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        if send_body is True:
+            self.wfile.write(content)
+
+    def log_message(self, *args):
+        pass
+
+
+class ThreadingServer(socketserver.ThreadingMixIn, http.server.HTTPServer):
+    daemon_threads = True
+
+
+@pytest.fixture
+def mirror_url():
+    MirrorHandler.requests = []
+    server = ThreadingServer(("127.0.0.1", 0), MirrorHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+def _download(downloader, downloads):
+    return [x for x in downloader.download(downloads) if x.done or x.error]
+
+
+class TestHTTPDownloader(object):
+
+    def test_assets_are_downloaded(self, mirror_url, tmpdir, logger):
+        downloader = libiocage.lib.HTTPDownloader.HTTPDownloader(
+            logger=logger
+        )
+        downloads = [
+            libiocage.lib.HTTPDownloader.Download(
+                f"{mirror_url}{name}",
+                str(tmpdir.join(name))
+            ) for name in ASSETS
+        ]
+
+        finished = _download(downloader, downloads)
+
+        assert len(finished) == 2
+        for name, content in ASSETS.items():
+            with open(str(tmpdir.join(name)), "rb") as f:
+                assert f.read() == content
+
+    def test_partial_downloads_are_resumed(self, mirror_url, tmpdir, logger):
+        downloader = libiocage.lib.HTTPDownloader.HTTPDownloader(
+            logger=logger
+        )
+        download = libiocage.lib.HTTPDownloader.Download(
+            f"{mirror_url}/lib32.txz",
+            str(tmpdir.join("lib32.txz"))
+        )
+        with open(download.part_path, "wb") as f:
+            f.write(ASSETS["/lib32.txz"][:1000])
+
+        _download(downloader, [download])
+
+        assert ("GET", "/lib32.txz", "bytes=1000-") in MirrorHandler.requests
+        assert download.resumed_at == 1000
+        with open(download.path, "rb") as f:
+            assert f.read() == ASSETS["/lib32.txz"]
+
+    def test_sinks_receive_resumed_prefix(self, mirror_url, tmpdir, logger):
+        downloader = libiocage.lib.HTTPDownloader.HTTPDownloader(
+            split_size=1024,
+            logger=logger
+        )
+        sink = io.BytesIO()
+        download = libiocage.lib.HTTPDownloader.Download(
+            f"{mirror_url}/lib32.txz",
+            str(tmpdir.join("lib32.txz")),
+            sink=sink
+        )
+        with open(download.part_path, "wb") as f:
+            f.write(ASSETS["/lib32.txz"][:1000])
+
+        _download(downloader, [download])
+
+        assert sink.getvalue() == ASSETS["/lib32.txz"]
+
+    def test_large_assets_are_split(self, mirror_url, tmpdir, logger):
+        downloader = libiocage.lib.HTTPDownloader.HTTPDownloader(
+            split_size=100 * 1024,
+            chunk_size=64 * 1024,
+            logger=logger
+        )
+        download = libiocage.lib.HTTPDownloader.Download(
+            f"{mirror_url}/base.txz",
+            str(tmpdir.join("base.txz"))
+        )
+
+        _download(downloader, [download])
+
+        ranges = [x[2] for x in MirrorHandler.requests if x[0] == "GET"]
+        assert len(ranges) == 5
+        assert "bytes=262144-307199" in ranges
+        assert not os.path.exists(download.state_path)
+        with open(download.path, "rb") as f:
+            assert f.read() == ASSETS["/base.txz"]
+
+    def test_split_assets_are_passed_to_sinks_in_order(
+        self,
+        mirror_url,
+        tmpdir,
+        logger
+    ):
+        downloader = libiocage.lib.HTTPDownloader.HTTPDownloader(
+            split_size=100 * 1024,
+            chunk_size=16 * 1024,
+            logger=logger
+        )
+        sink = io.BytesIO()
+        download = libiocage.lib.HTTPDownloader.Download(
+            f"{mirror_url}/base.txz",
+            str(tmpdir.join("base.txz")),
+            sink=sink
+        )
+
+        _download(downloader, [download])
+
+        ranges = [x[2] for x in MirrorHandler.requests if x[0] == "GET"]
+        assert len(ranges) == 19
+        assert sink.getvalue() == ASSETS["/base.txz"]
+
+    def test_missing_assets_fail(self, mirror_url, tmpdir, logger):
+        downloader = libiocage.lib.HTTPDownloader.HTTPDownloader(
+            logger=logger
+        )
+        download = libiocage.lib.HTTPDownloader.Download(
+            f"{mirror_url}/src.txz",
+            str(tmpdir.join("src.txz"))
+        )
+
+        _download(downloader, [download])
+
+        assert isinstance(download.error, libiocage.lib.errors.DownloadFailed)
+        assert not os.path.exists(download.path)
+
+    def test_concurrent_calls_share_limits(self, mirror_url, tmpdir, logger):
+        downloader = libiocage.lib.HTTPDownloader.HTTPDownloader(
+            max_workers=1,
+            max_rate=128 * 1024,
+            logger=logger
+        )
+
+        def download(name):
+            return _download(downloader, [
+                libiocage.lib.HTTPDownloader.Download(
+                    f"{mirror_url}{name}",
+                    str(tmpdir.join(name))
+                )
+            ])
+
+        start = time.perf_counter()
+        threads = [
+            threading.Thread(target=download, args=(name,))
+            for name in ASSETS
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        duration = time.perf_counter() - start
+
+        # 370 KiB at 128 KiB/s after an initial burst of 128 KiB
+        assert 1.5 < duration < 5
+        assert len(list(filter(
+            lambda x: x[0] == "GET",
+            MirrorHandler.requests
+        ))) == 2
+        for name, content in ASSETS.items():
+            with open(str(tmpdir.join(name)), "rb") as f:
+                assert f.read() == content
@@ -0,0 +1,139 @@
+# Copyright (c) 2014-2017, iocage
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted providing that the following conditions
+# are met:
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in the
+#    documentation and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE AUTHOR ``AS IS'' AND ANY EXPRESS OR
+# IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED.  IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR ANY
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS
+# OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION)
+# HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT,
+# STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING
+# IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+import json
+
+import libiocage.lib.JailConfig
+
+
+class TestJailConfig(object):
+
+    def _create_config(self, data={}):
+        return libiocage.lib.JailConfig.JailConfig(data=data)
+
+    def test_schema_is_compiled_once(self):
+        a = self._create_config()
+        b = self._create_config()
+        assert a._schema is b._schema
+
+        schema = a._schema
+        assert schema["basejail"].getter is not None
+        assert schema["basejail"].setter is not None
+        assert schema["basejail"].default is not None
+        assert schema["get_string"].attribute is True
+
+    def test_lookup_order(self):
+        config = self._create_config({"id": "foo", "securelevel": "3"})
+        assert config["id"] == "foo"
+        assert config["securelevel"] == "3"
+        assert config["exec_timeout"] == "60"
+        assert config["clonejail"] is True
+        assert config["basejail"] is False
+
+    def test_defaults_file_overrides_computed_defaults(self, tmpdir):
+        defaults_file = str(tmpdir.join("defaults.json"))
+        with open(defaults_file, "w") as f:
+            json.dump({"basejail": True, "clonejail": False}, f)
+
+        config = libiocage.lib.JailConfig.JailConfig(
+            data={"id": "foo"},
+            defaults_file=defaults_file
+        )
+        assert config["basejail"] is True
+        assert config["clonejail"] is False
+
+        # computed defaults apply to keys missing in the defaults
+        assert config["jail_zfs"] is False
+
+    def test_setter_dispatch(self):
+        config = self._create_config()
+        config["basejail"] = True
+        assert config.data["basejail"] == "yes"
+        assert config["basejail"] is True
+
+        config["foo"] = "bar"
+        assert config.data["foo"] == "bar"
+
+    def test_attribute_passthrough(self):
+        config = self._create_config({"id": "foo", "vnet": "yes"})
+        assert "vnet" in config["all_properties"]
+        assert config["get_string"]("vnet") == "yes"
+        assert config["get_string"]("securelevel") == "2"
+
+    def test_network_properties_are_parsed_lazily(self):
+        config = self._create_config({
+            "id": "foo",
+            "ip4_addr": "em0|10.0.0.2/24 em0|10.0.0.3/24 em1|10.1.0.2/24",
+            "interfaces": "vnet0:bridge0,vnet1:bridge1"
+        })
+        assert "ip4_addr" not in config.special_properties
+        assert config.get_string("ip4_addr") == config.data["ip4_addr"]
+        assert "ip4_addr" not in config.special_properties
+
+        ip4_addr = config["ip4_addr"]
+        assert config["ip4_addr"] is ip4_addr
+        assert ip4_addr["em0"] == set(["10.0.0.2/24", "10.0.0.3/24"])
+        assert list(config["interfaces"]["vnet1"]) == ["bridge1"]
+
+        config["ip4_addr"] = "em2|10.2.0.2/24"
+        assert list(config["ip4_addr"].keys()) == ["em2"]
+
+        config["ip4_addr"] = "none"
+        assert config["ip4_addr"] is None
+
+    def test_network_property_mutations_notify_once(self, monkeypatch):
+        config = self._create_config({
+            "id": "foo",
+            "ip4_addr": "em0|10.0.0.2/24"
+        })
+        ip4_addr = config["ip4_addr"]
+        assert str(ip4_addr) is str(ip4_addr)
+
+        notifications = []
+        update_special_property = config.update_special_property
+
+        def counting_update_special_property(name):
+            notifications.append(name)
+            update_special_property(name)
+
+        monkeypatch.setattr(
+            config,
+            "update_special_property",
+            counting_update_special_property
+        )
+
+        ip4_addr.update({
+            "em0": ["10.0.0.3/24"],
+            "em1": ["10.1.0.2/24", "10.1.0.3/24"]
+        })
+        assert notifications == ["ip4_addr"]
+        assert sorted(config.data["ip4_addr"].split(" ")) == [
+            "em0|10.0.0.2/24",
+            "em0|10.0.0.3/24",
+            "em1|10.1.0.2/24",
+            "em1|10.1.0.3/24"
+        ]
+
+        ip4_addr["em1"].remove("10.1.0.3/24")
+        assert len(notifications) == 2
+        assert "10.1.0.3/24" not in config.get_string("ip4_addr")
@@ -0,0 +1,88 @@
+# Copyright (c) 2014-2017, iocage
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted providing that the following conditions
+# are met:
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in the
+#    documentation and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE AUTHOR ``AS IS'' AND ANY EXPRESS OR
+# IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED.  IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR ANY
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS
+# OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION)
+# HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT,
+# STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING
+# IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+import json
+import os
+
+import libiocage.lib.JailConfigDefaults
+import libiocage.lib.Logger
+
+
+class TestJailConfigDefaults(object):
+
+    def _write(self, path, data, mtime):
+        with open(path, "w") as f:
+            json.dump(data, f)
+        os.utime(path, (mtime, mtime))
+
+    def test_revalidate_reloads_changed_file(self, tmpdir):
+        path = str(tmpdir.join("defaults.json"))
+        self._write(path, {"securelevel": "3", "foo": "bar"}, 1000)
+
+        defaults = libiocage.lib.JailConfigDefaults.JailConfigDefaults(
+            file=path,
+            logger=libiocage.lib.Logger.Logger()
+        )
+        assert defaults["securelevel"] == "3"
+        assert defaults["foo"] == "bar"
+        assert defaults.revalidate() is False
+
+        self._write(path, {"securelevel": "1"}, 2000)
+        assert defaults.revalidate() is True
+        assert defaults["securelevel"] == "1"
+        assert "foo" not in defaults
+        assert defaults["exec_timeout"] == "60"
+
+        os.remove(path)
+        assert defaults.revalidate() is True
+        assert defaults["securelevel"] == "2"
+
+    def test_revalidate_interval(self, tmpdir):
+        path = str(tmpdir.join("defaults.json"))
+        self._write(path, {"securelevel": "3"}, 1000)
+
+        defaults = libiocage.lib.JailConfigDefaults.JailConfigDefaults(
+            file=path,
+            logger=libiocage.lib.Logger.Logger(),
+            revalidate_interval=3600
+        )
+
+        self._write(path, {"securelevel": "1"}, 2000)
+        assert defaults.revalidate() is False
+        assert defaults["securelevel"] == "3"
+
+    def test_revalidate_does_not_change_iterated_data(self, tmpdir):
+        path = str(tmpdir.join("defaults.json"))
+        self._write(path, {"foo": "bar"}, 1000)
+
+        defaults = libiocage.lib.JailConfigDefaults.JailConfigDefaults(
+            file=path,
+            logger=libiocage.lib.Logger.Logger()
+        )
+        keys = iter(defaults.keys())
+        next(keys)
+
+        self._write(path, {"securelevel": "1"}, 2000)
+        assert defaults.revalidate() is True
+        assert "foo" in list(keys)
+        assert "foo" not in defaults.keys()
@@ -0,0 +1,130 @@
+# Copyright (c) 2014-2017, iocage
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted providing that the following conditions
+# are met:
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in the
+#    documentation and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE AUTHOR ``AS IS'' AND ANY EXPRESS OR
+# IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED.  IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR ANY
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS
+# OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION)
+# HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT,
+# STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING
+# IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+import libiocage.lib.JailConfig
+import libiocage.lib.JailConfigFstab
+import libiocage.lib.Logger
+import libiocage.lib.helpers
+
+
+class FakeJail(object):
+
+    def __init__(self, path, config):
+        self.path = path
+        self.config = config
+        self.host = type("Host", (), {})()
+        self.host.distribution = type("Distribution", (), {})()
+        self.host.distribution.name = "FreeBSD"
+        self.release = type("Release", (), {})()
+        self.release.releases_folder = "/iocage/releases"
+
+
+class TestJailConfigFstab(object):
+
+    def _create_fstab(self, path, data):
+        config = libiocage.lib.JailConfig.JailConfig(data=data)
+        jail = FakeJail(path, config)
+        config.fstab = libiocage.lib.JailConfigFstab.JailConfigFstab(
+            jail=jail,
+            logger=libiocage.lib.Logger.Logger()
+        )
+        return config.fstab
+
+    def test_lines_are_indexed_by_destination(self, tmpdir):
+        fstab = self._create_fstab(str(tmpdir), {"id": "foo"})
+        fstab.add("/usr/ports", "/jail/usr/ports")
+        fstab.add("/data", "/jail/data", options="rw")
+        fstab.add("/usr/src", "/jail/usr/src")
+
+        assert len(fstab) == 3
+        assert {"destination": "/jail/data/"} in fstab
+        assert "/jail/usr/src" in fstab
+        assert "/jail/usr" not in fstab
+        assert fstab["/jail/data"]["options"] == "rw"
+
+        # replaced lines keep their position
+        fstab.add("/tank/data", "/jail/data")
+        assert [x["source"] for x in fstab] == [
+            "/usr/ports",
+            "/tank/data",
+            "/usr/src"
+        ]
+
+        fstab.remove("/jail/usr/ports")
+        assert "/jail/usr/ports" not in fstab
+        assert len(fstab) == 2
+
+    def test_read_and_save(self, tmpdir):
+        fstab = self._create_fstab(str(tmpdir), {"id": "foo"})
+        tmpdir.join("fstab").write(
+            "/a\t/jail/a\tnullfs\tro\t0\t0\n"
+            "/b\t/jail/b\tnullfs\trw\t0\t0 # custom\n"
+            "/c\t/jail/c\tnullfs\tro\t0\t0 # iocage-auto\n"
+        )
+        fstab.read_file()
+        assert [x["destination"] for x in fstab] == ["/jail/a", "/jail/b"]
+        assert fstab["/jail/b"]["comment"] == "custom"
+        assert fstab.save() is True
+        assert fstab.save() is False
+
+    def test_basejail_lines_are_cached(self, tmpdir, monkeypatch):
+        calls = []
+        get_basedir_list = libiocage.lib.helpers.get_basedir_list
+
+        def counting_get_basedir_list(**kwargs):
+            calls.append(kwargs)
+            return get_basedir_list(**kwargs)
+
+        monkeypatch.setattr(
+            libiocage.lib.helpers,
+            "get_basedir_list",
+            counting_get_basedir_list
+        )
+
+        path = str(tmpdir)
+        fstab = self._create_fstab(path, {
+            "id": "foo",
+            "basejail": "yes",
+            "cloned_release": "11.0-RELEASE"
+        })
+        fstab.add("/data", "/jail/data")
+
+        basedirs = len(get_basedir_list(distribution_name="FreeBSD"))
+        assert len(list(fstab)) == basedirs + 1
+        assert len(list(fstab)) == basedirs + 1
+        assert f"{path}/root/usr/bin" in fstab
+        assert len(calls) == 1
+
+        config = fstab.jail.config
+        config["securelevel"] = "3"
+        assert len(list(fstab)) == basedirs + 1
+        assert len(calls) == 1
+
+        config["cloned_release"] = "11.1-RELEASE"
+        sources = [x["source"] for x in fstab.basejail_lines]
+        assert len(calls) == 2
+        assert sources[0].startswith("/iocage/releases/11.1-RELEASE/")
+
+        config["basejail"] = False
+        assert list(fstab) == [fstab["/jail/data"]]
+        assert f"{path}/root/usr/bin" not in fstab
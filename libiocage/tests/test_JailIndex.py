@@ -0,0 +1,63 @@
+# Copyright (c) 2014-2017, iocage
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted providing that the following conditions
+# are met:
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in the
+#    documentation and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE AUTHOR ``AS IS'' AND ANY EXPRESS OR
+# IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED.  IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR ANY
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS
+# OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION)
+# HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT,
+# STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING
+# IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+import libiocage.lib.JailIndex
+
+
+class _Dataset:
+    def __init__(self, mountpoint):
+        self.mountpoint = mountpoint
+
+
+class _Datasets:
+    def __init__(self, mountpoint):
+        self.root = _Dataset(mountpoint)
+
+
+class _Host:
+    def __init__(self, mountpoint):
+        self.datasets = _Datasets(mountpoint)
+
+
+class TestJailIndex(object):
+
+    def test_config_format_is_persisted(self, tmpdir):
+        host = _Host(str(tmpdir))
+        jail_index = libiocage.lib.JailIndex.JailIndex(host=host)
+        assert jail_index.get_config_format("foo") is None
+
+        jail_index.set_config_format("foo", "zfs")
+        jail_index.set_config_format("bar", "json")
+
+        jail_index = libiocage.lib.JailIndex.JailIndex(host=host)
+        assert jail_index.get_config_format("foo") == "zfs"
+        assert jail_index.get_config_format("bar") == "json"
+
+        jail_index.remove("foo")
+        jail_index = libiocage.lib.JailIndex.JailIndex(host=host)
+        assert jail_index.get_config_format("foo") is None
+
+    def test_invalid_index_is_ignored(self, tmpdir):
+        tmpdir.join("jails.index.json").write("{invalid")
+        jail_index = libiocage.lib.JailIndex.JailIndex(host=_Host(str(tmpdir)))
+        assert jail_index.get_config_format("foo") is None
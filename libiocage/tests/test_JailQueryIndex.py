@@ -0,0 +1,140 @@
+# Copyright (c) 2014-2017, iocage
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted providing that the following conditions
+# are met:
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in the
+#    documentation and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE AUTHOR ``AS IS'' AND ANY EXPRESS OR
+# IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED.  IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR ANY
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS
+# OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION)
+# HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT,
+# STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING
+# IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+import os
+
+import pytest
+
+import libiocage.lib.JailConfig
+import libiocage.lib.JailFilter
+import libiocage.lib.JailQueryIndex
+import libiocage.lib.Jails
+import libiocage.lib.Logger
+import libiocage.lib.ZFSMemory
+
+sqlite3 = pytest.importorskip("sqlite3")
+
+
+class _Dataset:
+    def __init__(self, mountpoint, name=None):
+        self.mountpoint = mountpoint
+        self.name = name
+
+
+class _Datasets:
+    def __init__(self, mountpoint):
+        self.root = _Dataset(mountpoint)
+
+
+class _Host:
+    def __init__(self, mountpoint):
+        self.datasets = _Datasets(mountpoint)
+        self.query_index = None
+
+
+class _Jail:
+
+    def __init__(self, name, **data):
+        self.config = libiocage.lib.JailConfig.JailConfig(
+            data=dict(id=name, **data)
+        )
+        self.name = name
+
+
+class TestJailQueryIndex(object):
+
+    @pytest.fixture
+    def query_index(self, tmpdir):
+        host = _Host(str(tmpdir))
+        query_index = libiocage.lib.JailQueryIndex.JailQueryIndex(host=host)
+        host.query_index = query_index
+        assert query_index.enabled is False
+        query_index.rebuild([
+            _Jail("web1", release="11.1-RELEASE", boot="on"),
+            _Jail("web2", release="11.0-RELEASE", boot="on"),
+            _Jail("db1", release="11.1-RELEASE", boot="off", securelevel="3"),
+            _Jail("d5f3c6e1-8a2b-4c3d-9e8f-0a1b2c3d4e5f"),
+        ])
+        assert query_index.enabled is True
+        return query_index
+
+    def _mismatches(self, query_index, filters):
+        terms = libiocage.lib.JailFilter.Terms(filters)
+        return sorted(query_index.get_mismatches(terms).keys())
+
+    def test_mismatches(self, query_index):
+        assert self._mismatches(query_index, ["release=11.1-RELEASE"]) == [
+            "web2"
+        ]
+        assert self._mismatches(query_index, ["release=11.0*,11.1*"]) == []
+        assert self._mismatches(query_index, ["boot=yes"]) == ["db1"]
+        assert self._mismatches(query_index, [
+            "release=11.0-RELEASE",
+            "boot=yes"
+        ]) == ["db1", "web1"]
+
+        # inherited values and runtime state never rule out jails
+        assert self._mismatches(query_index, ["securelevel=2"]) == ["db1"]
+        assert self._mismatches(query_index, ["running=yes", "web*"]) == []
+
+        terms = libiocage.lib.JailFilter.Terms(["release=11.1-RELEASE"])
+        assert query_index.query(terms) == [
+            "d5f3c6e1-8a2b-4c3d-9e8f-0a1b2c3d4e5f",
+            "db1",
+            "web1"
+        ]
+
+    def test_remove(self, query_index):
+        query_index.remove_jail("web2")
+        assert "web2" not in query_index.get_names()
+        assert self._mismatches(query_index, ["release=11.1-RELEASE"]) == []
+
+    def test_modified_configs_are_not_ruled_out(self, query_index, tmpdir):
+        jails = libiocage.lib.Jails.JailsGenerator(
+            filters=["release=11.1-RELEASE"],
+            host=query_index.host,
+            logger=libiocage.lib.Logger.Logger(),
+            zfs=libiocage.lib.ZFSMemory.ZFS(pools=["memory"])
+        )
+        indexed_at = query_index.get_mismatches(jails._filters)["web2"]
+
+        datasets = []
+        for name in ["web1", "web2", "db1"]:
+            mountpoint = tmpdir.mkdir(name)
+            datasets.append(_Dataset(str(mountpoint), f"iocage/jails/{name}"))
+            if name != "db1":
+                config_file = mountpoint.join("config.json")
+                config_file.write("{}")
+                os.utime(str(config_file), (indexed_at - 1, indexed_at - 1))
+
+        assert jails._get_index_mismatches(datasets) == set(["web2"])
+
+        # a config edited after indexing is loaded again
+        config_file = f"{datasets[1].mountpoint}/config.json"
+        os.utime(config_file, (indexed_at + 1, indexed_at + 1))
+        assert jails._get_index_mismatches(datasets) == set()
+
+    def test_glob_pattern(self):
+        to_glob_pattern = libiocage.lib.JailQueryIndex.to_glob_pattern
+        assert to_glob_pattern("a*b+c") == "a*b?*c"
+        assert to_glob_pattern("a?[b]") == "a[?][[]b]"
@@ -0,0 +1,174 @@
+# Copyright (c) 2014-2017, iocage
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted providing that the following conditions
+# are met:
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in the
+#    documentation and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE AUTHOR ``AS IS'' AND ANY EXPRESS OR
+# IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED.  IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR ANY
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS
+# OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION)
+# HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT,
+# STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING
+# IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+import io
+import os
+import sys
+
+import pytest
+
+import libiocage.lib.JailStream
+import libiocage.lib.errors
+
+PAYLOAD = bytes(range(256)) * 8192
+
+ZFS_STAND_IN = """#!{python}
+import sys
+
+args = sys.argv[1:]
+with open("{workdir}/" + args[0] + ".args", "w") as f:
+    f.write(" ".join(args))
+
+if args[-1].startswith("fail"):
+    sys.stderr.write("cannot open dataset")
+    exit(1)
+
+if args[-1].startswith("verbose"):
+    # more than fits into a pipe buffer
+    sys.stderr.write("estimated size\\n" * 65536)
+    sys.stderr.flush()
+
+if args[0] == "send":
+    sys.stdout.buffer.write(bytes(range(256)) * 8192)
+elif args[0] == "receive":
+    with open("{workdir}/received", "wb") as f:
+        f.write(sys.stdin.buffer.read())
+"""
+
+
+@pytest.fixture
+def zfs_command(tmpdir):
+    path = str(tmpdir.join("zfs"))
+    with open(path, "w") as f:
+        f.write(ZFS_STAND_IN.format(python=sys.executable, workdir=tmpdir))
+    os.chmod(path, 0o755)
+    return path
+
+
+def _read(tmpdir, name):
+    with open(str(tmpdir.join(name)), "rb") as f:
+        return f.read()
+
+
+class TestJailStream(object):
+
+    @pytest.mark.parametrize("compression", ["none", "gzip", "bzip2", "xz"])
+    def test_stream_roundtrip(self, zfs_command, tmpdir, logger,
+                              compression):
+
+        stream = libiocage.lib.JailStream.JailStream(
+            zfs_command=zfs_command,
+            compression=compression,
+            logger=logger
+        )
+        header = stream.create_header(
+            name="myjail",
+            snapshot="ioc-export-1",
+            config={"id": "myjail"}
+        )
+
+        buffer = io.BytesIO()
+        sent = list(stream.send(buffer, "zroot/iocage/jails/myjail", header))
+        assert sent[-1] == len(PAYLOAD)
+
+        if compression != "none":
+            assert len(buffer.getvalue()) < len(PAYLOAD)
+
+        buffer.seek(0)
+        read_header = stream.read_header(buffer)
+        assert read_header == header
+        body_size = len(buffer.getvalue()) - buffer.tell()
+
+        received = list(stream.receive(
+            buffer,
+            "zroot/iocage/jails/newjail",
+            read_header
+        ))
+        assert received[-1] == body_size
+        assert _read(tmpdir, "received") == PAYLOAD
+
+        assert _read(tmpdir, "send.args") == \
+            b"send -R zroot/iocage/jails/myjail@ioc-export-1"
+        assert _read(tmpdir, "receive.args") == \
+            b"receive zroot/iocage/jails/newjail"
+
+    def test_incremental_stream(self, zfs_command, tmpdir, logger):
+
+        stream = libiocage.lib.JailStream.JailStream(
+            zfs_command=zfs_command,
+            logger=logger
+        )
+        header = stream.create_header(
+            name="myjail",
+            snapshot="second",
+            incremental_from="first"
+        )
+
+        buffer = io.BytesIO()
+        list(stream.send(buffer, "zroot/iocage/jails/myjail", header))
+        buffer.seek(0)
+        list(stream.receive(
+            buffer,
+            "zroot/iocage/jails/myjail",
+            stream.read_header(buffer)
+        ))
+
+        assert _read(tmpdir, "send.args") == \
+            b"send -R -I @first zroot/iocage/jails/myjail@second"
+        assert _read(tmpdir, "receive.args") == \
+            b"receive -F zroot/iocage/jails/myjail"
+
+    def test_verbose_zfs_output_does_not_block(self, zfs_command, tmpdir,
+                                               logger):
+
+        stream = libiocage.lib.JailStream.JailStream(
+            zfs_command=zfs_command,
+            logger=logger
+        )
+        header = stream.create_header(name="verbose", snapshot="verbose")
+
+        buffer = io.BytesIO()
+        sent = list(stream.send(buffer, "verbose", header))
+        assert sent[-1] == len(PAYLOAD)
+
+        buffer.seek(0)
+        list(stream.receive(buffer, "verbose", stream.read_header(buffer)))
+        assert _read(tmpdir, "received") == PAYLOAD
+
+    def test_rejects_unknown_format(self, logger):
+
+        stream = libiocage.lib.JailStream.JailStream(logger=logger)
+
+        with pytest.raises(libiocage.lib.errors.InvalidJailStream):
+            stream.read_header(io.BytesIO(b"#!/bin/sh\necho not a stream"))
+
+    def test_failing_send_raises(self, zfs_command, logger):
+
+        stream = libiocage.lib.JailStream.JailStream(
+            zfs_command=zfs_command,
+            logger=logger
+        )
+        header = stream.create_header(name="fail", snapshot="fail")
+
+        with pytest.raises(libiocage.lib.errors.CommandFailure):
+            list(stream.send(io.BytesIO(), "fail", header))
@@ -0,0 +1,184 @@
+# Copyright (c) 2014-2017, iocage
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted providing that the following conditions
+# are met:
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in the
+#    documentation and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE AUTHOR ``AS IS'' AND ANY EXPRESS OR
+# IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED.  IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR ANY
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS
+# OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION)
+# HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT,
+# STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING
+# IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+import random
+import shutil
+import subprocess
+
+import pytest
+
+import libiocage.lib.Logger
+import libiocage.lib.RCConf
+
+FUZZ_ITERATIONS = 500
+
+RC_CONF = """# managed by iocage
+hostname="foo"   # the hostname
+sshd_enable=YES
+ifconfig_epair0b='inet 10.0.0.2/24'
+
+export cron_flags="-J 15"
+motd_enable="NO"; other=1
+hostname_long=$(hostname)
+sendmail_flags="-L ${name}"
+"""
+
+
+def _random_text(rng, alphabet, max_length):
+    return "".join(
+        rng.choice(alphabet) for _ in range(rng.randint(0, max_length))
+    )
+
+
+class TestRCConf(object):
+
+    @pytest.fixture
+    def rc_conf_path(self, tmpdir):
+        path = tmpdir.join("rc.conf")
+        path.write(RC_CONF)
+        return str(path)
+
+    def _load(self, path):
+        return libiocage.lib.RCConf.RCConf(
+            path=path,
+            logger=libiocage.lib.Logger.Logger()
+        )
+
+    def test_read(self, rc_conf_path):
+        rc_conf = self._load(rc_conf_path)
+        assert rc_conf["hostname"] == "foo"
+        assert rc_conf["sshd_enable"] is True
+        assert rc_conf["ifconfig_epair0b"] == "inet 10.0.0.2/24"
+        assert rc_conf["cron_flags"] == "-J 15"
+        assert rc_conf["motd_enable"] is False
+        assert "hostname_long" not in rc_conf
+        assert "sendmail_flags" not in rc_conf
+        assert rc_conf.save() is False
+
+    def test_expansions_are_kept_verbatim(self, rc_conf_path):
+        rc_conf = self._load(rc_conf_path)
+        rc_conf["hostname_long"] = "z"
+        assert rc_conf.save() is True
+
+        with open(rc_conf_path) as f:
+            assert f.read() == RC_CONF + "hostname_long=\"z\"\n"
+
+        for content in [
+            "a=$(hostname)\n",
+            "a=${b:-c}\n",
+            "a=$b\n",
+            "a=`hostname`\n",
+            "a=\"x $b\"\n",
+            "a=b(c)\n",
+            "a=(b)\n",
+            "a=b c\n",
+            "a=b &\n"
+        ]:
+            lines = libiocage.lib.RCConf.parse(content)
+            assert [line.key for line in lines] == [None], content
+
+    def test_edit_preserves_layout(self, rc_conf_path):
+        rc_conf = self._load(rc_conf_path)
+        rc_conf["hostname"] = "bar"
+        rc_conf["ifconfig_epair0b"] = "inet 10.0.0.3/24"
+        rc_conf["rtsold_enable"] = True
+        del rc_conf["sshd_enable"]
+        assert rc_conf.save() is True
+
+        with open(rc_conf_path) as f:
+            assert f.read() == RC_CONF \
+                .replace("\"foo\"", "\"bar\"") \
+                .replace("10.0.0.2", "10.0.0.3") \
+                .replace("sshd_enable=YES\n", "") + "rtsold_enable=\"YES\"\n"
+
+        assert self._load(rc_conf_path)["rtsold_enable"] is True
+
+    def test_fuzz_round_trip(self):
+        rng = random.Random(4815)
+        alphabet = "ab_=\"'\\ \t\n#$;()`{}"
+        for _ in range(FUZZ_ITERATIONS):
+            content = _random_text(rng, alphabet, 60)
+            lines = libiocage.lib.RCConf.parse(content)
+            assert "".join(line.render() for line in lines) == content
+
+    def test_fuzz_values(self):
+        rng = random.Random(1623)
+        alphabet = "aZ09 _-./\"'\\$`#;\t\n="
+        for _ in range(FUZZ_ITERATIONS):
+            values = {
+                f"key{i}": _random_text(rng, alphabet, 20)
+                for i in range(rng.randint(1, 5))
+            }
+            lines = [
+                libiocage.lib.RCConf.RCConfLine(
+                    key=key,
+                    value=value,
+                    quote=rng.choice(["", "'", "\""])
+                ) for key, value in values.items()
+            ]
+            content = "".join(line.render() for line in lines)
+            parsed = libiocage.lib.RCConf.parse(content)
+            assert dict((x.key, x.value) for x in parsed) == values
+
+    @pytest.mark.skipif(
+        shutil.which("sh") is None,
+        reason="A POSIX shell is required to compare values"
+    )
+    def test_fuzz_against_shell(self, tmpdir):
+        rng = random.Random(42)
+        alphabet = "aZ0 _-./\"'\\$`#;\n"
+        path = tmpdir.join("rc.conf")
+        for _ in range(50):
+            value = _random_text(rng, alphabet, 16)
+            line = libiocage.lib.RCConf.RCConfLine(
+                key="value",
+                value=value,
+                quote=rng.choice(["", "'", "\""])
+            )
+            path.write(line.render())
+            output = subprocess.check_output(
+                ["sh", "-c", ". \"$0\"; printf '%s' \"$value\"", str(path)]
+            )
+            assert output.decode() == value
+            parsed = libiocage.lib.RCConf.parse(line.render())
+            assert parsed[0].value == value
+
+    @pytest.mark.skipif(
+        shutil.which("sh") is None,
+        reason="A POSIX shell is required to compare values"
+    )
+    def test_fuzz_parse_against_shell(self, tmpdir):
+        rng = random.Random(2342)
+        alphabet = "aZ0 _-./\"'\\$`#(){}\n"
+        path = tmpdir.join("rc.conf")
+        for _ in range(200):
+            content = "value=" + _random_text(rng, alphabet, 12) + "\n"
+            parsed = libiocage.lib.RCConf.parse(content)
+            if (len(parsed) > 1) or (parsed[0].key is None):
+                # only compare single assignments
+                continue
+            path.write(content)
+            output = subprocess.check_output(
+                ["sh", "-c", ". \"$0\"; printf '%s' \"$value\"", str(path)]
+            )
+            assert output.decode() == parsed[0].value, content
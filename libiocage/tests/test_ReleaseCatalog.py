@@ -0,0 +1,157 @@
+# Copyright (c) 2014-2017, iocage
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted providing that the following conditions
+# are met:
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in the
+#    documentation and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE AUTHOR ``AS IS'' AND ANY EXPRESS OR
+# IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED.  IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR ANY
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS
+# OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION)
+# HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT,
+# STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING
+# IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+import http.server
+import socketserver
+import threading
+
+import pytest
+
+import libiocage.lib.HTTPClient
+import libiocage.lib.ReleaseCatalog
+
+BASE_SHA256 = "a" * 64
+MIRROR = {
+    "/": b"<a href=\"11.0-RELEASE/\"> <a href=\"11.1-RELEASE/\">",
+    "/11.1-RELEASE/MANIFEST": f"base.txz\t{BASE_SHA256}\t42\tbase".encode(),
+    "/11.1-RELEASE/base.txz": b"x" * 1000
+}
+
+
+class MirrorHandler(http.server.BaseHTTPRequestHandler):
+
+    protocol_version = "HTTP/1.1"
+
+    def do_HEAD(self):
+        self._respond(send_body=False)
+
+    def do_GET(self):
+        self._respond(send_body=True)
+
+    def _respond(self, send_body):
+        content = MIRROR.get(self.path)
+        self.send_response(404 if (content is None) else 200)
+        self.send_header("Content-Length", str(len(content or b"")))
+        self.end_headers()
+        if (send_body is True) and (content is not None):
+            self.wfile.write(content)
+
+    def log_message(self, *args):
+        pass
+
+
+class ThreadingServer(socketserver.ThreadingMixIn, http.server.HTTPServer):
+    daemon_threads = True
+
+
+@pytest.fixture
+def mirror_url():
+    server = ThreadingServer(("127.0.0.1", 0), MirrorHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+class MirrorRelease:
+
+    def __init__(self, name, mirror_url, eol=False, **kwargs):
+        self.name = name
+        self.eol = eol
+        self.assets = ["base"]
+        self.remote_url = f"{mirror_url}/{name}"
+
+
+class MirrorDistribution:
+
+    name = "FreeBSD"
+    hash_file = "MANIFEST"
+    host = None
+    zfs = None
+
+    def __init__(self, mirror_url, cache_dir, logger):
+        self.mirror_url = mirror_url
+        self.http_client = libiocage.lib.HTTPClient.HTTPClient(
+            cache_dir=cache_dir,
+            logger=logger
+        )
+
+    def _class_release(self, name, eol, **kwargs):
+        return MirrorRelease(name, self.mirror_url, eol=eol)
+
+    def fetch_releases(self):
+        return [
+            self._class_release("11.0-RELEASE", eol=True),
+            self._class_release("11.1-RELEASE", eol=False)
+        ]
+
+
+class TestReleaseCatalog(object):
+
+    def test_catalog_is_served_from_disk(self, mirror_url, tmpdir, logger):
+        distribution = MirrorDistribution(
+            mirror_url,
+            str(tmpdir.join("http")),
+            logger
+        )
+        path = str(tmpdir.join("catalog.json"))
+        catalog = libiocage.lib.ReleaseCatalog.ReleaseCatalog(
+            distribution,
+            path=path,
+            logger=logger
+        )
+
+        assert catalog.data is None
+        assert catalog.stale is True
+        assert catalog.wait_for_refresh() is False
+        catalog.refresh_if_stale()
+        assert catalog.wait_for_refresh(timeout=30) is True
+
+        entry = catalog.get("11.1-RELEASE")
+        assert entry["assets"]["base"] == dict(sha256=BASE_SHA256, size=1000)
+        assert catalog.get("11.0-RELEASE")["assets"]["base"] == \
+            dict(sha256=None, size=None)
+
+        # a new catalog does not need the mirror
+        distribution.fetch_releases = None
+        offline_catalog = libiocage.lib.ReleaseCatalog.ReleaseCatalog(
+            distribution,
+            path=path,
+            logger=logger
+        )
+        releases = offline_catalog.releases
+        assert [(x.name, x.eol) for x in releases] == \
+            [("11.0-RELEASE", True), ("11.1-RELEASE", False)]
+        assert offline_catalog.stale is False
+        assert offline_catalog.refresh_if_stale() is None
+        assert libiocage.lib.ReleaseCatalog.format_age(
+            offline_catalog.age
+        ) == "0s"
+
+    def test_ages_are_formatted(self):
+        format_age = libiocage.lib.ReleaseCatalog.format_age
+        assert format_age(59) == "59s"
+        assert format_age(150) == "2m"
+        assert format_age(3 * 3600) == "3h"
+        assert format_age(49 * 3600) == "2d"
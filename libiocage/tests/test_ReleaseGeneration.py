@@ -0,0 +1,126 @@
+# Copyright (c) 2014-2017, iocage
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted providing that the following conditions
+# are met:
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in the
+#    documentation and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE AUTHOR ``AS IS'' AND ANY EXPRESS OR
+# IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED.  IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR ANY
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS
+# OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION)
+# HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT,
+# STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING
+# IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+import os
+
+import pytest
+
+import libiocage.lib.ReleaseGeneration
+import libiocage.lib.errors
+
+
+class ReleaseMock(object):
+
+    def __init__(self, directory):
+        self.name = "11.1-RELEASE"
+        self.root_dataset_name = "zroot/iocage/releases/11.1-RELEASE/root"
+        self.generations_directory = f"{directory}/generations"
+
+
+def _write(path, content):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        f.write(content)
+
+
+class TestReleaseGeneration(object):
+
+    @pytest.fixture
+    def root_dir(self, tmpdir):
+        root_dir = str(tmpdir.mkdir("root"))
+        _write(f"{root_dir}/etc/rc.conf", "sendmail_enable=\"NO\"\n")
+        _write(f"{root_dir}/bin/sh", "binary")
+        os.symlink("/bin/sh", f"{root_dir}/bin/rsh")
+        return root_dir
+
+    def test_generations_are_content_addressed(self, root_dir, tmpdir, logger):
+        release = ReleaseMock(str(tmpdir))
+        generation = libiocage.lib.ReleaseGeneration.ReleaseGeneration
+        create = generation.from_directory
+
+        first = create(release, root_dir, logger=logger)
+        os.utime(f"{root_dir}/bin/sh", ns=(0, 0))
+        assert create(release, root_dir, logger=logger).identifier == \
+            first.identifier
+
+        _write(f"{root_dir}/bin/sh", "patched")
+        second = create(release, root_dir, parent=first.identifier)
+        assert second.identifier != first.identifier
+        assert second.parent == first.identifier
+        assert second.snapshot_name.endswith(f"@ioc-gen-{second.identifier}")
+
+    def test_manifests_are_saved(self, root_dir, tmpdir, logger):
+        release = ReleaseMock(str(tmpdir))
+        generation = libiocage.lib.ReleaseGeneration.ReleaseGeneration
+        created = generation.from_directory(release, root_dir, logger=logger)
+        created.save()
+
+        loaded = generation(release, created.identifier, logger=logger)
+        assert loaded.files == created.files
+        assert loaded.files["bin/rsh"]["target"] == "/bin/sh"
+
+        with pytest.raises(libiocage.lib.errors.ReleaseGenerationNotFound):
+            generation(release, "unknown", logger=logger).manifest
+
+    def test_diff_finds_jail_changes(self, root_dir, tmpdir, logger):
+        release = ReleaseMock(str(tmpdir))
+        generation = libiocage.lib.ReleaseGeneration.ReleaseGeneration
+        generation = generation.from_directory(release, root_dir)
+
+        # touching a file without changing it is not a change
+        os.utime(f"{root_dir}/bin/sh", ns=(0, 0))
+        _write(f"{root_dir}/etc/rc.conf", "sshd_enable=\"YES\"\n")
+        _write(f"{root_dir}/usr/local/etc/app.conf", "setting=1\n")
+        os.unlink(f"{root_dir}/bin/rsh")
+
+        changed, deleted = generation.diff(root_dir)
+
+        assert changed == ["etc/rc.conf", "usr", "usr/local", "usr/local/etc",
+                           "usr/local/etc/app.conf"]
+        assert deleted == ["bin/rsh"]
+
+    def test_diff_finds_ownership_changes(self, root_dir, tmpdir, logger):
+        if os.geteuid() != 0:
+            pytest.skip("changing the owner of files requires root")
+
+        release = ReleaseMock(str(tmpdir))
+        generation = libiocage.lib.ReleaseGeneration.ReleaseGeneration
+        generation = generation.from_directory(release, root_dir)
+
+        os.chown(f"{root_dir}/bin/sh", 0, 5)
+        os.lchown(f"{root_dir}/bin/rsh", 1, 0)
+        os.chown(f"{root_dir}/etc", 1, 0)
+
+        changed, deleted = generation.diff(root_dir)
+
+        assert changed == ["bin/rsh", "bin/sh", "etc"]
+        assert deleted == []
+
+    def test_special_files_are_skipped(self, root_dir, tmpdir, logger):
+        release = ReleaseMock(str(tmpdir))
+        os.mkfifo(f"{root_dir}/etc/fifo")
+
+        generation = libiocage.lib.ReleaseGeneration.ReleaseGeneration
+        created = generation.from_directory(release, root_dir, logger=logger)
+        assert "etc/fifo" not in created.files
+        assert created.diff(root_dir) == ([], [])
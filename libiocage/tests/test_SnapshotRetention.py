@@ -0,0 +1,120 @@
+# Copyright (c) 2014-2017, iocage
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted providing that the following conditions
+# are met:
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in the
+#    documentation and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE AUTHOR ``AS IS'' AND ANY EXPRESS OR
+# IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED.  IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR ANY
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS
+# OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION)
+# HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT,
+# STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING
+# IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+import os
+import sys
+
+import pytest
+
+import libiocage.lib.SnapshotRetention
+import libiocage.lib.ZFSSnapshots
+
+DAY = 24 * 60 * 60
+NOW = 1500000000
+
+ZFS_STAND_IN = """#!{python}
+import sys
+
+args = sys.argv[1:]
+with open("{workdir}/calls", "a") as f:
+    f.write(" ".join(args) + "\\n")
+
+if args[0] == "list":
+    dataset = "zroot/iocage/releases/11.1-RELEASE"
+    for day in range(10):
+        creation = {now} - day * {day}
+        name = f"pre-update{{day}}"
+        print(f"{{dataset}}@{{name}}\\t\\t{{creation}}")
+        clones = "zroot/iocage/jails/a/root" if day == 9 else ""
+        print(f"{{dataset}}/root@{{name}}\\t{{clones}}\\t{{creation}}")
+    print(f"{{dataset}}/root@ioc-gen-1234\\t\\t{now}")
+
+if args[0] == "destroy":
+    print("reclaim\\t4096")
+"""
+
+
+@pytest.fixture
+def zfs_snapshots(tmpdir, logger):
+    path = str(tmpdir.join("zfs"))
+    with open(path, "w") as f:
+        f.write(ZFS_STAND_IN.format(
+            python=sys.executable,
+            workdir=tmpdir,
+            now=NOW,
+            day=DAY
+        ))
+    os.chmod(path, 0o755)
+    return libiocage.lib.ZFSSnapshots.ZFSSnapshots(
+        zfs_command=path,
+        logger=logger
+    )
+
+
+class TestSnapshotRetention(object):
+
+    def test_policy_keeps_last_daily_and_weekly(self):
+        policy = libiocage.lib.SnapshotRetention.RetentionPolicy(
+            keep_last=2,
+            keep_daily=3,
+            keep_weekly=2
+        )
+        # two snapshots per day during the last 30 days
+        snapshots = []
+        for hour in range(0, 30 * 24, 12):
+            snapshots.append((f"snap{hour}", NOW - hour * 3600))
+
+        keep = policy.select(snapshots)
+
+        # last: 0, 12; daily: 0 (Jul 14), 12 (Jul 13), 36 (Jul 12);
+        # weekly: 0 (week 28), 108 (week 27 starts 98.7 hours earlier)
+        assert keep == {"snap0", "snap12", "snap36", "snap108"}
+
+    def test_clone_origins_are_never_pruned(self, zfs_snapshots, tmpdir,
+                                            logger):
+        pruner = libiocage.lib.SnapshotRetention.SnapshotPruner(
+            policy=libiocage.lib.SnapshotRetention.RetentionPolicy(
+                keep_last=1,
+                keep_daily=2,
+                keep_weekly=0
+            ),
+            zfs_snapshots=zfs_snapshots,
+            logger=logger
+        )
+
+        plan = pruner.plan(
+            "zroot/iocage/releases/11.1-RELEASE",
+            prefix="pre-update"
+        )
+
+        assert plan.keep == ["pre-update1", "pre-update0"]
+        assert plan.protected == ["pre-update9"]
+        assert plan.delete == [f"pre-update{day}" for day in range(8, 1, -1)]
+        assert plan.reclaim == 4096
+
+        with open(str(tmpdir.join("calls")), "r") as f:
+            dry_run = f.read().strip().split("\n")[-1]
+        assert dry_run.startswith("destroy -v -p -n -r ")
+        assert dry_run.endswith(",".join(plan.delete))
+
+        assert pruner.prune(plan) == 4096
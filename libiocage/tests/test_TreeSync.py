@@ -0,0 +1,135 @@
+# Copyright (c) 2014-2017, iocage
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted providing that the following conditions
+# are met:
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in the
+#    documentation and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE AUTHOR ``AS IS'' AND ANY EXPRESS OR
+# IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED.  IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR ANY
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS
+# OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION)
+# HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT,
+# STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING
+# IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+import os
+
+import libiocage.lib.TreeSync
+
+
+def _write(path, content):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        f.write(content)
+
+
+def _read(path):
+    with open(path, "r") as f:
+        return f.read()
+
+
+class TestTreeSync(object):
+
+    def test_only_changes_are_synced(self, tmpdir, logger):
+        source = str(tmpdir.join("source"))
+        target = str(tmpdir.join("target"))
+        _write(f"{source}/bin/sh", "shell")
+        _write(f"{source}/etc/rc.conf", "sendmail_enable=NO")
+        _write(f"{source}/usr/share/doc/README", "readme")
+        os.symlink("../bin/sh", f"{source}/etc/sh")
+        os.chmod(f"{source}/bin/sh", 0o555)
+
+        tree_sync = libiocage.lib.TreeSync.TreeSync(logger=logger)
+
+        stats = tree_sync.sync(source, target)
+        assert stats.copied == 9
+        assert _read(f"{target}/bin/sh") == "shell"
+        assert os.readlink(f"{target}/etc/sh") == "../bin/sh"
+        assert os.stat(f"{target}/bin/sh").st_mode & 0o777 == 0o555
+        assert os.stat(f"{target}/usr").st_mtime_ns == \
+            os.stat(f"{source}/usr").st_mtime_ns
+
+        stats = tree_sync.sync(source, target)
+        assert stats.copied == 0
+        assert stats.deleted == 0
+        assert stats.unchanged == 4
+
+        _write(f"{source}/etc/rc.conf", "sendmail_enable=YES")
+        os.chmod(f"{source}/usr/share/doc/README", 0o600)
+        os.remove(f"{source}/etc/sh")
+        os.symlink("../bin/csh", f"{source}/etc/sh")
+        os.remove(f"{source}/bin/sh")
+        os.makedirs(f"{source}/bin/sh")
+        _write(f"{target}/etc/stale.conf", "stale")
+
+        stats = tree_sync.sync(source, target)
+        assert _read(f"{target}/etc/rc.conf") == "sendmail_enable=YES"
+        assert os.stat(f"{target}/usr/share/doc/README").st_mode & 0o777 == \
+            0o600
+        assert os.readlink(f"{target}/etc/sh") == "../bin/csh"
+        assert os.path.isdir(f"{target}/bin/sh")
+        assert not os.path.exists(f"{target}/etc/stale.conf")
+        assert stats.copied == 3
+        assert stats.updated == 1
+        assert stats.deleted == 1
+
+    def test_checksum_detects_same_size_changes(self, tmpdir, logger):
+        source = str(tmpdir.join("source"))
+        target = str(tmpdir.join("target"))
+        _write(f"{source}/etc/hosts", "aaaa")
+
+        libiocage.lib.TreeSync.TreeSync(logger=logger).sync(source, target)
+        _write(f"{target}/etc/hosts", "bbbb")
+        source_stat = os.stat(f"{source}/etc/hosts")
+        os.utime(f"{target}/etc/hosts", ns=(
+            source_stat.st_atime_ns,
+            source_stat.st_mtime_ns
+        ))
+
+        libiocage.lib.TreeSync.TreeSync(logger=logger).sync(source, target)
+        assert _read(f"{target}/etc/hosts") == "bbbb"
+
+        libiocage.lib.TreeSync.TreeSync(
+            checksum=True,
+            logger=logger
+        ).sync(source, target)
+        assert _read(f"{target}/etc/hosts") == "aaaa"
+
+    def test_hard_links_are_preserved(self, tmpdir, logger):
+        source = str(tmpdir.join("source"))
+        target = str(tmpdir.join("target"))
+        _write(f"{source}/bin/test", "test")
+        os.link(f"{source}/bin/test", f"{source}/bin/[")
+
+        tree_sync = libiocage.lib.TreeSync.TreeSync(logger=logger)
+
+        stats = tree_sync.sync(source, target)
+        assert stats.linked == 1
+        assert os.path.samefile(f"{target}/bin/test", f"{target}/bin/[")
+
+        stats = tree_sync.sync(source, target)
+        assert stats.linked == 0
+        assert stats.copied == 0
+
+    def test_copy_backends_fall_back(self, tmpdir):
+        source = str(tmpdir.join("source"))
+        _write(source, "x" * 100000)
+
+        for backend in libiocage.lib.TreeSync.COPY_BACKENDS:
+            target = str(tmpdir.join(backend))
+            used_backend = libiocage.lib.TreeSync.copy_file_data(
+                source,
+                target,
+                backends=(backend, "buffered")
+            )
+            assert used_backend in (backend, "buffered")
+            assert _read(target) == "x" * 100000
@@ -0,0 +1,104 @@
+# Copyright (c) 2014-2017, iocage
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted providing that the following conditions
+# are met:
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in the
+#    documentation and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE AUTHOR ``AS IS'' AND ANY EXPRESS OR
+# IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED.  IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR ANY
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS
+# OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION)
+# HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT,
+# STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING
+# IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+import os
+
+import pytest
+
+import libiocage.lib.ZFSMemory
+
+
+class TestZFSMemory(object):
+
+    @pytest.fixture
+    def memory_zfs(self):
+        zfs = libiocage.lib.ZFSMemory.ZFS(pools=["memory"])
+        yield zfs
+        zfs.close()
+
+    def test_datasets_mount_below_the_mount_root(self, memory_zfs):
+        pool = memory_zfs.get("memory")
+        pool.create("memory/iocage/jails", {}, create_ancestors=True)
+        dataset = memory_zfs.get_dataset("memory/iocage/jails")
+
+        assert dataset.mountpoint is None
+        dataset.mount()
+        assert os.path.isdir(dataset.mountpoint)
+        assert dataset.properties["mountpoint"].value == "/memory/iocage/jails"
+
+    def test_user_properties_are_inherited(self, memory_zfs):
+        pool = memory_zfs.get("memory")
+        pool.create("memory/iocage", {})
+        pool.create("memory/iocage/child", {})
+
+        parent = memory_zfs.get_dataset("memory/iocage")
+        child = memory_zfs.get_dataset("memory/iocage/child")
+        parent.properties["org.freebsd.ioc:test"] = \
+            libiocage.lib.ZFSMemory.ZFSUserProperty("yes")
+
+        assert child.properties["org.freebsd.ioc:test"].value == "yes"
+        assert "org.freebsd.ioc:test" in list(child.properties)
+        with pytest.raises(KeyError):
+            child.properties["org.freebsd.ioc:missing"]
+
+    def test_clones_copy_snapshot_content(self, memory_zfs):
+        pool = memory_zfs.get("memory")
+        pool.create("memory/release", {})
+        release = memory_zfs.get_dataset("memory/release")
+        release.mount()
+        with open(f"{release.mountpoint}/file", "w") as f:
+            f.write("before")
+
+        release.snapshot("memory/release@base")
+        with open(f"{release.mountpoint}/file", "w") as f:
+            f.write("after")
+
+        snapshot = memory_zfs.get_snapshot("memory/release@base")
+        snapshot.clone("memory/jail")
+        jail = memory_zfs.get_dataset("memory/jail")
+        jail.mount()
+
+        with open(f"{jail.mountpoint}/file", "r") as f:
+            assert f.read() == "before"
+        assert jail.properties["origin"].value == "memory/release@base"
+
+        with pytest.raises(libiocage.lib.ZFSMemory.ZFSException):
+            snapshot.delete()
+
+        snapshot.rollback()
+        with open(f"{release.mountpoint}/file", "r") as f:
+            assert f.read() == "before"
+
+    def test_datasets_with_children_are_not_deleted(self, memory_zfs):
+        pool = memory_zfs.get("memory")
+        pool.create("memory/a/b", {}, create_ancestors=True)
+        parent = memory_zfs.get_dataset("memory/a")
+
+        with pytest.raises(libiocage.lib.ZFSMemory.ZFSException) as error:
+            parent.delete()
+        assert error.value.code == libiocage.lib.ZFSMemory.Error.BUSY
+
+        memory_zfs.get_dataset("memory/a/b").delete()
+        parent.delete()
+        with pytest.raises(libiocage.lib.ZFSMemory.ZFSException):
+            memory_zfs.get_dataset("memory/a")
@@ -0,0 +1,104 @@
+# Copyright (c) 2014-2017, iocage
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted providing that the following conditions
+# are met:
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in the
+#    documentation and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE AUTHOR ``AS IS'' AND ANY EXPRESS OR
+# IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED.  IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR ANY
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS
+# OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION)
+# HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT,
+# STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING
+# IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+import os
+import sys
+
+import pytest
+
+import libiocage.lib.ZFSSnapshots
+import libiocage.lib.errors
+
+ZFS_STAND_IN = """#!{python}
+import sys
+
+args = sys.argv[1:]
+with open("{workdir}/calls", "a") as f:
+    f.write(" ".join(args) + "\\n")
+
+if args[-1].startswith("fail"):
+    exit(1)
+
+if args[0] == "list":
+    print("zroot/iocage/jails/a@snap\\t1500000000\\t1024\\t2048")
+    print("zroot/iocage/jails/a/root@snap\\t1500000000\\t0\\t4096")
+    print("zroot/iocage/jails/b/root@other\\t1500000001\\t512\\t512")
+"""
+
+
+@pytest.fixture
+def zfs_command(tmpdir):
+    path = str(tmpdir.join("zfs"))
+    with open(path, "w") as f:
+        f.write(ZFS_STAND_IN.format(python=sys.executable, workdir=tmpdir))
+    os.chmod(path, 0o755)
+    return path
+
+
+def _calls(tmpdir):
+    with open(str(tmpdir.join("calls")), "r") as f:
+        return f.read().strip().split("\n")
+
+
+class TestZFSSnapshots(object):
+
+    def test_snapshots_are_created_in_one_command(self, zfs_command, tmpdir,
+                                                  logger):
+        snapshots = libiocage.lib.ZFSSnapshots.ZFSSnapshots(
+            zfs_command=zfs_command,
+            logger=logger
+        )
+        snapshots.create(["zroot/jails/a", "zroot/jails/b"], "snap")
+
+        assert _calls(tmpdir) == [
+            "snapshot -r zroot/jails/a@snap zroot/jails/b@snap"
+        ]
+
+    def test_snapshots_are_listed_with_one_scan(self, zfs_command, tmpdir,
+                                                logger):
+        snapshots = libiocage.lib.ZFSSnapshots.ZFSSnapshots(
+            zfs_command=zfs_command,
+            logger=logger
+        )
+        result = snapshots.list(["zroot/iocage/jails"])
+
+        assert len(_calls(tmpdir)) == 1
+        assert len(result) == 3
+        assert result[1].dataset_name == "zroot/iocage/jails/a/root"
+        assert result[1].snapshot_name == "snap"
+        assert result[1]["referenced"] == 4096
+        assert snapshots.exists("zroot/iocage/jails/a", "snap")
+
+    def test_groups_are_rolled_back(self, zfs_command, tmpdir, logger):
+        snapshots = libiocage.lib.ZFSSnapshots.ZFSSnapshots(
+            zfs_command=zfs_command,
+            logger=logger
+        )
+        results = dict(snapshots.rollback({
+            "a": ["zroot/jails/a@snap", "zroot/jails/a/root@snap"],
+            "b": ["fail/b@snap"]
+        }, max_workers=2))
+
+        assert results["a"] is None
+        assert isinstance(results["b"], libiocage.lib.errors.CommandFailure)
+        assert "rollback -r zroot/jails/a/root@snap" in _calls(tmpdir)